@@ -1,3 +1,8 @@
-from .main import app
-
+# The FastAPI app is imported on first access, so the worker and CLIs don't load the web stack
 __all__ = ["app"]
+
+def __getattr__(name):
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "AI Insights API"
@@ -19,16 +19,105 @@ class Settings(BaseSettings):
     R2_SECRET_ACCESS_KEY: Optional[str] = None
     R2_BUCKET_NAME: Optional[str] = None
     R2_ENDPOINT_URL: Optional[str] = None
+    R2_STREAM_BLOCK_SIZE: int = 1024 * 1024  # Bytes read per block when streaming objects
+    R2_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # Bytes per multipart upload part (minimum 5 MiB)
+    R2_MULTIPART_CONCURRENCY: int = 4  # Parts uploaded at once
+    R2_PRESIGNED_URL_EXPIRY: int = 3600  # Seconds presigned upload URLs stay valid
+    BULK_UPLOAD_CONCURRENCY: int = 4  # Files streamed to R2 at once by a bulk upload
+    ZIP_MAX_MEMBERS: int = 1000  # Files accepted from the zip archives of one bulk upload
+    ZIP_MAX_UNCOMPRESSED_BYTES: int = 2 * 1024 * 1024 * 1024  # Total uncompressed size accepted from the zip archives of one bulk upload
 
     # Pinecone Settings
     PINECONE_API_KEY: Optional[str] = None
     PINECONE_ENVIRONMENT: Optional[str] = None
+    PINECONE_INDEX_NAME: str = "ai-insights"  # Index of the first embedding version, later versions get a suffix
+    PINECONE_UPSERT_BATCH_SIZE: int = 100  # Maximum vectors per upsert request
+    PINECONE_UPSERT_MAX_BYTES: int = 2 * 1024 * 1024  # Maximum payload per upsert request
+    PINECONE_UPSERT_CONCURRENCY: int = 4  # Upsert requests in flight at once
+    PINECONE_UPSERT_MAX_ATTEMPTS: int = 3
+    PINECONE_UPSERT_RETRY_DELAY: float = 1.0  # Seconds before the first retry, doubled on each attempt
+
+    # Vector Store Settings
+    VECTOR_STORE_BACKEND: str = "pinecone"  # pinecone, or local for an in-process store on disk
+    LOCAL_VECTOR_STORE_PATH: str = ".cache/vectors"
+    LOCAL_VECTOR_STORE_HNSW_THRESHOLD: int = 50000  # Namespace size at which search switches to HNSW, if hnswlib is installed
+
+    # Retrieval Settings
+    RETRIEVAL_TOP_K: int = 20  # Candidates retrieved per query, the context packer decides how many reach the LLM
+    LEXICAL_INDEX_ENABLED: bool = True  # Fuse BM25 results with vector results
+    HYBRID_CANDIDATES: int = 20  # Candidates taken from each retriever before fusion
+    RRF_K: int = 60  # Reciprocal rank fusion constant
+    MULTI_WORKSPACE_MAX: int = 20  # Workspaces one fan-out query may span
+
+    # Context Packing Settings
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "gpt-3.5-turbo": 3000,
+        "gpt-4": 4000,
+        "gpt-4o": 12000,
+        "claude-3-sonnet": 12000,
+        "claude-3-opus": 12000,
+        "grok-3": 12000,
+    }
+    CONTEXT_DEFAULT_TOKEN_BUDGET: int = 3000
+    CONTEXT_RELATIVE_SCORE_CUTOFF: float = 0.4  # Drop matches whose vector similarity is below this fraction of the best
+    CONTEXT_MMR_DIVERSITY: float = 0.3  # 0 ranks by relevance only, 1 by novelty only
+
+    # Answer Cache Settings
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+    ANSWER_CACHE_TTL: int = 3600  # Seconds a cached answer may be served
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.97  # Minimum cosine similarity between prompt embeddings
+    ANSWER_CACHE_REPLAY_CHUNK_CHARS: int = 48  # Size of the chunks a cached answer is streamed in
     
     # Database Settings
-    DATABASE_URL: Optional[str] = None
+    DATABASE_URL: Optional[str] = None  # PostgreSQL, or sqlite:///./ai_insights.db for local development
+
+    # Readiness Settings
+    READINESS_TIMEOUT: float = 10.0  # Seconds each dependency may take to warm up
+    READINESS_RETRY_INTERVAL: float = 10.0  # Seconds before /ready retries a failed dependency
+
+    # Extraction Settings
+    EXTRACTION_PROCESSES: int = 4  # Processes used to parse PDF, DOCX and XLSX files
+    EXTRACTION_PDF_PAGES_PER_TASK: int = 8
+    CSV_CHUNK_MAX_TOKENS: int = 500  # Token budget for the header plus the rows packed into one CSV chunk
+
+    # Chunk Store Settings
+    CHUNK_STORE_COMPRESSION_LEVEL: int = 6  # zlib level of stored chunk text
+    CHUNK_STORE_GC_GRACE_SECONDS: int = 3600  # Age below which unreferenced chunk text is kept
+
+    # Job Queue Settings
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_DELAY: float = 10.0  # Seconds before the first retry, doubled on each attempt
+    JOB_RETRY_MAX_DELAY: float = 600.0
+    JOB_VISIBILITY_TIMEOUT: int = 300  # Seconds before a running job with a stale lock is reclaimed
+    JOB_HEARTBEAT_INTERVAL: float = 60.0  # Seconds between lock refreshes of running jobs, well below the visibility timeout
+    WORKER_CONCURRENCY: int = 4  # Jobs each worker runs at once
+    WORKER_POLL_INTERVAL: float = 2.0
     
     # OpenAI Settings
     OPENAI_API_KEY: Optional[str] = None
+
+    # Embedding Settings
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"  # Model of the first embedding version, migrate to change it later
+    EMBEDDING_DIMENSION: int = 1536
+    EMBEDDING_BATCH_SIZE: int = 256  # Maximum chunks per embedding request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 50000  # Maximum tokens per embedding request
+    EMBEDDING_CONCURRENCY: int = 4  # Embedding requests in flight at once
+
+    # Embedding Cache Settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # Evict least recently used entries beyond 1 GB
+    EMBEDDING_CACHE_DTYPE: str = "float32"  # float32 or float16
+
+    # In-process cache of query embeddings, in front of the persistent cache
+    QUERY_EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # Seconds before a cached query embedding expires
+
+    # Embedding Version Settings
+    EMBEDDING_VERSION_REFRESH_SECONDS: int = 30  # How long processes may keep using a version after a cutover
+    EMBEDDING_MIGRATION_CONCURRENCY: int = 4  # Files re-embedded at once by a migration
+    EMBEDDING_VERSION_RETIRE_DELAY: int = 3600  # Seconds a retired version is kept before its index is dropped
     
     # Anthropic Settings
     ANTHROPIC_API_KEY: Optional[str] = None
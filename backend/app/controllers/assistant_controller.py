@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException, status, Request, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import AsyncIterator, List, Optional
+from ..schemas.retrieval import RetrievalFilter
 from ..services.assistant_service import assistant_service
+from ..config.settings import settings
 import logging
 import json
 import asyncio
@@ -14,37 +17,96 @@ class QueryRequest(BaseModel):
     prompt: str
     model: str = "gpt-3.5-turbo"  # Default model
     stream: bool = False
+    filter: Optional[RetrievalFilter] = None  # Restrict retrieval to matching files
+
+class MultiQueryRequest(BaseModel):
+    id: str
+    workspace_ids: List[str]
+    prompt: str
+    model: str = "gpt-3.5-turbo"  # Default model
+    stream: bool = False
+    filter: Optional[RetrievalFilter] = None  # Restrict retrieval to matching files
 
 async def event_generator(workspace_id: str, request: QueryRequest):
     """Generate SSE events for streaming responses"""
+    chunks = assistant_service.process_prompt_stream(
+        workspace_id=workspace_id, 
+        prompt=request.prompt,
+        model=request.model,
+        metadata_filter=request.filter.to_metadata_filter() if request.filter else None
+    )
+    async for event in stream_events(request.id, chunks):
+        yield event
+
+async def stream_events(request_id: str, chunks: AsyncIterator):
+    """Format streamed response chunks as SSE events"""
     try:
         # Start the streaming process
-        yield f"data: {json.dumps({'type': 'start', 'id': request.id})}\n\n"
+        yield f"data: {json.dumps({'type': 'start', 'id': request_id})}\n\n"
         
         # Get streaming response
-        async for chunk in assistant_service.process_prompt_stream(
-            workspace_id=workspace_id, 
-            prompt=request.prompt,
-            model=request.model
-        ):
+        async for chunk in chunks:
             if isinstance(chunk, dict):
                 # Format as SSE event
-                yield f"data: {json.dumps({'type': 'chunk', 'id': request.id, 'content': chunk})}\n\n"
+                yield f"data: {json.dumps({'type': 'chunk', 'id': request_id, 'content': chunk})}\n\n"
             else:
                 # Plain text chunk
-                yield f"data: {json.dumps({'type': 'chunk', 'id': request.id, 'content': {'text': chunk}})}\n\n"
+                yield f"data: {json.dumps({'type': 'chunk', 'id': request_id, 'content': {'text': chunk}})}\n\n"
             
             # Small delay to prevent overwhelming the client
             await asyncio.sleep(0.01)
         
         # Signal completion
-        yield f"data: {json.dumps({'type': 'end', 'id': request.id})}\n\n"
+        yield f"data: {json.dumps({'type': 'end', 'id': request_id})}\n\n"
             
     except Exception as e:
         logger.error(f"Error in streaming: {str(e)}", exc_info=True)
-        error_json = json.dumps({'type': 'error', 'id': request.id, 'error': str(e)})
+        error_json = json.dumps({'type': 'error', 'id': request_id, 'error': str(e)})
         yield f"data: {error_json}\n\n"
 
+# Declared before /{workspace_id}, which would otherwise match /multi
+@router.post("/multi")
+async def query_workspaces(request: MultiQueryRequest):
+    """
+    Query several workspaces with one prompt, answered by a single LLM call
+    """
+    workspace_ids = list(dict.fromkeys(request.workspace_ids))
+    if not workspace_ids or len(workspace_ids) > settings.MULTI_WORKSPACE_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {settings.MULTI_WORKSPACE_MAX} workspace IDs are required"
+        )
+    metadata_filter = request.filter.to_metadata_filter() if request.filter else None
+
+    try:
+        # Handle streaming request
+        if request.stream:
+            chunks = assistant_service.process_multi_workspace_prompt_stream(
+                workspace_ids=workspace_ids,
+                prompt=request.prompt,
+                model=request.model,
+                metadata_filter=metadata_filter
+            )
+            return StreamingResponse(
+                stream_events(request.id, chunks),
+                media_type="text/event-stream"
+            )
+        
+        # Handle regular request
+        response = await assistant_service.process_multi_workspace_prompt(
+            workspace_ids=workspace_ids,
+            prompt=request.prompt,
+            model=request.model,
+            metadata_filter=metadata_filter
+        )
+        return {"id": request.id, "response": response}
+    except Exception as e:
+        logger.error(f"Error processing multi-workspace query: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 @router.post("/{workspace_id}")
 async def query_workspace(
     workspace_id: str,
@@ -65,7 +127,8 @@ async def query_workspace(
         response = await assistant_service.process_prompt(
             workspace_id=workspace_id, 
             prompt=request.prompt,
-            model=request.model
+            model=request.model,
+            metadata_filter=request.filter.to_metadata_filter() if request.filter else None
         )
         return {"id": request.id, "response": response}
     except Exception as e:
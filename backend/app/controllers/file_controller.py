@@ -1,14 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Path, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Path, Depends
 from typing import List
 from sqlalchemy.orm import Session
 from ..services.r2_service import r2_service
 from ..services.file_processing_service import file_processing_service
-from ..schemas.file import FileResponse, FileProcessRequest, FileProcessResponse
+from ..services.job_queue_service import job_queue_service
+from ..schemas.file import (
+    FileResponse,
+    FileProcessRequest,
+    FileProcessResponse,
+    PresignedUploadRequest,
+    PresignedUploadResponse,
+    CompleteUploadRequest
+)
+from ..schemas.job import JobResponse, JobGroupResponse
 from ..database import get_db
 from ..models.file import File as FileModel
+from ..config.settings import settings
+import asyncio
+import mimetypes
+import posixpath
 import uuid
+import zipfile
 import logging
-import io
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +29,6 @@ router = APIRouter()
 
 @router.post("/upload/{workspace_id}", status_code=201)
 async def upload_file(
-    background_tasks: BackgroundTasks,
     workspace_id: str = Path(..., title="Workspace Name"),
     file: UploadFile = File(..., description="The file to upload"),
     db: Session = Depends(get_db),
@@ -24,9 +36,10 @@ async def upload_file(
 ):
     """
     Upload a file to workspace:
-    1. Store file in R2 storage
+    1. Store file in R2 storage, unless identical content is already stored
     2. Save file metadata to PostgreSQL
-    3. Process file and store chunks in Pinecone
+    3. Process file and store chunks in Pinecone, or copy the vectors of the
+       identical file
     """
     try:
         logger.debug(f"Starting upload for file: {file.filename} in workspace: {workspace_id}")
@@ -34,24 +47,59 @@ async def upload_file(
             logger.debug("No file provided")
             raise HTTPException(status_code=400, detail="No file provided")
 
-        # Read file content first before any operations
-        file_content = await file.read()
-        file_size = len(file_content)
+        # 1. Hash the spooled upload to detect content that is already stored
+        content_hash = await asyncio.to_thread(file_processing_service.hash_file, file.file)
+        duplicate = file_processing_service.find_duplicate(db, content_hash, workspace_id)
 
-        # 1. Upload to R2 (create a new bytes object from content)
-        file_bytes = io.BytesIO(file_content)
-        result = await r2_service.upload_file(
-            file_obj=file_bytes,
-            workspace_name=workspace_id,
-            filename=file.filename
-        )
+        if duplicate and str(duplicate.workspace_id) == workspace_id:
+            # The workspace already holds this content and its vectors
+            logger.debug(f"Upload of {file.filename} matches existing file {duplicate.id}")
+            return {
+                "message": "File already exists in workspace",
+                "filename": duplicate.filename,
+                "file_id": str(duplicate.id),
+                "workspace_id": str(duplicate.workspace_id),
+                "dedup_hit": True,
+                "processing_status": "skipped"
+            }
+
+        if duplicate:
+            # Reuse the stored object and copy its vectors into this workspace
+            stored_key = duplicate.file_path
+            file_size = duplicate.file_size
+            job_type = "copy_vectors"
+            job_payload = {
+                "workspace_id": workspace_id,
+                "source_workspace_id": str(duplicate.workspace_id),
+                "file_key": stored_key
+            }
+        else:
+            # The upload replaces whatever was stored under its key
+            file_processing_service.clear_content_hashes(
+                db, [r2_service.object_key(workspace_id, file.filename)]
+            )
+            # Stream the spooled upload to R2 without reading it into memory
+            result = await r2_service.upload_stream(
+                file_obj=file.file,
+                workspace_name=workspace_id,
+                filename=file.filename,
+                content_type=file.content_type
+            )
+            stored_key = result["stored_key"]
+            file_size = result["size"]
+            job_type = "process_file"
+            job_payload = {
+                "workspace_id": workspace_id,
+                "file_key": stored_key
+            }
             
         # 2. Save file metadata to PostgreSQL using the service function
         file_data = {
             'filename': file.filename,
-            'file_path': result["stored_key"],
+            'file_path': stored_key,
             'file_size': file_size,
             'content_type': file.content_type,
+            'content_hash': content_hash,
             'workspace_id': workspace_id,
             'user_id': user_id
         }
@@ -64,13 +112,9 @@ async def upload_file(
             # Continue with other operations even if database save fails
             file_record = None
         
-        # 3. Process file in background for Pinecone indexing
-        background_tasks.add_task(
-            file_processing_service.process_file,
-            workspace_id,
-            result["stored_key"]
-        )
-        logger.debug("File processing task added to background tasks")
+        # 3. Queue the file for Pinecone indexing by the ingestion workers
+        job = job_queue_service.enqueue(db, job_type, job_payload)
+        logger.debug(f"File {job_type} job {job.id} queued")
         
         # Create response
         if file_record:
@@ -79,14 +123,18 @@ async def upload_file(
                 "filename": file_record.filename,
                 "file_id": str(file_record.id),
                 "workspace_id": str(file_record.workspace_id),
-                "processing_status": "started"
+                "job_id": job.id,
+                "dedup_hit": duplicate is not None,
+                "processing_status": "queued"
             }
         else:
             return {
                 "message": "File uploaded successfully but metadata could not be saved",
                 "filename": file.filename,
                 "workspace_id": str(workspace_id),
-                "processing_status": "started"
+                "job_id": job.id,
+                "dedup_hit": duplicate is not None,
+                "processing_status": "queued"
             }
     except Exception as e:
         logger.error(f"Error during file upload: {str(e)}")
@@ -95,6 +143,320 @@ async def upload_file(
         await file.close()
         logger.debug(f"File {file.filename} closed after upload process")
 
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+def _is_zip(upload: UploadFile) -> bool:
+    return upload.content_type in ZIP_CONTENT_TYPES or upload.filename.lower().endswith(".zip")
+
+def _member_name(name: str) -> str:
+    """Normalize a member name to a relative path, rejecting names that escape the archive"""
+    name = posixpath.normpath(name.replace("\\", "/"))
+    first = name.split("/", 1)[0]
+    if name.startswith("/") or first == ".." or ":" in first:
+        raise HTTPException(status_code=400, detail=f"Unsafe path in zip archive: {name}")
+    return name
+
+def _unique_name(name: str, taken: set) -> str:
+    """Suffix a name with (2), (3)... until no other file of the upload uses it"""
+    stem, extension = posixpath.splitext(name)
+    candidate, counter = name, 1
+    while candidate in taken:
+        counter += 1
+        candidate = f"{stem} ({counter}){extension}"
+    taken.add(candidate)
+    return candidate
+
+class _ZipBudget:
+    """Members and uncompressed bytes still accepted from the zip archives of one request"""
+
+    def __init__(self):
+        self.members = settings.ZIP_MAX_MEMBERS
+        self.bytes = settings.ZIP_MAX_UNCOMPRESSED_BYTES
+
+    def spend(self, member: zipfile.ZipInfo) -> None:
+        self.members -= 1
+        self.bytes -= member.file_size
+        if self.members < 0:
+            raise HTTPException(status_code=400, detail=f"Zip archives hold more than {settings.ZIP_MAX_MEMBERS} files")
+        if self.bytes < 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Zip archives exceed {settings.ZIP_MAX_UNCOMPRESSED_BYTES} uncompressed bytes"
+            )
+
+def _zip_members(archive: zipfile.ZipFile, taken: set, budget: _ZipBudget):
+    """
+    List (name, member) of the regular files of an archive, skipping
+    directories and OS metadata. Names are normalized relative paths, made
+    unique among the names in taken; each member is spent from budget.
+    """
+    members = []
+    for member in archive.infolist():
+        if member.is_dir():
+            continue
+        name = _member_name(member.filename)
+        if name.startswith("__MACOSX/") or posixpath.basename(name).startswith("."):
+            continue
+        budget.spend(member)
+        members.append((_unique_name(name, taken), member))
+    return members
+
+def _open_zip(upload: UploadFile, taken: set, budget: _ZipBudget):
+    """Read an uploaded archive's central directory and list its members"""
+    try:
+        archive = zipfile.ZipFile(upload.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"{upload.filename} is not a valid zip archive")
+    try:
+        return archive, _zip_members(archive, taken, budget)
+    except BaseException:
+        archive.close()
+        raise
+
+class _Unclosable:
+    """File wrapper whose close() is a no-op, so the UploadFile can close the real file"""
+
+    def __init__(self, file_obj):
+        self._file_obj = file_obj
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file_obj.read(size)
+
+    def close(self) -> None:
+        pass
+
+@router.post("/upload/{workspace_id}/bulk", status_code=201)
+async def upload_files_bulk(
+    workspace_id: str = Path(..., title="Workspace Name"),
+    files: List[UploadFile] = File(..., description="Files or zip archives to upload"),
+    db: Session = Depends(get_db),
+    user_id: str = "system"  # TODO: Replace with actual user authentication
+):
+    """
+    Upload many files to a workspace at once:
+    1. Stream all files, and the members of any zip archive, to R2 concurrently
+    2. Save all file metadata in one transaction
+    3. Queue processing of all files as one job group
+    """
+    semaphore = asyncio.Semaphore(settings.BULK_UPLOAD_CONCURRENCY)
+    archives = []
+
+    async def store(filename: str, content_type: str, open_file):
+        async with semaphore:
+            file_obj = await asyncio.to_thread(open_file)
+            try:
+                result = await r2_service.upload_stream(
+                    file_obj=file_obj,
+                    workspace_name=workspace_id,
+                    filename=filename,
+                    content_type=content_type
+                )
+            finally:
+                file_obj.close()
+            return {
+                'filename': filename,
+                'file_path': result["stored_key"],
+                'file_size': result["size"],
+                'content_type': content_type,
+                'content_hash': result["sha256"],
+                'workspace_id': workspace_id,
+                'user_id': user_id
+            }
+
+    try:
+        uploads = []
+        # Names are unique across the request, so no two files race for one R2 key
+        taken = set()
+        budget = _ZipBudget()
+        for upload in files:
+            if not upload.filename:
+                continue
+            if _is_zip(upload):
+                # Reading the central directory seeks through the spooled file
+                archive, members = await asyncio.to_thread(_open_zip, upload, taken, budget)
+                archives.append(archive)
+                for name, member in members:
+                    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                    uploads.append((name, content_type, lambda a=archive, m=member: a.open(m)))
+            else:
+                # Keep the spooled file open, the upload closes the returned wrapper only
+                name = _unique_name(upload.filename, taken)
+                uploads.append((name, upload.content_type, lambda u=upload: _Unclosable(u.file)))
+
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No files provided")
+
+        # The uploads replace whatever was stored under their keys
+        file_processing_service.clear_content_hashes(
+            db, [r2_service.object_key(workspace_id, filename) for filename, _, _ in uploads]
+        )
+
+        results = await asyncio.gather(
+            *(store(filename, content_type, open_file) for filename, content_type, open_file in uploads),
+            return_exceptions=True
+        )
+
+        stored = []
+        failed = []
+        for (filename, _, _), result in zip(uploads, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error uploading {filename}: {str(result)}")
+                failed.append({"filename": filename, "error": str(result)})
+            else:
+                stored.append(result)
+
+        file_records = await file_processing_service.save_files(db, stored) if stored else []
+
+        group_id = str(uuid.uuid4())
+        jobs = job_queue_service.enqueue_many(db, [
+            ("process_file", {"workspace_id": workspace_id, "file_key": record.file_path})
+            for record in file_records
+        ], group_id=group_id)
+
+        return {
+            "message": f"Uploaded {len(file_records)} of {len(uploads)} files",
+            "workspace_id": workspace_id,
+            "group_id": group_id,
+            "files": [
+                {"filename": record.filename, "file_id": str(record.id), "job_id": job.id}
+                for record, job in zip(file_records, jobs)
+            ],
+            "failed": failed,
+            "processing_status": "queued"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during bulk upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for archive in archives:
+            archive.close()
+        for upload in files:
+            await upload.close()
+
+@router.post("/presign/{workspace_id}", response_model=PresignedUploadResponse)
+async def create_presigned_upload(
+    request: PresignedUploadRequest,
+    workspace_id: str = Path(..., title="Workspace Name"),
+    db: Session = Depends(get_db)
+):
+    """
+    Create presigned URLs so the browser can upload a file directly to R2.
+
+    Upload the body with PUT to each URL in order, then call the complete
+    endpoint with the ETag of each part (or of the single PUT).
+    """
+    if request.file_size <= 0:
+        raise HTTPException(status_code=400, detail="file_size must be positive")
+
+    try:
+        # A single PUT replaces whatever was stored under the key right away
+        file_processing_service.clear_content_hashes(
+            db, [r2_service.object_key(workspace_id, request.filename)]
+        )
+        return await r2_service.create_presigned_upload(
+            workspace_name=workspace_id,
+            filename=request.filename,
+            file_size=request.file_size,
+            content_type=request.content_type
+        )
+    except Exception as e:
+        logger.error(f"Error creating presigned upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/complete/{workspace_id}", status_code=201)
+async def complete_upload(
+    request: CompleteUploadRequest,
+    workspace_id: str = Path(..., title="Workspace Name"),
+    db: Session = Depends(get_db),
+    user_id: str = "system"  # TODO: Replace with actual user authentication
+):
+    """
+    Finish a direct-to-R2 upload:
+    1. Complete the multipart upload, if any
+    2. Verify the stored object's size and ETag
+    3. Hash the stored object, so later uploads of the same content are deduplicated
+    4. Save file metadata and queue the file for processing
+    """
+    if request.object_key != r2_service.object_key(workspace_id, request.filename):
+        raise HTTPException(status_code=400, detail="object_key does not belong to this workspace and file")
+
+    try:
+        expected_etag = request.etag
+        if request.upload_id:
+            if not request.parts:
+                raise HTTPException(status_code=400, detail="parts are required to complete a multipart upload")
+            expected_etag = await r2_service.complete_multipart_upload(
+                request.object_key,
+                request.upload_id,
+                [{"PartNumber": part.part_number, "ETag": part.etag} for part in request.parts]
+            )
+
+        stored = await r2_service.head_file(request.object_key)
+        if stored is None:
+            raise HTTPException(status_code=400, detail="Uploaded object not found")
+        if stored["size"] != request.file_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Uploaded object is {stored['size']} bytes, expected {request.file_size}"
+            )
+        if expected_etag and stored["etag"].strip('"') != expected_etag.strip('"'):
+            raise HTTPException(status_code=400, detail="Uploaded object ETag does not match")
+
+        content_hash = await file_processing_service.hash_stored_file(request.object_key)
+        file_processing_service.clear_content_hashes(db, [request.object_key])
+        file_record = await file_processing_service.save_file(db, {
+            'filename': request.filename,
+            'file_path': request.object_key,
+            'file_size': stored["size"],
+            'content_type': request.content_type or stored["content_type"],
+            'content_hash': content_hash,
+            'workspace_id': workspace_id,
+            'user_id': user_id
+        })
+        job = job_queue_service.enqueue(db, "process_file", {
+            "workspace_id": workspace_id,
+            "file_key": request.object_key
+        })
+
+        return {
+            "message": "File uploaded successfully",
+            "filename": file_record.filename,
+            "file_id": str(file_record.id),
+            "workspace_id": str(file_record.workspace_id),
+            "job_id": job.id,
+            "dedup_hit": False,
+            "processing_status": "queued"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error completing upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/groups/{group_id}", response_model=JobGroupResponse)
+async def get_job_group(
+    group_id: str = Path(..., title="Job Group ID"),
+    db: Session = Depends(get_db)
+):
+    """Get the aggregate progress of a group of processing jobs"""
+    progress = job_queue_service.get_group_progress(db, group_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Job group not found")
+    return progress
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str = Path(..., title="Job ID"),
+    db: Session = Depends(get_db)
+):
+    """Get the status and stage timings of a processing job"""
+    job = job_queue_service.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.get("/{workspace_id}", response_model=List[FileResponse])
 async def list_files(
     workspace_id: str = Path(..., title="Workspace Name"),
@@ -118,30 +480,48 @@ async def list_files(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.delete("/{workspace_id}/{file_id}", status_code=204)
+async def delete_file(
+    workspace_id: str = Path(..., title="Workspace Name"),
+    file_id: str = Path(..., title="File ID"),
+    db: Session = Depends(get_db)
+):
+    """Delete a file, its stored object and all of its vectors"""
+    file_record = db.query(FileModel).filter(
+        FileModel.id == file_id,
+        FileModel.workspace_id == workspace_id
+    ).first()
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        await file_processing_service.delete_file(db, file_record)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/{workspace_id}/process-file", response_model=FileProcessResponse, status_code=202)
 async def process_file(
-    background_tasks: BackgroundTasks,
     workspace_id: str = Path(..., title="Workspace Name"),
-    request: FileProcessRequest = None
+    request: FileProcessRequest = None,
+    db: Session = Depends(get_db)
 ):
-    """Process a file and store its embeddings in Pinecone"""
+    """Queue a file for processing and storing its embeddings in Pinecone"""
     try:
         if not request.file_key:
             raise HTTPException(status_code=400, detail="file_key is required in request body")
 
-        # Add the processing task to background tasks
-        background_tasks.add_task(
-            file_processing_service.process_file,
-            workspace_id,
-            request.file_key,
-            request.index_name
-        )
+        # Queue the processing job for the ingestion workers
+        job = job_queue_service.enqueue(db, "process_file", {
+            "workspace_id": workspace_id,
+            "file_key": request.file_key
+        })
 
         return FileProcessResponse(
-            message="File processing started in background",
+            message="File processing queued",
             workspace=workspace_id,
             file_key=request.file_key,
-            index_name=request.index_name
+            index_name=request.index_name,
+            job_id=job.id
         )
     except HTTPException:
         raise
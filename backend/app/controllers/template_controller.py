@@ -130,7 +130,7 @@ async def duplicate_template(template_id: UUID, db: Session = Depends(get_db)):
             detail=f"Failed to duplicate template: {str(e)}"
         )
 
-async def template_event_generator(request_id: str, template_id: UUID, request: ProcessTemplateRequest, db: Session):
+async def template_event_generator(request_id: str, template: AITemplate, request: ProcessTemplateRequest, db: Session):
     """Generate SSE events for streaming responses when processing with a template"""
     try:
         # Start the streaming process
@@ -139,10 +139,11 @@ async def template_event_generator(request_id: str, template_id: UUID, request:
         # Get streaming response
         async for chunk in template_service.process_workspace_with_template_stream(
             db=db,
-            template_id=template_id,
+            template=template,
             workspace_id=request.workspace_id,
             user_input=request.user_input,
-            additional_context=request.additional_context
+            additional_context=request.additional_context,
+            metadata_filter=request.filter.to_metadata_filter() if request.filter else None
         ):
             if isinstance(chunk, dict):
                 # Format as SSE event
@@ -185,17 +186,18 @@ async def process_workspace_with_template(
         # Handle streaming request
         if request.stream:
             return StreamingResponse(
-                template_event_generator(request_id, request.template_id, request, db),
+                template_event_generator(request_id, template, request, db),
                 media_type="text/event-stream"
             )
         
         # Handle regular request
         result, metadata = await template_service.process_workspace_with_template(
             db=db,
-            template_id=request.template_id,
+            template=template,
             workspace_id=request.workspace_id,
             user_input=request.user_input,
-            additional_context=request.additional_context
+            additional_context=request.additional_context,
+            metadata_filter=request.filter.to_metadata_filter() if request.filter else None
         )
         
         return ProcessTemplateResponse(
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config.settings import settings
@@ -11,25 +11,28 @@ logger = logging.getLogger(__name__)
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
 try:
-    # Create PostgreSQL engine with appropriate settings
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        pool_pre_ping=True,  # Enable automatic reconnection
-        pool_size=5,         # Maximum number of connections in the pool
-        max_overflow=10,     # Maximum number of connections that can be created beyond pool_size
-        pool_timeout=30,     # Timeout for getting connection from pool
-        connect_args={
-            "connect_timeout": 10,  # Connection timeout in seconds
-            "application_name": "ai-insights"  # Application identifier in PostgreSQL
-        }
-    )
-    
-    # Test the connection
-    engine.connect()
-    logger.info("Successfully connected to PostgreSQL database")
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        # Local SQLite stand-in for development without PostgreSQL
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URL,
+            connect_args={"check_same_thread": False}
+        )
+    else:
+        # Create PostgreSQL engine with appropriate settings
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URL,
+            pool_pre_ping=True,  # Enable automatic reconnection
+            pool_size=5,         # Maximum number of connections in the pool
+            max_overflow=10,     # Maximum number of connections that can be created beyond pool_size
+            pool_timeout=30,     # Timeout for getting connection from pool
+            connect_args={
+                "connect_timeout": 10,  # Connection timeout in seconds
+                "application_name": "ai-insights"  # Application identifier in PostgreSQL
+            }
+        )
     
 except Exception as e:
-    logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
+    logger.error(f"Failed to create database engine: {str(e)}")
     raise
 
 # Create session factory
@@ -38,6 +41,14 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create base class for models
 Base = declarative_base()
 
+def check_connection() -> None:
+    """
+    Run a trivial query, opening the pool's first connection
+    """
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    logger.info(f"Successfully connected to {engine.dialect.name} database")
+
 def get_db() -> Generator:
     """
     Dependency function to get database session
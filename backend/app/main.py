@@ -1,14 +1,24 @@
 # backend/app/main.py
-from fastapi import FastAPI, status, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 from .config.settings import settings
+from .database import check_connection
 # from .controllers.ai_controller import router as ai_router
 # from .controllers.user_controller import router as user_router
 from .controllers.workspace_controller import router as workspace_router
 from .controllers.file_controller import router as file_router
 from .controllers.assistant_controller import router as assistant_router
 from .controllers.template_controller import router as template_router
+from .services.embedding_cache import query_embedding_cache
+from .services.answer_cache import answer_cache
+from .services.pinecone_service import pinecone_service
+from .services.embedding_version_service import embedding_version_service
+from .services.r2_service import r2_service
+from .services.assistant_service import assistant_service
+from .services.readiness_service import readiness_service
 
 # --- Langchain Basic Import Test ---
 try:
@@ -23,11 +33,31 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dependencies reported by /ready, warmed up concurrently at startup
+readiness_service.register("database", check_connection)
+readiness_service.register(
+    "vector_store",
+    lambda: embedding_version_service.store(embedding_version_service.active())
+)
+readiness_service.register("object_storage", r2_service.check_bucket)
+readiness_service.register("llm", assistant_service.warm_up)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up dependency clients in the background and close them on shutdown"""
+    warm_up = asyncio.create_task(readiness_service.warm_up())
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        await pinecone_service.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API for file management and vector storage",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -49,7 +79,20 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "ok",
-        "version": "0.1.0"
+        "version": "0.1.0",
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats()
+    }
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness endpoint reporting the warm-up status and timing of each dependency"""
+    ready, dependencies = await readiness_service.check()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "not_ready",
+        "dependencies": dependencies
     }
 
 @app.get("/api/langchain-test", tags=["Langchain"])
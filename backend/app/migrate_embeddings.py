@@ -0,0 +1,51 @@
+"""
+Embedding model migrations.
+
+Registers a new embedding version and enqueues the job that re-embeds every
+indexed chunk into it; app.worker runs the job and cuts over when done:
+
+    python -m app.migrate_embeddings start --model text-embedding-3-small --dimension 1536
+    python -m app.migrate_embeddings status
+    python -m app.migrate_embeddings abort
+"""
+import argparse
+import logging
+
+from .database import SessionLocal
+from .services.embedding_version_service import embedding_version_service
+
+logger = logging.getLogger(__name__)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate vectors to another embedding model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    start = commands.add_parser("start", help="Start building a version for a model")
+    start.add_argument("--model", required=True)
+    start.add_argument("--dimension", type=int, required=True)
+    commands.add_parser("status", help="List embedding versions")
+    commands.add_parser("abort", help="Abandon the version being built")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.command == "start":
+            version = embedding_version_service.start_migration(db, args.model, args.dimension)
+            print(f"Building embedding version {version.name} in index {version.index_name}")
+        elif args.command == "abort":
+            building = embedding_version_service.building()
+            if building is None:
+                print("No embedding version is being built")
+                return
+            embedding_version_service.abort_migration(db, building.name)
+            print(f"Aborted embedding version {building.name}")
+        else:
+            # Registers the first version if there is none yet
+            embedding_version_service.active()
+            for version in embedding_version_service.list_versions(db):
+                print(f"{version.name}\t{version.status}\t{version.model}\t{version.dimension}\t{version.index_name}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
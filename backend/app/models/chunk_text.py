@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+class ChunkText(Base):
+    """zlib-compressed text of a chunk, shared by every vector of the same content"""
+    __tablename__ = "chunk_texts"
+
+    chunk_hash = Column(String(64), primary_key=True)  # sha256 of the chunk text
+    text = Column(LargeBinary, nullable=False)
+    # Refreshed on every write, so garbage collection spares texts of chunks being indexed
+    written_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy.sql import func
+import uuid
+import enum
+
+from ..database import Base
+
+class EmbeddingVersionStatus(str, enum.Enum):
+    BUILDING = "building"
+    ACTIVE = "active"
+    RETIRED = "retired"
+    FAILED = "failed"
+    DROPPED = "dropped"
+
+class EmbeddingVersion(Base):
+    """An embedding model and the vector index holding the vectors it produced"""
+    __tablename__ = "embedding_versions"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String(50), nullable=False, unique=True)
+    model = Column(String(100), nullable=False)
+    dimension = Column(Integer, nullable=False)
+    index_name = Column(String(45), nullable=False)  # Pinecone index names are limited to 45 characters
+    status = Column(String(20), nullable=False, default=EmbeddingVersionStatus.BUILDING)  # At most one active version
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True))
+    retired_at = Column(DateTime(timezone=True))
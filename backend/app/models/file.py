@@ -12,6 +12,7 @@ class File(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(BigInteger, nullable=False)
     content_type = Column(String)
+    content_hash = Column(String(64), index=True)  # sha256 of the stored object
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     workspace_id = Column(String(36), ForeignKey("workspaces.id"), nullable=False)
     user_id = Column(String(36), nullable=False) 
\ No newline at end of file
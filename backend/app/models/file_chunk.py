@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, Integer, UniqueConstraint
+from sqlalchemy.sql import func
+import uuid
+
+from ..database import Base
+
+class FileChunk(Base):
+    """Manifest entry mapping a chunk of an indexed file to its vector"""
+    __tablename__ = "file_chunks"
+    __table_args__ = (
+        UniqueConstraint("namespace", "file_key", "chunk_hash", name="uq_file_chunks_namespace_file_hash"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    namespace = Column(String(255), nullable=False)
+    file_key = Column(String(512), nullable=False)
+    chunk_hash = Column(String(64), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    vector_id = Column(String(600), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
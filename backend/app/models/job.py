@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, DateTime, Integer, Text, JSON, Index
+from sqlalchemy.sql import func
+import uuid
+import enum
+
+from ..database import Base
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class Job(Base):
+    """Durable background job claimed and executed by app.worker"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("idx_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = Column(String(50), nullable=False)
+    group_id = Column(String(36), index=True)  # Set for jobs scheduled together, e.g. by a bulk upload
+    status = Column(String(20), nullable=False, default=JobStatus.PENDING)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    locked_by = Column(String(255))
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    timings = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True))
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Text, LargeBinary, UniqueConstraint
+
+from ..database import Base
+
+class LexicalNamespace(Base):
+    """Write state and corpus statistics of one namespace's BM25 index; its row lock serializes writers"""
+    __tablename__ = "lexical_namespaces"
+
+    namespace = Column(String(255), primary_key=True)
+    last_segment = Column(Integer, nullable=False, default=0)  # Number of the latest posting segment, one per write
+    unmerged_writes = Column(Integer, nullable=False, default=0)  # Writes since term segments were last merged
+    last_doc = Column(Integer, nullable=False, default=0)  # Highest document number assigned, numbers are never reused
+    doc_count = Column(Integer, nullable=False, default=0)  # Live documents
+    total_length = Column(BigInteger, nullable=False, default=0)  # Summed term count of live documents
+    dead_docs = Column(Integer, nullable=False, default=0)  # Deleted documents still referenced by postings
+
+class LexicalDocument(Base):
+    """A chunk in the BM25 index, numbered within its namespace"""
+    __tablename__ = "lexical_documents"
+    __table_args__ = (
+        UniqueConstraint("namespace", "vector_id", name="uq_lexical_documents_namespace_vector"),
+    )
+
+    namespace = Column(String(255), primary_key=True)
+    doc = Column(Integer, primary_key=True)
+    vector_id = Column(String(600), nullable=False)
+    length = Column(Integer, nullable=False)
+
+class LexicalPosting(Base):
+    """
+    One segment of a term's postings: packed document numbers (uint32), term
+    frequencies (uint16) and document lengths (uint16) appended by one write
+    """
+    __tablename__ = "lexical_postings"
+
+    namespace = Column(String(255), primary_key=True)
+    term = Column(Text, primary_key=True)
+    segment = Column(Integer, primary_key=True)
+    docs = Column(LargeBinary, nullable=False)
+    tfs = Column(LargeBinary, nullable=False)
+    lengths = Column(LargeBinary, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -20,5 +20,6 @@ class Workspace(Base):
     name = Column(String, nullable=False)
     description = Column(String)
     status = Column(String, default=WorkspaceStatus.ACTIVE)
+    content_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped whenever indexed content changes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
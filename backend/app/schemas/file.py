@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 class FileBase(BaseModel):
@@ -37,4 +37,29 @@ class FileProcessResponse(BaseModel):
     message: str
     workspace: str
     file_key: str
-    index_name: str 
\ No newline at end of file
+    index_name: str
+    job_id: Optional[str] = None 
+
+class PresignedUploadRequest(BaseModel):
+    filename: str
+    file_size: int
+    content_type: Optional[str] = None
+
+class PresignedUploadResponse(BaseModel):
+    object_key: str
+    upload_id: Optional[str] = None
+    part_size: Optional[int] = None
+    urls: List[str]
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteUploadRequest(BaseModel):
+    object_key: str
+    filename: str
+    file_size: int
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    upload_id: Optional[str] = None
+    parts: Optional[List[UploadedPart]] = None
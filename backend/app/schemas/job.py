@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    id: str
+    job_type: str
+    group_id: Optional[str] = None
+    status: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobGroupResponse(BaseModel):
+    group_id: str
+    total: int
+    pending: int
+    running: int
+    completed: int
+    failed: int
+    progress: float
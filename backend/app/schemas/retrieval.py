@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+
+class RetrievalFilter(BaseModel):
+    """Restricts retrieval to chunks of matching files"""
+    file_ids: Optional[List[str]] = None
+    content_types: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    # Only chunks overlapping this row range, for tabular files
+    row_start: Optional[int] = None
+    row_end: Optional[int] = None
+
+    def to_metadata_filter(self) -> Optional[Dict[str, Any]]:
+        """Translate into a vector metadata filter, or None if nothing is set"""
+        conditions = []
+        if self.file_ids is not None:
+            conditions.append({"file_id": {"$in": self.file_ids}})
+        if self.content_types is not None:
+            conditions.append({"content_type": {"$in": self.content_types}})
+        if self.uploaded_after is not None:
+            conditions.append({"uploaded_at": {"$gte": int(self.uploaded_after.timestamp())}})
+        if self.uploaded_before is not None:
+            conditions.append({"uploaded_at": {"$lte": int(self.uploaded_before.timestamp())}})
+        if self.row_start is not None:
+            conditions.append({"row_end": {"$gte": self.row_start}})
+        if self.row_end is not None:
+            conditions.append({"row_start": {"$lte": self.row_end}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
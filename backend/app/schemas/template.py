@@ -2,6 +2,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, UUID4
 from datetime import datetime
 import uuid
+from .retrieval import RetrievalFilter
 
 # Base model for common template fields
 class TemplateBase(BaseModel):
@@ -51,6 +52,7 @@ class ProcessTemplateRequest(BaseModel):
     template_id: UUID4
     user_input: Optional[str] = None
     additional_context: Optional[Dict[str, Any]] = None
+    filter: Optional[RetrievalFilter] = None
     stream: bool = False
 
 class ProcessTemplateResponse(BaseModel):
@@ -20,6 +20,7 @@ class WorkspaceUpdate(BaseModel):
 
 class WorkspaceInDB(WorkspaceBase):
     id: str
+    content_version: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
 
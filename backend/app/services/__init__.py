@@ -1,6 +1,16 @@
-from .r2_service import r2_service
-from .pinecone_service import pinecone_service
-from .file_processing_service import file_processing_service
-from .assistant_service import assistant_service
+import importlib
 
-__all__ = ["r2_service", "pinecone_service", "file_processing_service", "assistant_service"] 
\ No newline at end of file
+# Services are imported on first access, so importing one service doesn't load them all
+_SERVICE_MODULES = {
+    "r2_service": ".r2_service",
+    "pinecone_service": ".pinecone_service",
+    "file_processing_service": ".file_processing_service",
+    "assistant_service": ".assistant_service",
+}
+
+__all__ = list(_SERVICE_MODULES)
+
+def __getattr__(name):
+    if name in _SERVICE_MODULES:
+        return getattr(importlib.import_module(_SERVICE_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
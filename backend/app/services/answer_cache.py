@@ -0,0 +1,135 @@
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple
+import numpy as np
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# (workspace, workspace content version, model, template version, metadata filter)
+AnswerKey = Tuple[str, int, str, Optional[str], Optional[str]]
+
+@dataclass
+class CachedAnswer:
+    key: AnswerKey
+    embedding: np.ndarray
+    answer: str
+    extra: Dict[str, Any]
+    expires_at: float
+
+@dataclass
+class AnswerLookup:
+    """Result of an answer cache lookup, kept to store the answer on a miss"""
+    key: Optional[AnswerKey]
+    embedding: Optional[np.ndarray]
+    answer: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def hit(self) -> bool:
+        return self.answer is not None
+
+class AnswerCache:
+    """
+    In-process cache of LLM answers.
+
+    Answers are grouped by (workspace, content version, model, template
+    version, metadata filter); within a group, a prompt hits when its
+    embedding's cosine similarity to a cached prompt reaches the threshold.
+    Entries expire after ttl seconds and the least recently used are evicted
+    beyond max_entries. Bumping a workspace's content version makes all its
+    answers unreachable.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._groups: Dict[AnswerKey, Set[int]] = {}
+        self._ids = itertools.count()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        group = self._groups[entry.key]
+        group.discard(entry_id)
+        if not group:
+            del self._groups[entry.key]
+
+    def lookup(self, key: AnswerKey, embedding: List[float]) -> AnswerLookup:
+        """Find the cached answer of the most similar prompt in a group"""
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        best_id, best_similarity = None, self.threshold
+        for entry_id in list(self._groups.get(key, ())):
+            entry = self._entries[entry_id]
+            if entry.expires_at < now:
+                self._remove(entry_id)
+                continue
+            similarity = float(entry.embedding @ vector)
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None:
+            self.misses += 1
+            return AnswerLookup(key=key, embedding=vector)
+
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        entry = self._entries[best_id]
+        return AnswerLookup(key=key, embedding=vector, answer=entry.answer, extra=entry.extra)
+
+    def store(self, lookup: AnswerLookup, answer: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Cache the answer to a prompt that missed"""
+        if lookup.key is None or lookup.hit or not answer:
+            return
+        entry_id = next(self._ids)
+        self._entries[entry_id] = CachedAnswer(
+            key=lookup.key,
+            embedding=lookup.embedding,
+            answer=answer,
+            extra=extra or {},
+            expires_at=time.monotonic() + self.ttl
+        )
+        self._groups.setdefault(lookup.key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the number of cached answers"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+async def replay_answer(answer: str, chunk_chars: int) -> AsyncGenerator[str, None]:
+    """Stream a cached answer in word-aligned chunks, like an LLM response"""
+    start = 0
+    while start < len(answer):
+        end = min(start + chunk_chars, len(answer))
+        if end < len(answer):
+            space = answer.rfind(" ", start + 1, end)
+            if space != -1:
+                end = space + 1
+        yield answer[start:end]
+        start = end
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+)
@@ -1,42 +1,50 @@
+import asyncio
+import json
 import logging
-from typing import List, Dict, Any, AsyncGenerator
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_anthropic import ChatAnthropic
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_xai import ChatXAI
+import threading
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
 from ..services.pinecone_service import pinecone_service
+from ..services.embedding_cache import query_embedding_cache
+from ..services.embedding_version_service import EmbeddingVersionInfo, embedding_version_service
+from ..services.lexical_index_service import lexical_index_service
+from ..services.chunk_store_service import chunk_store_service
+from ..services.vector_store import VectorMatch
+from ..utils.ranking import reciprocal_rank_fusion
+from ..utils.context_packer import PackedContext, pack_context
+from ..utils.metadata_filter import matches_filter
+from ..services.answer_cache import AnswerLookup, answer_cache, replay_answer
+from ..models.workspace import Workspace
+from ..database import SessionLocal
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class AssistantService:
     def __init__(self):
-        # Models configuration
-        self.models = {
-            "gpt-3.5-turbo": self._create_openai_model("gpt-3.5-turbo"),
-            "gpt-4": self._create_openai_model("gpt-4"),
-            "gpt-4o": self._create_openai_model("gpt-4o"),
-            "claude-3-sonnet": self._create_anthropic_model("claude-3-sonnet"),
-            "claude-3-opus": self._create_anthropic_model("claude-3-opus"),
-            "grok-3": self._create_grok_model("grok-3"),
+        # Models configuration, each client is created on first use
+        self.model_factories = {
+            "gpt-3.5-turbo": self._create_openai_model,
+            "gpt-4": self._create_openai_model,
+            "gpt-4o": self._create_openai_model,
+            "claude-3-sonnet": self._create_anthropic_model,
+            "claude-3-opus": self._create_anthropic_model,
+            "grok-3": self._create_grok_model,
         }
+        self.models: Dict[str, Any] = {}
+        self._models_lock = threading.Lock()
         
         self.default_model = "gpt-3.5-turbo"
         
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-ada-002",
-            api_key=settings.OPENAI_API_KEY
-        )
-        
-        self.prompt_template = ChatPromptTemplate.from_messages([
+        self.prompt_messages = [
             ("system", "You are a helpful assistant that answers questions based on the provided context. Use the context to provide accurate and relevant answers."),
             ("human", "Context: {context}\n\nQuestion: {question}")
-        ])
+        ]
+        self.prompt_template = None
 
+    # Provider SDKs are imported by their factory, so only providers in use are loaded
     def _create_openai_model(self, model_name: str):
         """Create an OpenAI model instance"""
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             model_name=model_name,
             temperature=0.7,
@@ -46,6 +54,7 @@ class AssistantService:
         
     def _create_anthropic_model(self, model_name: str):
         """Create an Anthropic model instance"""
+        from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
             model_name=model_name,
             temperature=0.7,
@@ -56,6 +65,7 @@ class AssistantService:
     def _create_grok_model(self, model_name: str):
         """Create a Grok model instance using ChatXAI"""
         try:
+            from langchain_xai import ChatXAI
             return ChatXAI(
                 model=model_name,
                 temperature=0.7,
@@ -69,97 +79,388 @@ class AssistantService:
             logger.error(f"Error creating Grok model: {str(e)}")
             return None
 
+    def _build_chain(self, llm):
+        """Chain the prompt template, a model and a string output parser"""
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.runnables import RunnablePassthrough
+
+        if self.prompt_template is None:
+            self.prompt_template = ChatPromptTemplate.from_messages(self.prompt_messages)
+        return (
+            {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
+            | self.prompt_template
+            | llm
+            | StrOutputParser()
+        )
+
+    def warm_up(self) -> None:
+        """Create the default model's client ahead of the first prompt"""
+        self._get_model(self.default_model)
+
     def _get_model(self, model_name: str):
         """Get the appropriate model"""
-        if model_name in self.models:
+        if model_name not in self.model_factories:
+            logger.warning(f"Model {model_name} not found, using default {self.default_model}")
+            model_name = self.default_model
+        with self._models_lock:
+            if model_name not in self.models:
+                self.models[model_name] = self.model_factories[model_name](model_name)
             return self.models[model_name]
-        logger.warning(f"Model {model_name} not found, using default {self.default_model}")
-        return self.models[self.default_model]
 
-    async def process_prompt(self, workspace_id: str, prompt: str, model: str = None) -> str:
+    async def process_prompt(
+        self,
+        workspace_id: str,
+        prompt: str,
+        model: str = None,
+        context: Optional[str] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
-        Process a prompt using the workspace context from Pinecone
+        Process a prompt using the workspace context from Pinecone.
+        Pass a context packed by build_context() to skip retrieval, or a
+        metadata filter to restrict retrieval to matching files.
         """
         try:
-            # Get relevant context from Pinecone
-            context = await self._get_relevant_context(workspace_id, prompt)
+            model = model or self.default_model
+            
+            # Answer from the cache, or get relevant context from Pinecone
+            lookup = None
+            if context is None:
+                lookup = await self.lookup_answer(workspace_id, model, prompt, metadata_filter=metadata_filter)
+                if lookup.hit:
+                    return lookup.answer
+                matches = await self.retrieve(workspace_id, prompt, metadata_filter=metadata_filter)
+                context = self.build_context(matches, model).text
             
             # Get the appropriate model
-            llm = self._get_model(model or self.default_model)
+            llm = self._get_model(model)
             
             # Create a new chain with the selected model
-            chain = (
-                {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-                | self.prompt_template
-                | llm
-                | StrOutputParser()
-            )
+            chain = self._build_chain(llm)
             
             # Process the prompt with the context
             response = await chain.ainvoke(
                 {"context": context, "question": prompt}
             )
             
+            if lookup is not None:
+                answer_cache.store(lookup, response)
             return response
         except Exception as e:
             logger.error(f"Error processing prompt: {str(e)}", exc_info=True)
             raise
 
-    async def process_prompt_stream(self, workspace_id: str, prompt: str, model: str = None) -> AsyncGenerator[str, None]:
+    async def process_prompt_stream(
+        self,
+        workspace_id: str,
+        prompt: str,
+        model: str = None,
+        context: Optional[str] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> AsyncGenerator[str, None]:
         """
-        Process a prompt using the workspace context from Pinecone and stream the response
+        Process a prompt using the workspace context from Pinecone and stream the response.
+        Pass a context packed by build_context() to skip retrieval, or a
+        metadata filter to restrict retrieval to matching files.
         """
         try:
-            # Get relevant context from Pinecone
-            context = await self._get_relevant_context(workspace_id, prompt)
+            model = model or self.default_model
+            
+            # Replay a cached answer, or get relevant context from Pinecone
+            lookup = None
+            if context is None:
+                lookup = await self.lookup_answer(workspace_id, model, prompt, metadata_filter=metadata_filter)
+                if lookup.hit:
+                    async for chunk in replay_answer(lookup.answer, settings.ANSWER_CACHE_REPLAY_CHUNK_CHARS):
+                        yield chunk
+                    return
+                matches = await self.retrieve(workspace_id, prompt, metadata_filter=metadata_filter)
+                context = self.build_context(matches, model).text
             
             # Get the appropriate model
-            llm = self._get_model(model or self.default_model)
+            llm = self._get_model(model)
             
             # Set streaming to true
             if hasattr(llm, "streaming"):
                 llm.streaming = True
             
             # Create a new chain with the selected model
-            chain = (
-                {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-                | self.prompt_template
-                | llm
-                | StrOutputParser()
-            )
+            chain = self._build_chain(llm)
             
             # Process the prompt with streaming
+            parts = []
             async for chunk in chain.astream(
                 {"context": context, "question": prompt}
             ):
+                parts.append(chunk)
                 yield chunk
+            
+            if lookup is not None:
+                answer_cache.store(lookup, "".join(parts))
                 
         except Exception as e:
             logger.error(f"Error processing streaming prompt: {str(e)}", exc_info=True)
             yield {"error": str(e)}
             raise
 
-    async def _get_relevant_context(self, workspace_name: str, prompt: str) -> str:
+    async def process_multi_workspace_prompt(
+        self,
+        workspace_ids: List[str],
+        prompt: str,
+        model: str = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
-        Get relevant context from Pinecone based on the prompt
+        Process a prompt against several workspaces with a single LLM call
         """
         try:
-            # Get embeddings for the prompt
-            embeddings = await self.embeddings.aembed_query(prompt)
-            
-            # Query Pinecone for relevant documents
-            results = pinecone_service.query_vectors(
-                vector=embeddings,
-                top_k=5,
-                namespace=workspace_name
+            model = model or self.default_model
+            matches = await self.retrieve_many(workspace_ids, prompt, metadata_filter=metadata_filter)
+            return await self.process_prompt(
+                workspace_id=",".join(workspace_ids),
+                prompt=prompt,
+                model=model,
+                context=self.build_context(matches, model).text
             )
-            
-            # Combine the relevant text chunks
-            context = "\n".join([match.metadata["text"] for match in results])
-            return context
         except Exception as e:
-            logger.error(f"Error getting context: {str(e)}", exc_info=True)
+            logger.error(f"Error processing multi-workspace prompt: {str(e)}", exc_info=True)
+            raise
+
+    async def process_multi_workspace_prompt_stream(
+        self,
+        workspace_ids: List[str],
+        prompt: str,
+        model: str = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Process a prompt against several workspaces with a single LLM call and stream the response
+        """
+        model = model or self.default_model
+        try:
+            matches = await self.retrieve_many(workspace_ids, prompt, metadata_filter=metadata_filter)
+        except Exception as e:
+            logger.error(f"Error retrieving multi-workspace context: {str(e)}", exc_info=True)
+            yield {"error": str(e)}
             raise
+        async for chunk in self.process_prompt_stream(
+            workspace_id=",".join(workspace_ids),
+            prompt=prompt,
+            model=model,
+            context=self.build_context(matches, model).text
+        ):
+            yield chunk
+
+    async def embed_query(self, query: str, version: Optional[EmbeddingVersionInfo] = None) -> List[float]:
+        """
+        Embed a search query with the model of an embedding version, the active
+        one by default, reusing recent embeddings of the same query
+        """
+        version = version or await embedding_version_service.aactive()
+        return await query_embedding_cache.get_or_compute(
+            version.cache_name,
+            query,
+            embedding_version_service.embeddings(version).aembed_query
+        )
+
+    async def lookup_answer(
+        self,
+        workspace_id: str,
+        model: str,
+        query: str,
+        template_version: Optional[str] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> AnswerLookup:
+        """
+        Look up a cached answer to a similar query against the current content of the workspace
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return AnswerLookup(key=None, embedding=None)
+        
+        content_version, embedding = await asyncio.gather(
+            asyncio.to_thread(self._get_content_version, workspace_id),
+            self.embed_query(query)
+        )
+        filter_key = json.dumps(metadata_filter, sort_keys=True) if metadata_filter else None
+        return answer_cache.lookup(
+            (workspace_id, content_version, model, template_version, filter_key),
+            embedding
+        )
+
+    @staticmethod
+    def _get_content_version(workspace_id: str) -> int:
+        """Read the content version of a workspace, bumped on every ingest and delete"""
+        db = SessionLocal()
+        try:
+            row = db.query(Workspace.content_version).filter(Workspace.id == workspace_id).first()
+            return row.content_version if row else 0
+        finally:
+            db.close()
+
+    async def retrieve(
+        self,
+        workspace_name: str,
+        query: str,
+        top_k: Optional[int] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hydrate: bool = True
+    ) -> List[Any]:
+        """
+        Get the chunks most relevant to a query, among those whose metadata matches the filter.
+
+        Vector and BM25 results are fused with reciprocal rank fusion, so
+        exact tokens such as emails or URL paths are found even when the
+        embedding misses them. Unless hydrate is False, the chunk text is
+        loaded into each match's metadata.
+        """
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+        try:
+            if not settings.LEXICAL_INDEX_ENABLED:
+                matches = await self._vector_search(workspace_name, query, top_k, metadata_filter)
+                return await chunk_store_service.hydrate(matches) if hydrate else matches
+
+            candidates = max(top_k, settings.HYBRID_CANDIDATES)
+            # The lexical index can't filter, so over-fetch and filter its hits afterwards
+            lexical_candidates = candidates * 4 if metadata_filter else candidates
+            vector_matches, lexical_hits = await asyncio.gather(
+                self._vector_search(workspace_name, query, candidates, metadata_filter),
+                lexical_index_service.asearch(query, lexical_candidates, namespace=workspace_name)
+            )
+            matches = await self._fuse(workspace_name, vector_matches, lexical_hits, top_k, metadata_filter)
+            return await chunk_store_service.hydrate(matches) if hydrate else matches
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}", exc_info=True)
+            raise
+
+    async def retrieve_many(
+        self,
+        workspace_names: List[str],
+        query: str,
+        top_k: Optional[int] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[VectorMatch]:
+        """
+        Get the chunks most relevant to a query across several workspaces.
+
+        The query is embedded once and the workspaces are searched
+        concurrently. Matches are merged on their raw scores, which share a
+        scale across workspaces: cosine similarities of the same model, or RRF
+        values of the same k. Equal RRF values are ordered by vector
+        similarity. Texts of the merged matches are hydrated in one lookup.
+        """
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+        # Embed up front, every workspace search then hits the query embedding cache
+        await self.embed_query(query)
+        results = await asyncio.gather(*(
+            self.retrieve(workspace_name, query, top_k, metadata_filter, hydrate=False)
+            for workspace_name in workspace_names
+        ))
+
+        merged = []
+        for workspace_name, matches in zip(workspace_names, results):
+            for match in matches:
+                metadata = dict(match.metadata or {})
+                # Copied files share sources across workspaces, keep their chunks apart when packing
+                metadata["source"] = f"{workspace_name}/{metadata.get('source', match.id)}"
+                metadata["workspace_id"] = workspace_name
+                # Keep the raw similarity for the context packer's cutoff
+                metadata.setdefault("similarity", match.score)
+                merged.append(VectorMatch(
+                    id=f"{workspace_name}:{match.id}",
+                    score=match.score,
+                    metadata=metadata
+                ))
+
+        merged.sort(key=self._merge_key, reverse=True)
+        return await chunk_store_service.hydrate(merged[:top_k])
+
+    @staticmethod
+    def _merge_key(match: VectorMatch) -> Tuple[float, float]:
+        """Rank by score, then by vector similarity; lexical-only hits have none and go last among equals"""
+        similarity = match.metadata.get("similarity")
+        return match.score, similarity if similarity is not None else float("-inf")
+
+    async def _vector_search(
+        self,
+        workspace_name: str,
+        query: str,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Query Pinecone with the query's embedding"""
+        # Embed and query with the same version, even if a cutover happens in between
+        version = await embedding_version_service.aactive()
+        embeddings = await self.embed_query(query, version)
+        store = await pinecone_service.afor_version(version)
+        return await store.aquery_vectors(
+            vector=embeddings,
+            top_k=top_k,
+            namespace=workspace_name,
+            filter=metadata_filter
+        )
+
+    async def _fuse(
+        self,
+        workspace_name: str,
+        vector_matches: List[Any],
+        lexical_hits: List[Any],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[VectorMatch]:
+        """
+        Fuse vector and lexical rankings, fetching metadata of lexical-only hits.
+
+        Fused scores are RRF values, so each match's vector similarity is kept
+        in metadata["similarity"], None for lexical-only hits.
+        """
+        metadata = {match.id: match.metadata for match in vector_matches}
+        similarities = {match.id: match.score for match in vector_matches}
+        lexical_ids = [vector_id for vector_id, _ in lexical_hits]
+        if metadata_filter:
+            # Lexical hits must pass the filter before they can be ranked
+            await self._fetch_metadata(workspace_name, lexical_ids, metadata)
+            lexical_ids = [
+                vector_id for vector_id in lexical_ids
+                if vector_id in metadata and matches_filter(metadata[vector_id], metadata_filter)
+            ]
+
+        fused = reciprocal_rank_fusion(
+            [[match.id for match in vector_matches], lexical_ids],
+            k=settings.RRF_K
+        )[:top_k]
+        await self._fetch_metadata(workspace_name, [vector_id for vector_id, _ in fused], metadata)
+
+        return [
+            VectorMatch(
+                id=vector_id,
+                score=score,
+                metadata={**metadata[vector_id], "similarity": similarities.get(vector_id)}
+            )
+            for vector_id, score in fused
+            if metadata.get(vector_id)
+        ]
+
+    @staticmethod
+    async def _fetch_metadata(workspace_name: str, vector_ids: List[str], metadata: Dict[str, Dict[str, Any]]) -> None:
+        """Add the metadata of vectors not yet in metadata"""
+        missing = [vector_id for vector_id in vector_ids if vector_id not in metadata]
+        if missing:
+            fetched = await pinecone_service.afetch_vectors(missing, namespace=workspace_name)
+            metadata.update({vector_id: vector.metadata or {} for vector_id, vector in fetched.items()})
+
+    def build_context(self, matches: List[Any], model: Optional[str] = None) -> PackedContext:
+        """
+        Pack retrieved matches into the LLM context within the model's token budget
+        """
+        model = model or self.default_model
+        return pack_context(
+            matches,
+            model_name=model,
+            token_budget=settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_DEFAULT_TOKEN_BUDGET),
+            relative_cutoff=settings.CONTEXT_RELATIVE_SCORE_CUTOFF,
+            diversity=settings.CONTEXT_MMR_DIVERSITY
+        )
 
 # Initialize the service
 assistant_service = AssistantService() 
\ No newline at end of file
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List
+from sqlalchemy import exists
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from ..models.chunk_text import ChunkText
+from ..models.file_chunk import FileChunk
+from ..database import SessionLocal
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Chunk hashes per IN clause
+LOOKUP_BATCH_SIZE = 1000
+
+class ChunkStoreService:
+    """
+    Chunk text kept in the database instead of vector metadata.
+
+    Texts are zlib-compressed and keyed by the sha256 of their content, so a
+    chunk shared by several files or workspaces is stored once. Vectors only
+    carry the chunk hash; retrieved matches are hydrated in one batched query.
+    Each chunk is stored whole, overlap included: the hash keying lets
+    re-uploads keep unchanged chunks and copies share them, which offsets into
+    a per-document text would not.
+    """
+
+    def __init__(self, compression_level: int, gc_grace_seconds: int):
+        self.compression_level = compression_level
+        self.gc_grace_seconds = gc_grace_seconds
+
+    def put_texts(self, db: Session, texts: Dict[str, str]) -> None:
+        """Store texts keyed by chunk hash, refreshing the write time of existing ones"""
+        if not texts:
+            return
+        rows = [
+            {"chunk_hash": chunk_hash, "text": zlib.compress(text.encode("utf-8"), self.compression_level)}
+            for chunk_hash, text in texts.items()
+        ]
+        # Both dialects support upserts, with the same API
+        insert = sqlite.insert if db.bind.dialect.name == "sqlite" else postgresql.insert
+        statement = insert(ChunkText).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[ChunkText.chunk_hash],
+            set_={"written_at": func.now()}
+        ))
+
+    def get_texts(self, db: Session, chunk_hashes: Iterable[str]) -> Dict[str, str]:
+        """Load texts by chunk hash; unknown hashes are left out"""
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        texts = {}
+        for start in range(0, len(chunk_hashes), LOOKUP_BATCH_SIZE):
+            rows = db.query(ChunkText.chunk_hash, ChunkText.text).filter(
+                ChunkText.chunk_hash.in_(chunk_hashes[start:start + LOOKUP_BATCH_SIZE])
+            ).all()
+            texts.update({row.chunk_hash: zlib.decompress(row.text).decode("utf-8") for row in rows})
+        return texts
+
+    def delete_unreferenced(self, db: Session, chunk_hashes: Iterable[str]) -> int:
+        """
+        Delete texts no manifest entry refers to any more.
+
+        Texts written within the grace period are kept, since a file being
+        indexed stores its texts before its manifest entries.
+        """
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.gc_grace_seconds)
+        deleted = 0
+        for start in range(0, len(chunk_hashes), LOOKUP_BATCH_SIZE):
+            deleted += db.query(ChunkText).filter(
+                ChunkText.chunk_hash.in_(chunk_hashes[start:start + LOOKUP_BATCH_SIZE]),
+                ChunkText.written_at < cutoff,
+                ~exists().where(FileChunk.chunk_hash == ChunkText.chunk_hash)
+            ).delete(synchronize_session=False)
+        return deleted
+
+    def store(self, texts: Dict[str, str]) -> None:
+        """Store texts in a session of their own"""
+        db = SessionLocal()
+        try:
+            self.put_texts(db, texts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def load(self, chunk_hashes: Iterable[str]) -> Dict[str, str]:
+        """Load texts in a session of their own"""
+        db = SessionLocal()
+        try:
+            return self.get_texts(db, chunk_hashes)
+        finally:
+            db.close()
+
+    async def astore(self, texts: Dict[str, str]) -> None:
+        await asyncio.to_thread(self.store, texts)
+
+    async def aload(self, chunk_hashes: Iterable[str]) -> Dict[str, str]:
+        return await asyncio.to_thread(self.load, list(chunk_hashes))
+
+    async def hydrate(self, matches: List[Any]) -> List[Any]:
+        """
+        Fill in metadata["text"] of matches from the store.
+
+        Vectors indexed before the store existed still carry their text and
+        are left as they are.
+        """
+        missing = [
+            match for match in matches
+            if match.metadata and not match.metadata.get("text") and match.metadata.get("chunk_hash")
+        ]
+        if not missing:
+            return matches
+
+        texts = await self.aload(match.metadata["chunk_hash"] for match in missing)
+        for match in missing:
+            text = texts.get(match.metadata["chunk_hash"])
+            if text is None:
+                logger.warning(f"No stored text for chunk {match.metadata['chunk_hash']} of vector {match.id}")
+                continue
+            match.metadata["text"] = text
+        return matches
+
+# Initialize the service
+chunk_store_service = ChunkStoreService(
+    compression_level=settings.CHUNK_STORE_COMPRESSION_LEVEL,
+    gc_grace_seconds=settings.CHUNK_STORE_GC_GRACE_SECONDS
+)
@@ -0,0 +1,332 @@
+import array
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Blob encodings, stored per row so the cache survives a dtype change
+DTYPE_CODES = {
+    "float32": "f",
+    "float16": "e",
+}
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache backed by SQLite.
+
+    Entries are keyed by sha256(model + normalized text) and stored as packed
+    float blobs. When the total blob size exceeds max_bytes, the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, dtype: str = "float32"):
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype_code = DTYPE_CODES[dtype]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._approx_bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, "
+                "dtype TEXT NOT NULL, "
+                "vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+            )
+            self._approx_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()[0]
+            self._conn = conn
+            logger.info(f"Embedding cache opened at {self.path} ({self._approx_bytes} bytes)")
+        return self._conn
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so that trivially different inputs share a cache entry"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def make_key(cls, model_name: str, text: str) -> bytes:
+        """Build the cache key for a model and text"""
+        return hashlib.sha256(f"{model_name}\0{cls.normalize(text)}".encode("utf-8")).digest()
+
+    def _pack(self, vector: List[float]) -> bytes:
+        if self.dtype_code == "f":
+            return array.array("f", vector).tobytes()
+        return struct.pack(f"<{len(vector)}e", *vector)
+
+    @staticmethod
+    def _unpack(dtype_code: str, blob: bytes) -> List[float]:
+        if dtype_code == "f":
+            return array.array("f", blob).tolist()
+        return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts, returning None for misses"""
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[bytes, List[float]] = {}
+
+        with self._lock:
+            conn = self._connect()
+            unique_keys = list(set(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, dtype_code, blob in rows:
+                    found[key] = self._unpack(dtype_code, blob)
+
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store embeddings for texts and evict old entries if over budget"""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = self._pack(vector)
+            rows.append((self.make_key(model_name, text), self.dtype_code, blob, len(blob), now))
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, vector, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._approx_bytes += sum(row[3] for row in rows)
+            if self._approx_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Evict least recently used entries down to 90% of the size budget"""
+        # Other processes may share the file, so recount before evicting
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total <= self.max_bytes:
+            self._approx_bytes = total
+            return
+
+        to_free = total - target
+        freed = 0
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            evicted.append((key,))
+            freed += size
+            if freed >= to_free:
+                break
+
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._approx_bytes = total - freed
+        logger.info(f"Evicted {len(evicted)} entries ({freed} bytes) from embedding cache")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self._approx_bytes,
+        }
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an EmbeddingCache before calling the model"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    @staticmethod
+    def _missing_texts(texts: List[str], cached: List[Optional[List[float]]]) -> List[str]:
+        """Return the distinct texts that were not found in the cache"""
+        return list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+
+    @staticmethod
+    def _merge(texts: List[str], cached: List[Optional[List[float]]], missing: List[str], computed: List[List[float]]) -> List[List[float]]:
+        computed_by_text = dict(zip(missing, computed))
+        return [
+            vector if vector is not None else computed_by_text[text]
+            for text, vector in zip(texts, cached)
+        ]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(self.model_name, texts)
+        missing = self._missing_texts(texts, cached)
+        computed = []
+        if missing:
+            computed = self.embeddings.embed_documents(missing)
+            self.cache.put_many(self.model_name, missing, computed)
+        return self._merge(texts, cached, missing, computed)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = await asyncio.to_thread(self.cache.get_many, self.model_name, texts)
+        missing = self._missing_texts(texts, cached)
+        computed = []
+        if missing:
+            computed = await self.embeddings.aembed_documents(missing)
+            await asyncio.to_thread(self.cache.put_many, self.model_name, missing, computed)
+        return self._merge(texts, cached, missing, computed)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache of query embeddings with a TTL and a memory cap.
+
+    Vectors are held as packed float32 arrays. Concurrent lookups of the same
+    query share a single embedding request.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, array.array]]" = OrderedDict()
+        self._pending: Dict[bytes, asyncio.Future] = {}
+
+    def _get(self, key: bytes) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return vector.tolist()
+
+    def _put(self, key: bytes, vector: List[float]) -> None:
+        packed = array.array("f", vector)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, packed)
+        self._bytes += packed.itemsize * len(packed)
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: bytes) -> None:
+        _, vector = self._entries.pop(key)
+        self._bytes -= vector.itemsize * len(vector)
+
+    async def get_or_compute(
+        self,
+        model_name: str,
+        text: str,
+        compute: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        """Return the cached embedding for a query, computing it on a miss"""
+        key = EmbeddingCache.make_key(model_name, text)
+        vector = self._get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Another request is already embedding this query
+            self.hits += 1
+            return list(await asyncio.shield(pending))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            vector = await compute(text)
+            self._put(key, vector)
+            future.set_result(vector)
+            return vector
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller is waiting
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+def with_embedding_cache(embeddings: Embeddings, model_name: str) -> Embeddings:
+    """Put the shared embedding cache in front of an embeddings client, if enabled"""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return CachedEmbeddings(embeddings, embedding_cache, model_name)
+
+embedding_cache = EmbeddingCache(
+    path=settings.EMBEDDING_CACHE_PATH,
+    max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+    dtype=settings.EMBEDDING_CACHE_DTYPE
+)
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_bytes=settings.QUERY_EMBEDDING_CACHE_MAX_BYTES,
+    ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+)
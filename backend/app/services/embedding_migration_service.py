@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .embedding_version_service import EmbeddingVersionInfo, embedding_version_service
+from .file_processing_service import file_processing_service
+from .job_queue_service import utcnow
+from ..models.embedding_version import EmbeddingVersionStatus
+from ..models.file import File as FileModel
+from ..models.file_chunk import FileChunk
+from ..database import SessionLocal
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingMigrationService:
+    """
+    Fills a building embedding version and cuts over to it.
+
+    Every uploaded file is re-embedded from the chunk store, several files at
+    a time. Files without a manifest, indexed before manifests existed or not
+    indexed yet, are first processed again from R2 so they aren't left out
+    of the new version; those that fail to process are skipped and reported.
+    Files uploaded or indexed into the active version meanwhile are caught up
+    before the cutover, and once more after it for processes that had not yet
+    noticed the new version.
+    """
+
+    def _list_files(self, since: Optional[datetime]) -> List[Tuple[str, str, bool]]:
+        """
+        List (namespace, file key, has manifest) of uploaded files, or of those
+        uploaded or with chunks indexed since a time
+        """
+        db = SessionLocal()
+        try:
+            uploaded = db.query(FileModel.workspace_id, FileModel.file_path).distinct()
+            indexed = db.query(FileChunk.namespace, FileChunk.file_key).distinct()
+            manifested = {(row.namespace, row.file_key) for row in indexed.all()}
+            if since is not None:
+                uploaded = uploaded.filter(FileModel.created_at >= since)
+                indexed = indexed.filter(FileChunk.created_at >= since)
+
+            files = {(str(row.workspace_id), row.file_path) for row in uploaded.all()}
+            if since is not None:
+                files.update((row.namespace, row.file_key) for row in indexed.all())
+            return [(namespace, file_key, (namespace, file_key) in manifested) for namespace, file_key in sorted(files)]
+        finally:
+            db.close()
+
+    async def _migrate_files(
+        self,
+        source: EmbeddingVersionInfo,
+        target: EmbeddingVersionInfo,
+        since: Optional[datetime]
+    ) -> Tuple[int, int, List[str]]:
+        """
+        Re-embed files into the target version; returns the file and vector
+        counts and the keys of files skipped because they could not be indexed.
+
+        Files that were never indexed and fail to process are skipped, they
+        have no vectors to lose. Any indexed file that fails to migrate raises
+        once every file has been tried, so the cutover waits for a rerun.
+        """
+        files = await asyncio.to_thread(self._list_files, since)
+        semaphore = asyncio.Semaphore(settings.EMBEDDING_MIGRATION_CONCURRENCY)
+
+        async def migrate(namespace: str, file_key: str, has_manifest: bool) -> Optional[int]:
+            async with semaphore:
+                if not has_manifest:
+                    # Index the file from R2 first, which gives it a manifest to migrate from
+                    try:
+                        await file_processing_service.process_file(namespace, file_key)
+                    except Exception as e:
+                        logger.warning(f"Skipping {file_key} in {namespace}, it could not be indexed: {str(e)}")
+                        return None
+                return await file_processing_service.migrate_file_vectors(source, target, namespace, file_key)
+
+        results = await asyncio.gather(*(migrate(*file) for file in files), return_exceptions=True)
+
+        vectors = 0
+        skipped = []
+        failed = []
+        for (namespace, file_key, _), result in zip(files, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Could not migrate {file_key} in {namespace}: {str(result)}")
+                failed.append(file_key)
+            elif result is None:
+                skipped.append(file_key)
+            else:
+                vectors += result
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(files)} files could not be migrated to embedding version {target.name}, "
+                f"first: {failed[0]}"
+            )
+
+        migrated = len(files) - len(skipped)
+        logger.info(
+            f"Migrated {vectors} vectors of {migrated} files to embedding version {target.name}, "
+            f"skipped {len(skipped)} files that could not be indexed"
+        )
+        return migrated, vectors, skipped
+
+    def _get_version(self, name: str) -> Optional[EmbeddingVersionInfo]:
+        db = SessionLocal()
+        try:
+            version = embedding_version_service.get(db, name)
+            return embedding_version_service.snapshot(version) if version else None
+        finally:
+            db.close()
+
+    def _cutover(self, name: str) -> None:
+        db = SessionLocal()
+        try:
+            embedding_version_service.cutover(db, name)
+        finally:
+            db.close()
+
+    async def migrate(self, name: str) -> Dict[str, Any]:
+        """
+        Build an embedding version and make it active
+
+        Returns:
+            dict: File and vector counts, keys of skipped files and per-stage timings in seconds
+        """
+        target = await asyncio.to_thread(self._get_version, name)
+        if target is None or target.status != EmbeddingVersionStatus.BUILDING:
+            logger.info(f"Embedding version {name} is not being built, nothing to migrate")
+            return {"timings": {}}
+
+        source = await embedding_version_service.aactive()
+        timings: Dict[str, float] = {}
+
+        stage_start = time.perf_counter()
+        backfill_start = utcnow()
+        files, vectors, skipped = await self._migrate_files(source, target, None)
+        timings["backfill"] = time.perf_counter() - stage_start
+
+        # Files indexed into the active version during the backfill
+        stage_start = time.perf_counter()
+        catch_up_start = utcnow()
+        counts = await self._migrate_files(source, target, backfill_start)
+        files, vectors, skipped = files + counts[0], vectors + counts[1], skipped + counts[2]
+        timings["catch_up"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        await asyncio.to_thread(self._cutover, name)
+        timings["cutover"] = time.perf_counter() - stage_start
+
+        # Other processes keep indexing into the old version until they refresh
+        stage_start = time.perf_counter()
+        await asyncio.sleep(settings.EMBEDDING_VERSION_REFRESH_SECONDS)
+        counts = await self._migrate_files(source, target, catch_up_start)
+        files, vectors, skipped = files + counts[0], vectors + counts[1], skipped + counts[2]
+        timings["final_catch_up"] = time.perf_counter() - stage_start
+
+        logger.info(
+            f"Embedding version {name} built from {source.name}: {files} files, {vectors} vectors, "
+            f"{len(skipped)} files skipped"
+        )
+        return {
+            "files": files,
+            "vectors": vectors,
+            "skipped": sorted(set(skipped)),
+            "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()}
+        }
+
+    async def drop(self, name: str) -> None:
+        """Delete the index of a retired or failed version"""
+        def drop_version():
+            db = SessionLocal()
+            try:
+                embedding_version_service.drop(db, name)
+            finally:
+                db.close()
+
+        await asyncio.to_thread(drop_version)
+
+embedding_migration_service = EmbeddingMigrationService()
@@ -0,0 +1,394 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .embedding_cache import with_embedding_cache
+from .job_queue_service import job_queue_service, utcnow
+from .vector_store import VectorStore
+from ..models.embedding_version import EmbeddingVersion, EmbeddingVersionStatus
+from ..models.workspace import Workspace
+from ..database import SessionLocal
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Models that accept a reduced output dimension
+RESIZABLE_MODEL_PREFIX = "text-embedding-3"
+
+@dataclass(frozen=True)
+class EmbeddingVersionInfo:
+    """Snapshot of an embedding version, safe to share across threads"""
+    name: str
+    model: str
+    dimension: int
+    index_name: str
+    status: str
+
+    @property
+    def cache_name(self) -> str:
+        """Name the embeddings of this version are cached under"""
+        if self.model.startswith(RESIZABLE_MODEL_PREFIX):
+            return f"{self.model}-{self.dimension}"
+        return self.model
+
+class EmbeddingVersionService:
+    """
+    Registry of embedding models and the versioned vector indexes holding their vectors.
+
+    One version is active: it serves queries and new ingestion. A migration
+    fills a building version in the background and swaps it in with a single
+    transaction, so reads keep hitting the active version until then.
+    Processes re-read the registry every refresh_seconds.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._active: Optional[EmbeddingVersionInfo] = None
+        self._building: Optional[EmbeddingVersionInfo] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        # Clients are registered under their own locks, never while the registry loads
+        self._clients_lock = threading.Lock()
+        self._store_locks: Dict[str, threading.Lock] = {}
+        self._stores: Dict[str, VectorStore] = {}
+        self._embeddings: Dict[str, Embeddings] = {}
+
+    @staticmethod
+    def snapshot(version: EmbeddingVersion) -> EmbeddingVersionInfo:
+        return EmbeddingVersionInfo(
+            name=version.name,
+            model=version.model,
+            dimension=version.dimension,
+            index_name=version.index_name,
+            status=version.status
+        )
+
+    def _bootstrap(self, db: Session) -> None:
+        """Register the index that predates versioning as the first active version"""
+        db.add(EmbeddingVersion(
+            name="v1",
+            model=settings.EMBEDDING_MODEL,
+            dimension=settings.EMBEDDING_DIMENSION,
+            index_name=settings.PINECONE_INDEX_NAME,
+            status=EmbeddingVersionStatus.ACTIVE,
+            activated_at=utcnow()
+        ))
+        try:
+            db.commit()
+            logger.info(f"Registered {settings.EMBEDDING_MODEL} as embedding version v1")
+        except IntegrityError:
+            # Another process registered it first
+            db.rollback()
+
+    def _load(self) -> None:
+        db = SessionLocal()
+        try:
+            if db.query(EmbeddingVersion.id).first() is None:
+                self._bootstrap(db)
+            versions = db.query(EmbeddingVersion).filter(
+                EmbeddingVersion.status.in_([EmbeddingVersionStatus.ACTIVE, EmbeddingVersionStatus.BUILDING])
+            ).all()
+            infos = [self.snapshot(version) for version in versions]
+        finally:
+            db.close()
+
+        active = next((info for info in infos if info.status == EmbeddingVersionStatus.ACTIVE), None)
+        if active is None:
+            raise RuntimeError("No active embedding version")
+        if self._active is None and (active.model, active.dimension) != (settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION):
+            logger.warning(
+                f"EMBEDDING_MODEL is {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_DIMENSION}) but embedding "
+                f"version {active.name} uses {active.model} ({active.dimension}); "
+                f"run python -m app.migrate_embeddings start to migrate"
+            )
+        self._active = active
+        self._building = next((info for info in infos if info.status == EmbeddingVersionStatus.BUILDING), None)
+        self._loaded_at = time.monotonic()
+
+    def _is_stale(self) -> bool:
+        return self._active is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if self._is_stale():
+                self._load()
+
+    def active(self) -> EmbeddingVersionInfo:
+        """The version serving queries and new ingestion"""
+        self._refresh()
+        return self._active
+
+    def building(self) -> Optional[EmbeddingVersionInfo]:
+        """The version a migration is filling, if any"""
+        self._refresh()
+        return self._building
+
+    async def aactive(self) -> EmbeddingVersionInfo:
+        if self._is_stale():
+            await asyncio.to_thread(self._refresh)
+        return self._active
+
+    async def abuilding(self) -> Optional[EmbeddingVersionInfo]:
+        if self._is_stale():
+            await asyncio.to_thread(self._refresh)
+        return self._building
+
+    def store(self, version: EmbeddingVersionInfo) -> VectorStore:
+        """
+        Vector store of a version, created on first use.
+
+        Creating a store may call the vector database, so it happens under a
+        lock of its index only; other indexes and the registry aren't held up.
+        """
+        store = self._stores.get(version.index_name)
+        if store is not None:
+            return store
+        with self._clients_lock:
+            index_lock = self._store_locks.setdefault(version.index_name, threading.Lock())
+        with index_lock:
+            store = self._stores.get(version.index_name)
+            if store is None:
+                from .pinecone_service import create_vector_store
+                store = self._stores[version.index_name] = create_vector_store(version.index_name, version.dimension)
+            return store
+
+    async def astore(self, version: EmbeddingVersionInfo) -> VectorStore:
+        """Vector store of a version, created in a thread so the event loop never waits on it"""
+        store = self._stores.get(version.index_name)
+        if store is not None:
+            return store
+        return await asyncio.to_thread(self.store, version)
+
+    def embeddings(self, version: EmbeddingVersionInfo) -> Embeddings:
+        """Embeddings client of a version's model"""
+        with self._clients_lock:
+            if version.cache_name not in self._embeddings:
+                from langchain_openai import OpenAIEmbeddings
+                resizable = version.model.startswith(RESIZABLE_MODEL_PREFIX)
+                self._embeddings[version.cache_name] = with_embedding_cache(
+                    OpenAIEmbeddings(
+                        model=version.model,
+                        dimensions=version.dimension if resizable else None,
+                        api_key=settings.OPENAI_API_KEY,
+                        chunk_size=settings.EMBEDDING_BATCH_SIZE
+                    ),
+                    version.cache_name
+                )
+            return self._embeddings[version.cache_name]
+
+    async def aclose(self) -> None:
+        for store in list(self._stores.values()):
+            await store.aclose()
+
+    def get(self, db: Session, name: str) -> Optional[EmbeddingVersion]:
+        return db.query(EmbeddingVersion).filter(EmbeddingVersion.name == name).first()
+
+    def list_versions(self, db: Session) -> List[EmbeddingVersion]:
+        return db.query(EmbeddingVersion).order_by(EmbeddingVersion.created_at).all()
+
+    def start_migration(self, db: Session, model: str, dimension: int) -> EmbeddingVersion:
+        """Register a building version for a model and enqueue the job that fills it"""
+        self._refresh()
+        if self._building is not None:
+            raise ValueError(f"Embedding version {self._building.name} is already being built")
+
+        number = db.query(EmbeddingVersion.id).count() + 1
+        version = EmbeddingVersion(
+            name=f"v{number}",
+            model=model,
+            dimension=dimension,
+            index_name=f"{settings.PINECONE_INDEX_NAME}-v{number}",
+            status=EmbeddingVersionStatus.BUILDING
+        )
+        try:
+            db.add(version)
+            db.commit()
+            db.refresh(version)
+        except Exception:
+            db.rollback()
+            raise
+        job_queue_service.enqueue(db, "migrate_embeddings", {"version": version.name})
+        self._loaded_at = 0.0
+        logger.info(f"Started migration to embedding version {version.name} ({model}, {dimension})")
+        return version
+
+    def cutover(self, db: Session, name: str) -> None:
+        """Make a building version active and retire the active one, in one transaction"""
+        try:
+            now = utcnow()
+            retired = db.query(EmbeddingVersion).filter(
+                EmbeddingVersion.status == EmbeddingVersionStatus.ACTIVE
+            ).all()
+            retired_names = []
+            for version in retired:
+                version.status = EmbeddingVersionStatus.RETIRED
+                version.retired_at = now
+                retired_names.append(version.name)
+            # Flush the retirement first, at most one version may be active
+            db.flush()
+            activated = db.query(EmbeddingVersion).filter(
+                EmbeddingVersion.name == name,
+                EmbeddingVersion.status == EmbeddingVersionStatus.BUILDING
+            ).update(
+                {EmbeddingVersion.status: EmbeddingVersionStatus.ACTIVE, EmbeddingVersion.activated_at: now},
+                synchronize_session=False
+            )
+            if not activated:
+                raise ValueError(f"Embedding version {name} is not being built")
+            # Answers cached against the old version's retrieval no longer apply
+            db.query(Workspace).update(
+                {Workspace.content_version: Workspace.content_version + 1},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        self._loaded_at = 0.0
+        for retired_name in retired_names:
+            self.schedule_drop(db, retired_name)
+        logger.info(f"Embedding version {name} is now active")
+
+    def abort_migration(self, db: Session, name: str) -> None:
+        """Give up on a building version and schedule its index to be dropped"""
+        updated = db.query(EmbeddingVersion).filter(
+            EmbeddingVersion.name == name,
+            EmbeddingVersion.status == EmbeddingVersionStatus.BUILDING
+        ).update({EmbeddingVersion.status: EmbeddingVersionStatus.FAILED}, synchronize_session=False)
+        db.commit()
+        if not updated:
+            raise ValueError(f"Embedding version {name} is not being built")
+        self._loaded_at = 0.0
+        self.schedule_drop(db, name, delay=0)
+
+    def schedule_drop(self, db: Session, name: str, delay: Optional[float] = None) -> None:
+        """Enqueue the deletion of a retired or failed version's index"""
+        if delay is None:
+            delay = settings.EMBEDDING_VERSION_RETIRE_DELAY
+        job_queue_service.enqueue(
+            db,
+            "drop_embedding_version",
+            {"version": name},
+            run_after=utcnow() + timedelta(seconds=delay)
+        )
+
+    def drop(self, db: Session, name: str) -> None:
+        """Delete the index of a retired or failed version"""
+        version = self.get(db, name)
+        if version is None or version.status not in (EmbeddingVersionStatus.RETIRED, EmbeddingVersionStatus.FAILED):
+            logger.info(f"Embedding version {name} is not retired, keeping it")
+            return
+        store = self._stores.get(version.index_name)
+        if store is None:
+            # Opening the store normally would create the index again if it's already gone
+            from .pinecone_service import create_vector_store
+            store = create_vector_store(version.index_name, version.dimension, ensure_exists=False)
+        try:
+            store.drop()
+        except Exception as e:
+            logger.warning(f"Could not drop the index of embedding version {name}: {str(e)}")
+        with self._clients_lock:
+            self._stores.pop(version.index_name, None)
+        version.status = EmbeddingVersionStatus.DROPPED
+        db.commit()
+        logger.info(f"Dropped embedding version {name}")
+
+class VersionedVectorStore(VectorStore):
+    """
+    Vector store of the active embedding version.
+
+    Deletes also reach a version being built, so vectors removed during a
+    migration don't come back after the cutover.
+    """
+
+    def __init__(self, versions: EmbeddingVersionService):
+        self.versions = versions
+
+    def for_version(self, version: EmbeddingVersionInfo) -> VectorStore:
+        """Store of a specific version"""
+        return self.versions.store(version)
+
+    async def afor_version(self, version: EmbeddingVersionInfo) -> VectorStore:
+        return await self.versions.astore(version)
+
+    def _live_versions(self) -> List[EmbeddingVersionInfo]:
+        return [version for version in (self.versions.active(), self.versions.building()) if version]
+
+    def _active_store(self) -> VectorStore:
+        return self.versions.store(self.versions.active())
+
+    async def _aactive_store(self) -> VectorStore:
+        return await self.versions.astore(await self.versions.aactive())
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._active_store().upsert_vectors(vectors, namespace)
+
+    def query_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        return self._active_store().query_vectors(vector, top_k, namespace, filter)
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        for version in self._live_versions():
+            self.versions.store(version).delete_vectors(ids, namespace)
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        return self._active_store().fetch_vectors(ids, namespace)
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        # Like deletes, so a version being built doesn't keep stale metadata
+        for version in self._live_versions():
+            self.versions.store(version).update_metadata(updates, namespace)
+
+    def list_vector_ids(self, prefix: str, namespace: Optional[str] = None) -> List[str]:
+        return self._active_store().list_vector_ids(prefix, namespace)
+
+    async def aupsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await (await self._aactive_store()).aupsert_vectors(vectors, namespace)
+
+    async def aquery_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        return await (await self._aactive_store()).aquery_vectors(vector, top_k, namespace, filter)
+
+    async def adelete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        versions = [await self.versions.aactive(), await self.versions.abuilding()]
+        for version in versions:
+            if version is not None:
+                await (await self.versions.astore(version)).adelete_vectors(ids, namespace)
+
+    async def afetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        return await (await self._aactive_store()).afetch_vectors(ids, namespace)
+
+    async def aupdate_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        versions = [await self.versions.aactive(), await self.versions.abuilding()]
+        for version in versions:
+            if version is not None:
+                await (await self.versions.astore(version)).aupdate_metadata(updates, namespace)
+
+    def drop(self):
+        raise NotImplementedError(
+            "The active embedding version can't be dropped; migrate to another version, "
+            "which drops this one once retired"
+        )
+
+    async def aclose(self):
+        await self.versions.aclose()
+
+# Initialize the service
+embedding_version_service = EmbeddingVersionService(settings.EMBEDDING_VERSION_REFRESH_SECONDS)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, Optional
+from .r2_service import r2_service
+from ..config.settings import settings
+from ..utils import document_parsers
+from ..utils.text_stream import decode_stream
+
+logger = logging.getLogger(__name__)
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+
+# An extractor turns a stored object into an async stream of text blocks
+Extractor = Callable[[str], AsyncIterator[str]]
+
+class ExtractionService:
+    """
+    Registry of text extractors dispatched by content type.
+
+    Plain text is decoded straight from the R2 stream. Binary formats are
+    spooled to a temporary file and parsed in a process pool, one task per
+    page range or sheet, so parsing runs in parallel and never blocks the
+    event loop. Results are yielded in document order.
+    """
+
+    def __init__(self):
+        self.extractors: Dict[str, Extractor] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.register(PDF_CONTENT_TYPE, self._extract_pdf)
+        self.register(DOCX_CONTENT_TYPE, self._extract_docx)
+        self.register(XLSX_CONTENT_TYPE, self._extract_xlsx)
+
+    def register(self, content_type: str, extractor: Extractor) -> None:
+        """Register the extractor for a content type"""
+        self.extractors[content_type] = extractor
+
+    @staticmethod
+    def resolve_content_type(content_type: Optional[str], file_key: str) -> str:
+        """Normalize a content type, guessing it from the file name if missing"""
+        if content_type:
+            content_type = content_type.split(";")[0].strip().lower()
+        # Browsers on Windows report CSV files as Excel documents
+        if not content_type or content_type in ("application/octet-stream", "application/vnd.ms-excel"):
+            content_type = mimetypes.guess_type(file_key)[0] or content_type or "text/plain"
+        return content_type
+
+    def get_extractor(self, content_type: str) -> Extractor:
+        """Get the extractor for a content type, falling back to plain text"""
+        return self.extractors.get(content_type, self._extract_text)
+
+    def extract(self, file_key: str, content_type: Optional[str]) -> AsyncIterator[str]:
+        """Stream the text of a stored file"""
+        content_type = self.resolve_content_type(content_type, file_key)
+        logger.debug(f"Extracting {file_key} as {content_type}")
+        return self.get_extractor(content_type)(file_key)
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Process pool shared by all CPU-bound extractions"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=settings.EXTRACTION_PROCESSES)
+        return self._pool
+
+    async def _extract_text(self, file_key: str) -> AsyncGenerator[str, None]:
+        # utf-8-sig drops the byte order mark spreadsheet exports often start with
+        async for text in decode_stream(r2_service.stream_file(file_key), encoding="utf-8-sig"):
+            yield text
+
+    async def _spool_to_disk(self, file_key: str) -> str:
+        """Stream an object from R2 into a temporary file and return its path"""
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file_key)[1])
+        try:
+            async for block in r2_service.stream_file(file_key):
+                await asyncio.to_thread(temp_file.write, block)
+        except BaseException:
+            temp_file.close()
+            os.unlink(temp_file.name)
+            raise
+        temp_file.close()
+        return temp_file.name
+
+    async def _run_ordered(self, tasks) -> AsyncGenerator[str, None]:
+        """
+        Run (function, *args) tasks in the process pool and yield results in order.
+
+        At most twice the pool size is in flight, which keeps every process busy
+        while bounding how much extracted text waits to be consumed.
+        """
+        loop = asyncio.get_running_loop()
+        window = settings.EXTRACTION_PROCESSES * 2
+        pending = []
+        tasks = iter(tasks)
+        try:
+            for task in tasks:
+                pending.append(loop.run_in_executor(self.pool, *task))
+                if len(pending) >= window:
+                    text = await pending.pop(0)
+                    if text:
+                        yield text
+            while pending:
+                text = await pending.pop(0)
+                if text:
+                    yield text
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _extract_pdf(self, file_key: str) -> AsyncGenerator[str, None]:
+        path = await self._spool_to_disk(file_key)
+        try:
+            loop = asyncio.get_running_loop()
+            page_count = await loop.run_in_executor(self.pool, document_parsers.pdf_page_count, path)
+            pages_per_task = settings.EXTRACTION_PDF_PAGES_PER_TASK
+            tasks = (
+                (document_parsers.extract_pdf_pages, path, start, start + pages_per_task)
+                for start in range(0, page_count, pages_per_task)
+            )
+            async for text in self._run_ordered(tasks):
+                yield text + "\n\n"
+        finally:
+            os.unlink(path)
+
+    async def _extract_xlsx(self, file_key: str) -> AsyncGenerator[str, None]:
+        path = await self._spool_to_disk(file_key)
+        try:
+            loop = asyncio.get_running_loop()
+            sheet_names = await loop.run_in_executor(self.pool, document_parsers.xlsx_sheet_names, path)
+            tasks = ((document_parsers.extract_xlsx_sheet, path, sheet_name) for sheet_name in sheet_names)
+            async for text in self._run_ordered(tasks):
+                yield text + "\n\n"
+        finally:
+            os.unlink(path)
+
+    async def _extract_docx(self, file_key: str) -> AsyncGenerator[str, None]:
+        path = await self._spool_to_disk(file_key)
+        try:
+            async for text in self._run_ordered([(document_parsers.extract_docx, path)]):
+                yield text
+        finally:
+            os.unlink(path)
+
+extraction_service = ExtractionService()
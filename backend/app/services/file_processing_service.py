@@ -1,20 +1,40 @@
-import tempfile
+import asyncio
+import hashlib
 import logging
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+from langchain_core.documents import Document
 from .r2_service import r2_service
 from .pinecone_service import pinecone_service
+from .lexical_index_service import lexical_index_service
+from .chunk_store_service import chunk_store_service
+from .embedding_cache import embedding_cache
+from .embedding_version_service import EmbeddingVersionInfo, embedding_version_service
+from .vector_store import VectorStore
+from .extraction_service import extraction_service, CSV_CONTENT_TYPES
 from sqlalchemy.orm import Session
 from ..models.file import File as FileModel
+from ..models.file_chunk import FileChunk
+from ..models.workspace import Workspace
+from ..database import SessionLocal
+from ..config.settings import settings
+from ..utils.tokens import count_tokens
+from ..utils.text_stream import StreamingTextSplitter
+from ..utils.csv_chunker import CsvRowChunker
 import uuid
 
 logger = logging.getLogger(__name__)
 
-class FileProcessingService:
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings()
+# Maximum number of IDs Pinecone accepts in a single delete request
+DELETE_BATCH_SIZE = 1000
+
+# Vectors fetched per request when copying a file between namespaces
+FETCH_BATCH_SIZE = 100
+
+# Bytes read per block when hashing an upload
+HASH_BLOCK_SIZE = 1024 * 1024
 
+class FileProcessingService:
     async def save_file(self, db: Session, file_data: dict) -> FileModel:
         """
         Save file metadata to PostgreSQL
@@ -28,6 +48,7 @@ class FileProcessingService:
                 - content_type: MIME type of the file
                 - workspace_id: ID of the workspace the file belongs to
                 - user_id: ID of the user who uploaded the file
+                - content_hash: Optional sha256 of the file content
         
         Returns:
             FileModel: The saved file record
@@ -49,6 +70,7 @@ class FileProcessingService:
                 file_path=file_data['file_path'],
                 file_size=file_data['file_size'],
                 content_type=file_data['content_type'],
+                content_hash=file_data.get('content_hash'),
                 workspace_id=workspace_id,
                 user_id=user_id
             )
@@ -66,60 +88,672 @@ class FileProcessingService:
             logger.error(f"Error saving file metadata: {str(e)}")
             raise
 
-    async def process_file(self, workspace_name: str, file_key: str):
-        """Process a file from R2 and store its embeddings in Pinecone"""
+    async def save_files(self, db: Session, files_data: List[dict]) -> List[FileModel]:
+        """
+        Save metadata of many files to PostgreSQL in a single transaction
+
+        Args:
+            db: Database session
+            files_data: List of dictionaries with the same keys as save_file
+
+        Returns:
+            List[FileModel]: The saved file records
+        """
         try:
-            # Download file from R2
-            file_content = await r2_service.download_file(file_key)
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-
-            try:
-                # Load and process the file
-                loader = TextLoader(temp_file_path)
-                documents = loader.load()
-
-                # Split text into chunks
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
+            file_records = [
+                FileModel(
+                    id=str(uuid.uuid4()),
+                    filename=file_data['filename'],
+                    file_path=file_data['file_path'],
+                    file_size=file_data['file_size'],
+                    content_type=file_data['content_type'],
+                    content_hash=file_data.get('content_hash'),
+                    workspace_id=str(file_data['workspace_id']),
+                    user_id=str(file_data['user_id'])
                 )
-                chunks = text_splitter.split_documents(documents)
-
-                # Create vectors for Pinecone
-                vectors = []
-                for i, chunk in enumerate(chunks):
-                    # Generate embedding for the chunk
-                    embedding = self.embeddings.embed_query(chunk.page_content)
-                    
-                    # Create vector with metadata
-                    vector = {
-                        "id": f"{file_key}-chunk-{i}",
+                for file_data in files_data
+            ]
+            db.add_all(file_records)
+            db.commit()
+
+            logger.debug(f"Saved metadata of {len(file_records)} files")
+            return file_records
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error saving metadata of {len(files_data)} files: {str(e)}")
+            raise
+
+    @staticmethod
+    def hash_file(file_obj) -> str:
+        """Compute the sha256 of a file object and rewind it"""
+        hasher = hashlib.sha256()
+        file_obj.seek(0)
+        for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+        file_obj.seek(0)
+        return hasher.hexdigest()
+
+    async def hash_stored_file(self, file_key: str) -> str:
+        """Compute the sha256 of a stored object by streaming it from R2"""
+        hasher = hashlib.sha256()
+        async for block in r2_service.stream_file(file_key):
+            hasher.update(block)
+        return hasher.hexdigest()
+
+    def clear_content_hashes(self, db: Session, file_keys: List[str]) -> None:
+        """
+        Forget the content hash of records whose stored object is about to be
+        overwritten. Dedup hits reuse the object of a matching record, so a
+        hash must not outlive the content it was computed from.
+        """
+        try:
+            for start in range(0, len(file_keys), DELETE_BATCH_SIZE):
+                db.query(FileModel).filter(
+                    FileModel.file_path.in_(file_keys[start:start + DELETE_BATCH_SIZE]),
+                    FileModel.content_hash.isnot(None)
+                ).update({FileModel.content_hash: None}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def find_duplicate(self, db: Session, content_hash: str, workspace_id: str) -> Optional[FileModel]:
+        """Find a stored file with the same content, preferring one in the given workspace"""
+        duplicates = db.query(FileModel).filter(FileModel.content_hash == content_hash).all()
+        for duplicate in duplicates:
+            if str(duplicate.workspace_id) == workspace_id:
+                return duplicate
+        return duplicates[0] if duplicates else None
+
+    async def _batch_chunks(self, chunks: AsyncIterator[Document]) -> AsyncGenerator[List[Document], None]:
+        """Group a stream of chunks into batches bounded by chunk count and token count"""
+        current_batch = []
+        current_tokens = 0
+
+        async for chunk in chunks:
+            tokens = count_tokens(chunk.page_content, settings.EMBEDDING_MODEL)
+            if current_batch and (
+                len(current_batch) >= settings.EMBEDDING_BATCH_SIZE
+                or current_tokens + tokens > settings.EMBEDDING_BATCH_MAX_TOKENS
+            ):
+                yield current_batch
+                current_batch = []
+                current_tokens = 0
+
+            current_batch.append(chunk)
+            current_tokens += tokens
+
+        if current_batch:
+            yield current_batch
+
+    async def _iter_chunks(self, file_key: str, content_type: Optional[str]) -> AsyncGenerator[Document, None]:
+        """Extract a file from R2 and yield its chunks as soon as they are complete"""
+        content_type = extraction_service.resolve_content_type(content_type, file_key)
+        text_blocks = extraction_service.extract(file_key, content_type)
+
+        if content_type in CSV_CONTENT_TYPES:
+            # Tabular data is chunked by whole rows, without overlap
+            chunker = CsvRowChunker(settings.CSV_CHUNK_MAX_TOKENS, settings.EMBEDDING_MODEL)
+            async for chunk in chunker.split_stream(text_blocks):
+                yield chunk
+            return
+
+        splitter = StreamingTextSplitter(chunk_size=1000, chunk_overlap=200)
+        async for text in splitter.split_stream(text_blocks):
+            yield Document(page_content=text)
+
+    @staticmethod
+    def _vector_id(file_key: str, chunk_hash: str) -> str:
+        """Build a stable vector ID from the file key and chunk content hash"""
+        return f"{file_key}-chunk-{chunk_hash[:16]}"
+
+    async def _iter_changed_chunks(
+        self,
+        chunks: AsyncIterator[Document],
+        manifest: Dict[str, dict],
+        seen: Dict[str, int]
+    ) -> AsyncGenerator[Document, None]:
+        """
+        Yield only chunks that are not already indexed for this file.
+
+        Every distinct chunk hash is recorded in seen with its position, so the
+        caller can work out which manifest entries became orphans.
+        """
+        position = 0
+        async for chunk in chunks:
+            chunk_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+            if chunk_hash in seen:
+                continue
+            seen[chunk_hash] = position
+            position += 1
+            if chunk_hash in manifest:
+                continue
+
+            chunk.metadata["chunk_hash"] = chunk_hash
+            chunk.metadata["chunk_index"] = seen[chunk_hash]
+            yield chunk
+
+    def _get_file_metadata(self, db: Session, namespace: str, file_key: str) -> Dict[str, Any]:
+        """
+        Look up the file record of a stored object in a workspace, as the
+        filterable metadata stored with each of its vectors. Re-uploads add
+        records for the same object; the latest one describes it.
+        """
+        row = db.query(
+            FileModel.id,
+            FileModel.content_type,
+            FileModel.created_at
+        ).filter(
+            FileModel.file_path == file_key,
+            FileModel.workspace_id == namespace
+        ).order_by(FileModel.created_at.desc()).first()
+        if row is None:
+            return {}
+
+        metadata = {"file_id": str(row.id)}
+        if row.content_type:
+            metadata["content_type"] = row.content_type
+        if row.created_at:
+            metadata["uploaded_at"] = int(row.created_at.timestamp())
+        return metadata
+
+    def _load_manifest(self, db: Session, namespace: str, file_key: str) -> Dict[str, dict]:
+        """Load the manifest entries of a file, keyed by chunk hash"""
+        rows = db.query(
+            FileChunk.id,
+            FileChunk.chunk_hash,
+            FileChunk.chunk_index,
+            FileChunk.vector_id
+        ).filter(
+            FileChunk.namespace == namespace,
+            FileChunk.file_key == file_key
+        ).all()
+        return {row.chunk_hash: row._asdict() for row in rows}
+
+    def _update_manifest(
+        self,
+        db: Session,
+        namespace: str,
+        file_key: str,
+        manifest: Dict[str, dict],
+        seen: Dict[str, int]
+    ) -> None:
+        """Bring the manifest of a file in line with the chunks seen in this run"""
+        try:
+            orphan_ids = [entry["id"] for chunk_hash, entry in manifest.items() if chunk_hash not in seen]
+            for start in range(0, len(orphan_ids), DELETE_BATCH_SIZE):
+                db.query(FileChunk).filter(
+                    FileChunk.id.in_(orphan_ids[start:start + DELETE_BATCH_SIZE])
+                ).delete(synchronize_session=False)
+            chunk_store_service.delete_unreferenced(
+                db, [chunk_hash for chunk_hash in manifest if chunk_hash not in seen]
+            )
+
+            inserted = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "namespace": namespace,
+                    "file_key": file_key,
+                    "chunk_hash": chunk_hash,
+                    "chunk_index": chunk_index,
+                    "vector_id": self._vector_id(file_key, chunk_hash)
+                }
+                for chunk_hash, chunk_index in seen.items()
+                if chunk_hash not in manifest
+            ]
+            db.bulk_insert_mappings(FileChunk, inserted)
+
+            updated = [
+                {"id": entry["id"], "chunk_index": seen[chunk_hash]}
+                for chunk_hash, entry in manifest.items()
+                if chunk_hash in seen and entry["chunk_index"] != seen[chunk_hash]
+            ]
+            db.bulk_update_mappings(FileChunk, updated)
+
+            if orphan_ids or inserted or updated:
+                self._bump_content_version(db, namespace)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def _bump_content_version(db: Session, namespace: str) -> None:
+        """Mark the workspace's indexed content as changed, invalidating cached answers"""
+        db.query(Workspace).filter(Workspace.id == namespace).update(
+            {Workspace.content_version: Workspace.content_version + 1},
+            synchronize_session=False
+        )
+
+    def _invalidate_answers(self, namespace: str) -> None:
+        """Bump the content version in a session of its own, after a run that failed part way"""
+        db = SessionLocal()
+        try:
+            self._bump_content_version(db, namespace)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not bump the content version of {namespace}: {str(e)}")
+        finally:
+            db.close()
+
+    async def _delete_vectors(self, vector_ids: List[str], namespace: str) -> None:
+        """Delete vectors from Pinecone in batches, together with their lexical index entries"""
+        for start in range(0, len(vector_ids), DELETE_BATCH_SIZE):
+            await pinecone_service.adelete_vectors(vector_ids[start:start + DELETE_BATCH_SIZE], namespace=namespace)
+        if settings.LEXICAL_INDEX_ENABLED:
+            await lexical_index_service.adelete_documents(vector_ids, namespace=namespace)
+
+    async def _index_lexical(
+        self,
+        vectors: List[Dict[str, Any]],
+        namespace: str,
+        texts: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Add the text of upserted vectors to the workspace's lexical index.
+
+        Text is taken from texts keyed by chunk hash, the vector's metadata or
+        else the chunk store.
+        """
+        if not settings.LEXICAL_INDEX_ENABLED:
+            return
+        texts = dict(texts or {})
+        missing = [
+            vector["metadata"]["chunk_hash"] for vector in vectors
+            if not vector["metadata"].get("text")
+            and vector["metadata"].get("chunk_hash")
+            and vector["metadata"]["chunk_hash"] not in texts
+        ]
+        if missing:
+            texts.update(await chunk_store_service.aload(missing))
+        await lexical_index_service.aadd_documents(
+            [
+                (vector["id"], vector["metadata"].get("text") or texts.get(vector["metadata"].get("chunk_hash"), ""))
+                for vector in vectors
+            ],
+            namespace=namespace
+        )
+
+    async def _refresh_retained_metadata(
+        self,
+        namespace: str,
+        manifest: Dict[str, dict],
+        seen: Dict[str, int],
+        file_metadata: Dict[str, Any]
+    ) -> int:
+        """
+        Bring the metadata of vectors kept from a previous run in line with this one.
+
+        Unchanged chunks are not re-embedded, so after a re-upload their vectors
+        still carry the previous upload's file_id, uploaded_at and chunk_index.
+        Returns the number of vectors updated.
+        """
+        retained = [(chunk_hash, entry) for chunk_hash, entry in manifest.items() if chunk_hash in seen]
+        updated = 0
+        for start in range(0, len(retained), FETCH_BATCH_SIZE):
+            batch = retained[start:start + FETCH_BATCH_SIZE]
+            fetched = await pinecone_service.afetch_vectors([entry["vector_id"] for _, entry in batch], namespace=namespace)
+            updates = {}
+            for chunk_hash, entry in batch:
+                vector = fetched.get(entry["vector_id"])
+                if vector is None:
+                    continue
+                wanted = {**file_metadata, "chunk_index": seen[chunk_hash]}
+                current = vector.metadata or {}
+                if any(current.get(field) != value for field, value in wanted.items()):
+                    updates[entry["vector_id"]] = wanted
+            if updates:
+                await pinecone_service.aupdate_metadata(updates, namespace=namespace)
+                updated += len(updates)
+        return updated
+
+    async def _list_legacy_vector_ids(self, file_key: str, namespace: str) -> List[str]:
+        """List vectors of a file indexed before it had a manifest"""
+        try:
+            # Listing pages through the sync client, keep it off the event loop
+            return await asyncio.to_thread(
+                pinecone_service.list_vector_ids,
+                prefix=f"{file_key}-chunk-",
+                namespace=namespace
+            )
+        except Exception as e:
+            logger.warning(f"Could not list legacy vectors for {file_key}: {str(e)}")
+            return []
+
+    async def _index_chunks(
+        self,
+        chunks: AsyncIterator[Document],
+        workspace_name: str,
+        file_key: str,
+        file_metadata: Dict[str, Any],
+        timings: Dict[str, float],
+        version: EmbeddingVersionInfo,
+        index_lexical: bool = True
+    ) -> int:
+        """
+        Embed and upsert a stream of chunks into an embedding version, storing
+        file_metadata with each vector. Chunk text goes to the chunk store
+        rather than the vector metadata.
+
+        Batches flow through a bounded queue to EMBEDDING_CONCURRENCY workers, so
+        reading the next part of the file overlaps with embedding, and no more
+        than a few batches are held in memory at once. Time spent embedding and
+        upserting is accumulated into timings.
+        """
+        concurrency = settings.EMBEDDING_CONCURRENCY
+        embeddings_client = embedding_version_service.embeddings(version)
+        store = await pinecone_service.afor_version(version)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        indexed = 0
+        timings.setdefault("embed", 0.0)
+        timings.setdefault("upsert", 0.0)
+
+        async def produce():
+            async for batch in self._batch_chunks(chunks):
+                await queue.put(batch)
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def consume():
+            nonlocal indexed
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+
+                stage_start = time.perf_counter()
+                embeddings = await embeddings_client.aembed_documents(
+                    [chunk.page_content for chunk in batch]
+                )
+                timings["embed"] += time.perf_counter() - stage_start
+
+                vectors = [
+                    {
+                        "id": self._vector_id(file_key, chunk.metadata["chunk_hash"]),
                         "values": embedding,
                         "metadata": {
-                            "text": chunk.page_content,
                             "source": file_key,
-                            "workspace": workspace_name
+                            "workspace": workspace_name,
+                            **file_metadata,
+                            **chunk.metadata
                         }
                     }
-                    vectors.append(vector)
+                    for chunk, embedding in zip(batch, embeddings)
+                ]
+                texts = {chunk.metadata["chunk_hash"]: chunk.page_content for chunk in batch}
+                stage_start = time.perf_counter()
+                # Store texts first, so no vector is ever retrieved without its text
+                await chunk_store_service.astore(texts)
+                await store.aupsert_vectors(vectors, namespace=workspace_name)
+                if index_lexical:
+                    await self._index_lexical(vectors, workspace_name, texts)
+                timings["upsert"] += time.perf_counter() - stage_start
+                indexed += len(vectors)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks.extend(asyncio.create_task(consume()) for _ in range(concurrency))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return indexed
 
-                # Upsert vectors to Pinecone
-                pinecone_service.upsert_vectors(vectors, namespace=workspace_name)
+    async def process_file(self, workspace_name: str, file_key: str) -> Dict[str, Any]:
+        """
+        Stream a file from R2 and index it in Pinecone.
 
-                logger.info(f"Successfully processed file {file_key} and stored {len(vectors)} chunks in Pinecone")
-                return True
+        Only chunks missing from the file's manifest are embedded and upserted;
+        vectors of chunks that disappeared from the file are deleted.
+
+        Returns:
+            dict: Chunk counts and per-stage timings in seconds
+        """
+        db = SessionLocal()
+        try:
+            start_time = time.perf_counter()
+            timings: Dict[str, float] = {}
+            version = await embedding_version_service.aactive()
+            file_metadata = self._get_file_metadata(db, workspace_name, file_key)
+            manifest = self._load_manifest(db, workspace_name, file_key)
+            timings["manifest_load"] = time.perf_counter() - start_time
+
+            seen: Dict[str, int] = {}
+            stage_start = time.perf_counter()
+            chunk_count = await self._index_chunks(
+                self._iter_changed_chunks(
+                    self._iter_chunks(file_key, file_metadata.get("content_type")),
+                    manifest,
+                    seen
+                ),
+                workspace_name,
+                file_key,
+                file_metadata,
+                timings,
+                version
+            )
+            timings["index"] = time.perf_counter() - stage_start
 
-            finally:
-                # Clean up temporary file
-                import os
-                os.unlink(temp_file_path)
+            stage_start = time.perf_counter()
+            metadata_updated = await self._refresh_retained_metadata(workspace_name, manifest, seen, file_metadata)
+            timings["metadata"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+
+            if manifest:
+                orphan_ids = [entry["vector_id"] for chunk_hash, entry in manifest.items() if chunk_hash not in seen]
+            else:
+                current_ids = {self._vector_id(file_key, chunk_hash) for chunk_hash in seen}
+                orphan_ids = [
+                    vector_id for vector_id in await self._list_legacy_vector_ids(file_key, workspace_name)
+                    if vector_id not in current_ids
+                ]
+            await self._delete_vectors(orphan_ids, workspace_name)
+            self._update_manifest(db, workspace_name, file_key, manifest, seen)
+            timings["cleanup"] = time.perf_counter() - stage_start
+            elapsed = time.perf_counter() - start_time
+
+            rate = chunk_count / elapsed if elapsed > 0 else 0.0
+            logger.info(
+                f"Successfully processed file {file_key}: {len(seen)} chunks, {chunk_count} embedded, "
+                f"{len(orphan_ids)} orphans deleted in {elapsed:.2f}s ({rate:.1f} chunks/sec)"
+            )
+            logger.info(f"Embedding cache stats: {embedding_cache.stats()}")
+            return {
+                "chunks": len(seen),
+                "embedded": chunk_count,
+                "orphans_deleted": len(orphan_ids),
+                "metadata_updated": metadata_updated,
+                "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()}
+            }
 
         except Exception as e:
             logger.error(f"Error processing file {file_key}: {str(e)}", exc_info=True)
+            # Vectors upserted or deleted before the failure are already searchable
+            await asyncio.to_thread(self._invalidate_answers, workspace_name)
+            raise
+        finally:
+            db.close()
+
+    async def copy_file_vectors(self, source_namespace: str, target_namespace: str, file_key: str) -> Dict[str, Any]:
+        """
+        Copy the indexed vectors of a file into another namespace instead of re-embedding it.
+
+        Falls back to processing the file from scratch if the source has not
+        been indexed yet.
+
+        Returns:
+            dict: Chunk counts and per-stage timings in seconds
+        """
+        db = SessionLocal()
+        try:
+            start_time = time.perf_counter()
+            source_manifest = self._load_manifest(db, source_namespace, file_key)
+            if not source_manifest:
+                logger.info(f"No indexed vectors for {file_key} in {source_namespace}, processing it instead")
+                db.close()
+                return await self.process_file(target_namespace, file_key)
+
+            target_manifest = self._load_manifest(db, target_namespace, file_key)
+            file_metadata = self._get_file_metadata(db, target_namespace, file_key)
+            store = await pinecone_service.afor_version(await embedding_version_service.aactive())
+            timings = {"manifest_load": time.perf_counter() - start_time}
+
+            stage_start = time.perf_counter()
+            vector_ids = [entry["vector_id"] for entry in source_manifest.values()]
+            copied = 0
+            for start in range(0, len(vector_ids), FETCH_BATCH_SIZE):
+                fetched = await store.afetch_vectors(
+                    vector_ids[start:start + FETCH_BATCH_SIZE],
+                    namespace=source_namespace
+                )
+                vectors = [
+                    {
+                        "id": vector_id,
+                        "values": list(vector.values),
+                        "metadata": {**(vector.metadata or {}), "workspace": target_namespace, **file_metadata}
+                    }
+                    for vector_id, vector in fetched.items()
+                ]
+                if vectors:
+                    await store.aupsert_vectors(vectors, namespace=target_namespace)
+                    await self._index_lexical(vectors, target_namespace)
+                    copied += len(vectors)
+            timings["copy"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            seen = {chunk_hash: entry["chunk_index"] for chunk_hash, entry in source_manifest.items()}
+            orphan_ids = [
+                entry["vector_id"] for chunk_hash, entry in target_manifest.items()
+                if chunk_hash not in seen
+            ]
+            await self._delete_vectors(orphan_ids, target_namespace)
+            self._update_manifest(db, target_namespace, file_key, target_manifest, seen)
+            timings["cleanup"] = time.perf_counter() - stage_start
+
+            logger.info(f"Copied {copied} vectors of {file_key} from {source_namespace} to {target_namespace}")
+            return {
+                "chunks": len(seen),
+                "copied": copied,
+                "orphans_deleted": len(orphan_ids),
+                "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()}
+            }
+        except Exception as e:
+            logger.error(f"Error copying vectors of {file_key}: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self._invalidate_answers, target_namespace)
+            raise
+        finally:
+            db.close()
+
+    async def _iter_stored_chunks(
+        self,
+        store: VectorStore,
+        namespace: str,
+        manifest: Dict[str, dict]
+    ) -> AsyncGenerator[Document, None]:
+        """Rebuild the chunks of a file from its vectors' metadata and the chunk store"""
+        entries = sorted(manifest.items(), key=lambda item: item[1]["chunk_index"])
+        for start in range(0, len(entries), FETCH_BATCH_SIZE):
+            batch = entries[start:start + FETCH_BATCH_SIZE]
+            fetched, texts = await asyncio.gather(
+                store.afetch_vectors([entry["vector_id"] for _, entry in batch], namespace=namespace),
+                chunk_store_service.aload(chunk_hash for chunk_hash, _ in batch)
+            )
+            for chunk_hash, entry in batch:
+                vector = fetched.get(entry["vector_id"])
+                if vector is None:
+                    continue
+                metadata = dict(vector.metadata or {})
+                # Vectors indexed before the chunk store carry their own text
+                text = texts.get(chunk_hash) or metadata.get("text")
+                metadata.pop("text", None)
+                if not text:
+                    logger.warning(f"No text for chunk {chunk_hash} of vector {entry['vector_id']}, skipping it")
+                    continue
+                metadata["chunk_hash"] = chunk_hash
+                yield Document(page_content=text, metadata=metadata)
+
+    async def migrate_file_vectors(
+        self,
+        source: EmbeddingVersionInfo,
+        target: EmbeddingVersionInfo,
+        namespace: str,
+        file_key: str
+    ) -> int:
+        """
+        Re-embed the indexed chunks of a file with the target version's model.
+
+        Text comes from the chunk store and metadata from the source version's
+        vectors, so the file is not extracted again. Returns the number of
+        vectors written.
+        """
+        db = SessionLocal()
+        try:
+            manifest = self._load_manifest(db, namespace, file_key)
+        finally:
+            db.close()
+        if not manifest:
+            return 0
+
+        return await self._index_chunks(
+            self._iter_stored_chunks(await pinecone_service.afor_version(source), namespace, manifest),
+            namespace,
+            file_key,
+            {},
+            {},
+            target,
+            index_lexical=False
+        )
+
+    async def delete_file(self, db: Session, file_record: FileModel) -> int:
+        """
+        Delete a file together with its vectors, manifest entries and stored object
+
+        Returns:
+            int: Number of vectors deleted
+        """
+        namespace = str(file_record.workspace_id)
+        file_key = file_record.file_path
+        try:
+            # Deduplicated uploads share stored objects, so only remove what
+            # no other file record still references
+            other_references = db.query(FileModel.workspace_id).filter(
+                FileModel.file_path == file_key,
+                FileModel.id != file_record.id
+            ).all()
+            shared_in_namespace = any(str(row.workspace_id) == namespace for row in other_references)
+
+            vector_ids = []
+            if not shared_in_namespace:
+                manifest = self._load_manifest(db, namespace, file_key)
+                if manifest:
+                    vector_ids = [entry["vector_id"] for entry in manifest.values()]
+                else:
+                    vector_ids = await self._list_legacy_vector_ids(file_key, namespace)
+                await self._delete_vectors(vector_ids, namespace)
+
+                db.query(FileChunk).filter(
+                    FileChunk.namespace == namespace,
+                    FileChunk.file_key == file_key
+                ).delete(synchronize_session=False)
+                chunk_store_service.delete_unreferenced(db, manifest)
+                self._bump_content_version(db, namespace)
+            db.delete(file_record)
+            db.commit()
+
+            if not other_references:
+                await r2_service.delete_file(file_key)
+
+            logger.info(f"Deleted file {file_key} and {len(vector_ids)} vectors from namespace {namespace}")
+            return len(vector_ids)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error deleting file {file_key}: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self._invalidate_answers, namespace)
             raise
 
-file_processing_service = FileProcessingService() 
\ No newline at end of file
+file_processing_service = FileProcessingService()
\ No newline at end of file
@@ -0,0 +1,283 @@
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Session
+from ..config.settings import settings
+from ..models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class JobQueueService:
+    def enqueue(
+        self,
+        db: Session,
+        job_type: str,
+        payload: Dict[str, Any],
+        max_attempts: Optional[int] = None,
+        group_id: Optional[str] = None,
+        run_after: Optional[datetime] = None
+    ) -> Job:
+        """Add a job to the queue, to run as soon as possible or not before run_after"""
+        try:
+            job = Job(
+                job_type=job_type,
+                group_id=group_id,
+                status=JobStatus.PENDING,
+                payload=payload,
+                max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+                run_after=run_after or utcnow()
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            logger.debug(f"Enqueued {job_type} job {job.id}")
+            return job
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error enqueuing {job_type} job: {str(e)}")
+            raise
+
+    def enqueue_many(
+        self,
+        db: Session,
+        jobs: List[Tuple[str, Dict[str, Any]]],
+        group_id: Optional[str] = None
+    ) -> List[Job]:
+        """Add (job_type, payload) jobs to the queue in a single transaction"""
+        try:
+            now = utcnow()
+            records = [
+                Job(
+                    job_type=job_type,
+                    group_id=group_id,
+                    status=JobStatus.PENDING,
+                    payload=payload,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                    run_after=now
+                )
+                for job_type, payload in jobs
+            ]
+            db.add_all(records)
+            db.commit()
+            logger.debug(f"Enqueued {len(records)} jobs in group {group_id}")
+            return records
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error enqueuing job group {group_id}: {str(e)}")
+            raise
+
+    def get_group_progress(self, db: Session, group_id: str) -> Optional[Dict[str, Any]]:
+        """Aggregate the status of all jobs in a group"""
+        counts = dict(
+            db.query(Job.status, func.count(Job.id))
+            .filter(Job.group_id == group_id)
+            .group_by(Job.status)
+            .all()
+        )
+        total = sum(counts.values())
+        if not total:
+            return None
+
+        completed = counts.get(JobStatus.COMPLETED, 0)
+        failed = counts.get(JobStatus.FAILED, 0)
+        return {
+            "group_id": group_id,
+            "total": total,
+            "pending": counts.get(JobStatus.PENDING, 0),
+            "running": counts.get(JobStatus.RUNNING, 0),
+            "completed": completed,
+            "failed": failed,
+            "progress": round((completed + failed) / total, 4)
+        }
+
+    def get_job(self, db: Session, job_id: str) -> Optional[Job]:
+        """Get a job by ID"""
+        return db.query(Job).filter(Job.id == job_id).first()
+
+    @staticmethod
+    def _stale(now: datetime):
+        """Condition matching running jobs whose worker stopped refreshing the lock"""
+        stale_before = now - timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+        return and_(Job.status == JobStatus.RUNNING, Job.locked_at < stale_before)
+
+    def _claimable(self, now: datetime):
+        """Condition matching due pending jobs and running jobs whose lock expired with attempts left"""
+        return or_(
+            and_(Job.status == JobStatus.PENDING, Job.run_after <= now),
+            and_(self._stale(now), Job.attempts < Job.max_attempts)
+        )
+
+    def fail_lost_jobs(self, db: Session, now: datetime) -> int:
+        """
+        Fail running jobs whose worker was lost on their last attempt.
+
+        A job that kills its worker, say by running out of memory, never
+        reaches fail_job; without this it would stay running forever and its
+        group would never finish.
+        """
+        failed = db.query(Job).filter(
+            self._stale(now),
+            Job.attempts >= Job.max_attempts
+        ).update({
+            Job.status: JobStatus.FAILED,
+            Job.last_error: "Worker lost while running the job",
+            Job.locked_by: None,
+            Job.completed_at: now
+        }, synchronize_session=False)
+        if failed:
+            logger.warning(f"Failed {failed} jobs whose worker was lost on their last attempt")
+        return failed
+
+    def claim_jobs(self, db: Session, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Claim up to limit due jobs for a worker.
+
+        On PostgreSQL candidates are selected with FOR UPDATE SKIP LOCKED so
+        concurrent workers never block on or double-claim the same rows. SQLite
+        ignores the locking clause, so each claim is also a conditional update
+        that only succeeds if the job is still claimable.
+        """
+        try:
+            now = utcnow()
+            self.fail_lost_jobs(db, now)
+            candidates = (
+                db.query(Job.id)
+                .filter(self._claimable(now))
+                .order_by(Job.run_after)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+
+            claimed_ids = []
+            for (job_id,) in candidates:
+                updated = db.query(Job).filter(
+                    Job.id == job_id,
+                    self._claimable(now)
+                ).update({
+                    Job.status: JobStatus.RUNNING,
+                    Job.locked_by: worker_id,
+                    Job.locked_at: now,
+                    Job.attempts: Job.attempts + 1
+                }, synchronize_session=False)
+                if updated:
+                    claimed_ids.append(job_id)
+            db.commit()
+
+            if not claimed_ids:
+                return []
+
+            jobs = db.query(Job).filter(Job.id.in_(claimed_ids)).all()
+            return [
+                {
+                    "id": job.id,
+                    "job_type": job.job_type,
+                    "payload": job.payload,
+                    "attempts": job.attempts,
+                    "max_attempts": job.max_attempts,
+                    "created_at": job.created_at,
+                    "claimed_at": now
+                }
+                for job in jobs
+            ]
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error claiming jobs: {str(e)}")
+            raise
+
+    @staticmethod
+    def _owned_by(job_id: str, worker_id: str):
+        """Condition matching a job only while the worker still holds its lock"""
+        return and_(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.locked_by == worker_id)
+
+    def heartbeat(self, db: Session, worker_id: str, job_ids: List[str]) -> List[str]:
+        """
+        Refresh the locks of a worker's running jobs, so they aren't reclaimed
+        while they take longer than JOB_VISIBILITY_TIMEOUT
+
+        Returns:
+            list: IDs of the jobs whose lock the worker lost to another worker
+        """
+        try:
+            held = [
+                job_id for (job_id,) in db.query(Job.id).filter(
+                    Job.id.in_(job_ids),
+                    Job.status == JobStatus.RUNNING,
+                    Job.locked_by == worker_id
+                ).with_for_update().all()
+            ]
+            if held:
+                db.query(Job).filter(Job.id.in_(held)).update(
+                    {Job.locked_at: utcnow()},
+                    synchronize_session=False
+                )
+            db.commit()
+            held_ids = {str(job_id) for job_id in held}
+            return [job_id for job_id in job_ids if str(job_id) not in held_ids]
+        except Exception:
+            db.rollback()
+            raise
+
+    def complete_job(self, db: Session, job_id: str, worker_id: str, timings: Dict[str, Any]) -> bool:
+        """
+        Mark a job as completed and record its stage timings
+
+        Returns:
+            bool: False if the worker no longer held the job, which is left as it is
+        """
+        try:
+            updated = db.query(Job).filter(self._owned_by(job_id, worker_id)).update({
+                Job.status: JobStatus.COMPLETED,
+                Job.timings: timings,
+                Job.last_error: None,
+                Job.locked_by: None,
+                Job.completed_at: utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            return bool(updated)
+        except Exception:
+            db.rollback()
+            raise
+
+    def fail_job(self, db: Session, job: Dict[str, Any], worker_id: str, error: str, timings: Dict[str, Any]) -> Optional[bool]:
+        """
+        Record a failed attempt, scheduling a retry with exponential backoff
+
+        Returns:
+            bool: True if the job will be retried, None if the worker no longer held it
+        """
+        try:
+            retry = job["attempts"] < job["max_attempts"]
+            values = {
+                Job.last_error: error,
+                Job.timings: timings,
+                Job.locked_by: None
+            }
+            if retry:
+                delay = min(
+                    settings.JOB_RETRY_MAX_DELAY,
+                    settings.JOB_RETRY_BASE_DELAY * 2 ** (job["attempts"] - 1)
+                )
+                delay *= random.uniform(0.5, 1.5)
+                values[Job.status] = JobStatus.PENDING
+                values[Job.run_after] = utcnow() + timedelta(seconds=delay)
+            else:
+                values[Job.status] = JobStatus.FAILED
+                values[Job.completed_at] = utcnow()
+
+            updated = db.query(Job).filter(self._owned_by(job["id"], worker_id)).update(
+                values,
+                synchronize_session=False
+            )
+            db.commit()
+            return retry if updated else None
+        except Exception:
+            db.rollback()
+            raise
+
+job_queue_service = JobQueueService()
@@ -0,0 +1,316 @@
+import array
+import asyncio
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from ..models.lexical_index import LexicalDocument, LexicalNamespace, LexicalPosting
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Whitespace and bracket-delimited tokens keep emails, URLs and paths intact
+COMPOUND_TOKEN_PATTERN = re.compile(r"[^\s,;\"'()\[\]{}<>|=]+")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Longer tokens, such as encoded blobs, are not worth a posting row
+MAX_TERM_LENGTH = 200
+
+# Rows per IN clause
+BATCH_SIZE = 500
+
+# Deleted documents tolerated in postings before they are purged, at least as many as live ones
+COMPACT_MIN_DEAD_DOCS = 1000
+
+# Writes between merges of the segments each write appends to its terms
+MERGE_INTERVAL = 32
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms.
+
+    Compound tokens such as jane.doe@example.com or /pricing/enterprise are
+    indexed whole as well as by their word parts, so exact lookups match.
+    """
+    terms = []
+    for token in COMPOUND_TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip(".:!?-_/")
+        if not token or len(token) > MAX_TERM_LENGTH:
+            continue
+        words = WORD_PATTERN.findall(token)
+        if len(words) != 1 or words[0] != token:
+            terms.append(token)
+        terms.extend(word for word in words if len(word) <= MAX_TERM_LENGTH)
+    return terms
+
+def _pack(values: np.ndarray, dtype) -> bytes:
+    return values.astype(dtype).tobytes()
+
+class LexicalIndexService:
+    """
+    Per-workspace BM25 indexes of chunk text, keyed by vector ID.
+
+    Postings live in the shared database, so documents indexed by a worker
+    are searchable from every API process. Each write appends one segment
+    per term it touches, holding packed document numbers (uint32), term
+    frequencies and document lengths (uint16), so adding documents never
+    reads or rewrites existing postings. Every MERGE_INTERVAL writes the
+    segments of each term are merged into one. Document count and total
+    length are kept as running counters, so searches read only the postings
+    of the query terms. Deleted documents stay in the postings, are skipped
+    when results are resolved, and are purged once they outnumber live
+    documents. Writers to a namespace are serialized by its
+    lexical_namespaces row.
+    """
+
+    @staticmethod
+    def _namespace(namespace: Optional[str]) -> str:
+        return namespace or "__default__"
+
+    @staticmethod
+    def _insert(db: Session):
+        # Both dialects support upserts, with the same API
+        return sqlite.insert if db.bind.dialect.name == "sqlite" else postgresql.insert
+
+    def _lock_namespace(self, db: Session, namespace: str) -> LexicalNamespace:
+        """Lock a namespace's state row for writing, creating it if needed"""
+        db.execute(self._insert(db)(LexicalNamespace).values(
+            namespace=namespace, last_segment=0, unmerged_writes=0, last_doc=0,
+            doc_count=0, total_length=0, dead_docs=0
+        ).on_conflict_do_nothing(index_elements=[LexicalNamespace.namespace]))
+        return db.query(LexicalNamespace).filter(
+            LexicalNamespace.namespace == namespace
+        ).with_for_update().one()
+
+    def _remove(self, db: Session, namespace: str, state: LexicalNamespace, ids: List[str]) -> int:
+        """Drop documents by vector ID, leaving their postings behind; returns how many existed"""
+        removed = 0
+        for start in range(0, len(ids), BATCH_SIZE):
+            query = db.query(LexicalDocument).filter(
+                LexicalDocument.namespace == namespace,
+                LexicalDocument.vector_id.in_(ids[start:start + BATCH_SIZE])
+            )
+            count, length = query.with_entities(
+                func.count(LexicalDocument.doc), func.coalesce(func.sum(LexicalDocument.length), 0)
+            ).one()
+            if count:
+                query.delete(synchronize_session=False)
+                removed += count
+                state.total_length -= length
+        state.doc_count -= removed
+        state.dead_docs += removed
+        return removed
+
+    def _add(self, db: Session, namespace: str, documents: List[Tuple[str, str]]) -> None:
+        state = self._lock_namespace(db, namespace)
+        # Re-added documents replace their previous version
+        documents = dict(documents)
+        self._remove(db, namespace, state, list(documents))
+
+        rows = []
+        new_postings: Dict[str, Tuple[array.array, array.array, array.array]] = defaultdict(
+            lambda: (array.array("I"), array.array("H"), array.array("H"))
+        )
+        for vector_id, text in documents.items():
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            state.last_doc += 1
+            rows.append({
+                "namespace": namespace,
+                "doc": state.last_doc,
+                "vector_id": vector_id,
+                "length": length
+            })
+            for term, tf in terms.items():
+                docs, tfs, lengths = new_postings[term]
+                docs.append(state.last_doc)
+                tfs.append(min(tf, 65535))
+                lengths.append(min(length, 65535))
+            state.total_length += length
+        db.bulk_insert_mappings(LexicalDocument, rows)
+        state.doc_count += len(rows)
+
+        state.last_segment += 1
+        db.bulk_insert_mappings(LexicalPosting, [
+            {
+                "namespace": namespace,
+                "term": term,
+                "segment": state.last_segment,
+                "docs": docs.tobytes(),
+                "tfs": tfs.tobytes(),
+                "lengths": lengths.tobytes()
+            }
+            for term, (docs, tfs, lengths) in new_postings.items()
+        ])
+
+        state.unmerged_writes += 1
+        if state.unmerged_writes >= MERGE_INTERVAL:
+            self._merge(db, namespace, state)
+
+    def _delete(self, db: Session, namespace: str, ids: List[str]) -> None:
+        state = self._lock_namespace(db, namespace)
+        if self._remove(db, namespace, state, ids) and state.dead_docs > max(state.doc_count, COMPACT_MIN_DEAD_DOCS):
+            self._compact(db, namespace, state)
+
+    def _rewrite(self, db: Session, namespace: str, terms: List[str], live: Optional[np.ndarray] = None) -> None:
+        """Replace the segments of terms with one segment each, dropping documents not in live"""
+        for start in range(0, len(terms), BATCH_SIZE):
+            batch = terms[start:start + BATCH_SIZE]
+            segments = defaultdict(list)
+            for row in db.query(
+                LexicalPosting.term, LexicalPosting.segment, LexicalPosting.docs, LexicalPosting.tfs, LexicalPosting.lengths
+            ).filter(
+                LexicalPosting.namespace == namespace,
+                LexicalPosting.term.in_(batch)
+            ):
+                segments[row.term].append(row)
+            db.query(LexicalPosting).filter(
+                LexicalPosting.namespace == namespace,
+                LexicalPosting.term.in_(batch)
+            ).delete(synchronize_session=False)
+
+            merged = []
+            for term, rows in segments.items():
+                docs = np.concatenate([np.frombuffer(row.docs, dtype=np.uint32) for row in rows])
+                tfs = np.concatenate([np.frombuffer(row.tfs, dtype=np.uint16) for row in rows])
+                lengths = np.concatenate([np.frombuffer(row.lengths, dtype=np.uint16) for row in rows])
+                if live is not None:
+                    keep = live[docs]
+                    docs, tfs, lengths = docs[keep], tfs[keep], lengths[keep]
+                if len(docs):
+                    merged.append({
+                        "namespace": namespace,
+                        "term": term,
+                        "segment": min(row.segment for row in rows),
+                        "docs": _pack(docs, np.uint32),
+                        "tfs": _pack(tfs, np.uint16),
+                        "lengths": _pack(lengths, np.uint16)
+                    })
+            db.bulk_insert_mappings(LexicalPosting, merged)
+
+    def _merge(self, db: Session, namespace: str, state: LexicalNamespace) -> None:
+        """Merge the segments of every term written to more than once since the last merge"""
+        terms = [row.term for row in db.query(LexicalPosting.term).filter(
+            LexicalPosting.namespace == namespace
+        ).group_by(LexicalPosting.term).having(func.count() > 1)]
+        self._rewrite(db, namespace, terms)
+        state.unmerged_writes = 0
+        logger.debug(f"Merged lexical index segments of {len(terms)} terms in namespace {namespace}")
+
+    def _compact(self, db: Session, namespace: str, state: LexicalNamespace) -> None:
+        """Rewrite all postings of a namespace as one segment per term, without deleted documents"""
+        live = np.zeros(state.last_doc + 1, dtype=bool)
+        live[[row.doc for row in db.query(LexicalDocument.doc).filter(LexicalDocument.namespace == namespace)]] = True
+        terms = [row.term for row in db.query(LexicalPosting.term).filter(
+            LexicalPosting.namespace == namespace
+        ).distinct()]
+        self._rewrite(db, namespace, terms, live)
+        state.dead_docs = 0
+        state.unmerged_writes = 0
+        logger.info(f"Compacted lexical index postings of {len(terms)} terms in namespace {namespace}")
+
+    def _write(self, operation, namespace: Optional[str], *args) -> None:
+        """Run a write operation in a transaction of its own"""
+        db = SessionLocal()
+        try:
+            operation(db, self._namespace(namespace), *args)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def add_documents(self, documents: List[Tuple[str, str]], namespace: Optional[str] = None) -> None:
+        """Index (vector ID, text) pairs, replacing documents with the same ID"""
+        if documents:
+            self._write(self._add, namespace, documents)
+
+    def delete_documents(self, ids: List[str], namespace: Optional[str] = None) -> None:
+        """Remove documents by vector ID"""
+        if ids:
+            self._write(self._delete, namespace, list(dict.fromkeys(ids)))
+
+    def search(self, query: str, top_k: int = 10, namespace: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return (vector ID, BM25 score) pairs of the best matching documents"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        namespace = self._namespace(namespace)
+
+        db = SessionLocal()
+        try:
+            if db.bind.dialect.name == "postgresql":
+                # Read the counters and postings from one snapshot
+                db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            state = db.query(LexicalNamespace).filter(LexicalNamespace.namespace == namespace).first()
+            if state is None or not state.doc_count:
+                return []
+            average_length = state.total_length / state.doc_count
+            # Postings still count deleted documents, so weigh them against every document they can hold
+            indexed_docs = state.doc_count + state.dead_docs
+
+            segments = defaultdict(list)
+            for row in db.query(
+                LexicalPosting.term, LexicalPosting.docs, LexicalPosting.tfs, LexicalPosting.lengths
+            ).filter(
+                LexicalPosting.namespace == namespace,
+                LexicalPosting.term.in_(terms)
+            ):
+                segments[row.term].append(row)
+
+            doc_parts, score_parts = [], []
+            for rows in segments.values():
+                docs = np.concatenate([np.frombuffer(row.docs, dtype=np.uint32) for row in rows])
+                tfs = np.concatenate([np.frombuffer(row.tfs, dtype=np.uint16) for row in rows]).astype(np.float32)
+                lengths = np.concatenate([np.frombuffer(row.lengths, dtype=np.uint16) for row in rows])
+                idf = math.log(1 + max(indexed_docs - len(docs) + 0.5, 0.0) / (len(docs) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+                doc_parts.append(docs)
+                score_parts.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+            if not doc_parts:
+                return []
+
+            matched, positions = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(positions, weights=np.concatenate(score_parts))
+            ranked = np.argsort(-scores, kind="stable")
+
+            # Deleted documents are skipped here, resolve candidates until top_k live ones are found
+            results = []
+            step = max(top_k * 2, 50)
+            for start in range(0, len(ranked), step):
+                batch = ranked[start:start + step]
+                ids = dict(db.query(LexicalDocument.doc, LexicalDocument.vector_id).filter(
+                    LexicalDocument.namespace == namespace,
+                    LexicalDocument.doc.in_(matched[batch].tolist())
+                ).all())
+                for position in batch.tolist():
+                    doc = int(matched[position])
+                    if doc in ids:
+                        results.append((ids[doc], float(scores[position])))
+                if len(results) >= top_k:
+                    break
+        finally:
+            db.close()
+
+        return results[:top_k]
+
+    async def aadd_documents(self, documents: List[Tuple[str, str]], namespace: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.add_documents, documents, namespace)
+
+    async def adelete_documents(self, ids: List[str], namespace: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.delete_documents, ids, namespace)
+
+    async def asearch(self, query: str, top_k: int = 10, namespace: Optional[str] = None) -> List[Tuple[str, float]]:
+        return await asyncio.to_thread(self.search, query, top_k, namespace)
+
+# Initialize the service
+lexical_index_service = LexicalIndexService()
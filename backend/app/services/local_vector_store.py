@@ -0,0 +1,384 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from .vector_store import VectorMatch, VectorRecord, VectorStore
+from ..utils.metadata_filter import filter_to_sql
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:  # Optional, large namespaces fall back to brute force
+    hnswlib = None
+
+MIN_CAPACITY = 1024
+
+class _Namespace:
+    """
+    Vectors of one namespace.
+
+    Rows of a float32 matrix in a memory-mapped .npy file hold unit-normalized
+    vectors; a SQLite table maps rows to IDs and metadata. Rows of deleted
+    vectors are reused by later inserts. A version counter, bumped by every
+    write, lets processes sharing the directory notice each other's changes.
+    """
+
+    def __init__(self, directory: str, hnsw_threshold: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.hnsw_path = os.path.join(directory, "hnsw.bin")
+        self.hnsw_threshold = hnsw_threshold
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(
+            os.path.join(directory, "records.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "row INTEGER PRIMARY KEY, "
+            "id TEXT NOT NULL UNIQUE, "
+            "metadata TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        self.version = None
+        self.matrix = None
+        self.hnsw = None
+        self.hnsw_dirty = False
+        self._refresh()
+
+    def _read_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _write_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _refresh(self) -> None:
+        """Reload the row mapping if another writer changed the namespace"""
+        version = int(self._read_meta("version") or 0)
+        if version == self.version:
+            return
+
+        self.matrix = np.load(self.vectors_path, mmap_mode="r+") if os.path.exists(self.vectors_path) else None
+        self.row_of = {vector_id: row for row, vector_id in self.conn.execute("SELECT row, id FROM records")}
+        self.count = max(self.row_of.values()) + 1 if self.row_of else 0
+        capacity = len(self.matrix) if self.matrix is not None else 0
+        self.live = np.zeros(capacity, dtype=bool)
+        self.live[list(self.row_of.values())] = True
+        self.free_rows = [row for row in range(self.count - 1, -1, -1) if not self.live[row]]
+        self.hnsw = None
+        self.version = version
+
+    def _grow(self, capacity: int, dimension: int) -> None:
+        """Copy the matrix into a larger file"""
+        new_capacity = max(MIN_CAPACITY, capacity, 2 * (len(self.matrix) if self.matrix is not None else 0))
+        tmp_path = self.vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dimension))
+        if self.matrix is not None:
+            grown[:self.count] = self.matrix[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.vectors_path)
+
+        self.matrix = np.load(self.vectors_path, mmap_mode="r+")
+        self.live = np.concatenate([self.live, np.zeros(new_capacity - len(self.live), dtype=bool)])
+        if self.hnsw is not None:
+            self.hnsw.resize_index(new_capacity)
+
+    @staticmethod
+    def _normalize(values: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(values, axis=-1, keepdims=True)
+        return values / np.where(norms == 0, 1, norms)
+
+    def upsert(self, vectors: List[Dict[str, Any]]) -> None:
+        values = self._normalize(np.asarray([vector["values"] for vector in vectors], dtype=np.float32))
+        with self.lock:
+            # BEGIN IMMEDIATE serializes writers across processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                dimension = values.shape[1]
+                if self.matrix is not None and self.matrix.shape[1] != dimension:
+                    raise ValueError(f"Vector dimension {dimension} does not match namespace dimension {self.matrix.shape[1]}")
+
+                rows = []
+                for vector in vectors:
+                    row = self.row_of.get(vector["id"])
+                    if row is None:
+                        if self.free_rows:
+                            row = self.free_rows.pop()
+                        else:
+                            row = self.count
+                            self.count += 1
+                        self.row_of[vector["id"]] = row
+                    rows.append(row)
+
+                if self.matrix is None or self.count > len(self.matrix):
+                    self._grow(self.count, dimension)
+
+                self.matrix[rows] = values
+                self.matrix.flush()
+                self.live[rows] = True
+
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO records (row, id, metadata) VALUES (?, ?, ?)",
+                    [
+                        (row, vector["id"], json.dumps(vector.get("metadata") or {}, separators=(",", ":")))
+                        for row, vector in zip(rows, vectors)
+                    ]
+                )
+                self._bump_version()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.version = None
+                raise
+
+            if self.hnsw is not None:
+                self.hnsw.add_items(values, rows)
+                self.hnsw_dirty = True
+
+    def delete(self, ids: List[str]) -> None:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                rows = [self.row_of.pop(vector_id) for vector_id in ids if vector_id in self.row_of]
+                if not rows:
+                    self.conn.execute("COMMIT")
+                    return
+                self.conn.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in rows])
+                self._bump_version()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.version = None
+                raise
+
+            self.live[rows] = False
+            self.free_rows.extend(rows)
+            if self.hnsw is not None:
+                for row in rows:
+                    self.hnsw.mark_deleted(row)
+                self.hnsw_dirty = True
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = list(updates)
+                rows = []
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    for vector_id, metadata in self.conn.execute(
+                        f"SELECT id, metadata FROM records WHERE id IN ({placeholders})",
+                        batch
+                    ):
+                        rows.append((json.dumps({**json.loads(metadata), **updates[vector_id]}), vector_id))
+                if rows:
+                    self.conn.executemany("UPDATE records SET metadata = ? WHERE id = ?", rows)
+                    self._bump_version()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.version = None
+                raise
+
+    def _bump_version(self) -> None:
+        self.version = int(self._read_meta("version") or 0) + 1
+        self._write_meta("version", str(self.version))
+
+    def _ensure_hnsw(self) -> None:
+        """Load or build the HNSW index of the namespace"""
+        if self.hnsw is not None:
+            return
+
+        capacity, dimension = self.matrix.shape
+        index = hnswlib.Index(space="ip", dim=dimension)
+        if os.path.exists(self.hnsw_path) and self._read_meta("hnsw_version") == str(self.version):
+            index.load_index(self.hnsw_path, max_elements=capacity)
+        else:
+            start_time = time.perf_counter()
+            rows = np.flatnonzero(self.live[:self.count])
+            index.init_index(max_elements=capacity, ef_construction=200, M=16)
+            index.add_items(self.matrix[rows], rows)
+            logger.info(f"Built HNSW index of {len(rows)} vectors in {self.directory} in {time.perf_counter() - start_time:.2f}s")
+            self.hnsw_dirty = True
+        self.hnsw = index
+
+    def save(self) -> None:
+        """Persist the HNSW index if it changed since it was loaded"""
+        with self.lock:
+            if self.hnsw is not None and self.hnsw_dirty:
+                self.hnsw.save_index(self.hnsw_path)
+                self._write_meta("hnsw_version", str(self.version))
+                self.hnsw_dirty = False
+
+    def _filtered_rows(self, metadata_filter: Dict[str, Any]) -> np.ndarray:
+        """Rows whose metadata matches a filter"""
+        clause, params = filter_to_sql(metadata_filter)
+        rows = [row for (row,) in self.conn.execute(f"SELECT row FROM records WHERE {clause}", params)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def query(self, vector: List[float], top_k: int, metadata_filter: Optional[Dict[str, Any]] = None) -> List[VectorMatch]:
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        with self.lock:
+            self._refresh()
+            allowed = self._filtered_rows(metadata_filter) if metadata_filter else None
+            live_count = len(self.row_of) if allowed is None else len(allowed)
+            top_k = min(top_k, live_count)
+            if top_k <= 0:
+                return []
+
+            if allowed is not None:
+                # Filtered queries scan only the matching rows
+                similarities = self.matrix[allowed] @ query
+                candidates = np.argsort(-similarities)[:top_k]
+                rows = allowed[candidates].tolist()
+                scores = similarities[candidates].tolist()
+            elif hnswlib is not None and live_count >= self.hnsw_threshold:
+                self._ensure_hnsw()
+                self.hnsw.set_ef(max(64, 2 * top_k))
+                labels, distances = self.hnsw.knn_query(query, k=top_k)
+                rows = labels[0].tolist()
+                scores = (1 - distances[0]).tolist()
+            else:
+                similarities = self.matrix[:self.count] @ query
+                similarities[~self.live[:self.count]] = -np.inf
+                candidates = np.argpartition(-similarities, top_k - 1)[:top_k]
+                candidates = candidates[np.argsort(-similarities[candidates])]
+                rows = candidates.tolist()
+                scores = similarities[candidates].tolist()
+
+            placeholders = ",".join("?" * len(rows))
+            records = {
+                row: (vector_id, metadata)
+                for row, vector_id, metadata in self.conn.execute(
+                    f"SELECT row, id, metadata FROM records WHERE row IN ({placeholders})",
+                    rows
+                )
+            }
+
+        return [
+            VectorMatch(id=records[row][0], score=float(score), metadata=json.loads(records[row][1]))
+            for row, score in zip(rows, scores)
+            if row in records
+        ]
+
+    def fetch(self, ids: List[str]) -> Dict[str, VectorRecord]:
+        with self.lock:
+            self._refresh()
+            found = {}
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for row, vector_id, metadata in self.conn.execute(
+                    f"SELECT row, id, metadata FROM records WHERE id IN ({placeholders})",
+                    batch
+                ):
+                    found[vector_id] = VectorRecord(
+                        id=vector_id,
+                        values=self.matrix[row].tolist(),
+                        metadata=json.loads(metadata)
+                    )
+            return found
+
+    def list_ids(self, prefix: str) -> List[str]:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self.lock:
+            return [
+                vector_id for (vector_id,) in self.conn.execute(
+                    "SELECT id FROM records WHERE id LIKE ? ESCAPE '\\' ORDER BY id",
+                    (escaped + "%",)
+                )
+            ]
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store persisted under a local directory.
+
+    Each namespace is searched by brute-force cosine similarity, or through an
+    HNSW index once it holds hnsw_threshold vectors and hnswlib is installed.
+    Stored vectors are unit-normalized, so fetched values are normalized too.
+    """
+
+    def __init__(self, path: str, hnsw_threshold: int):
+        self.path = path
+        self.hnsw_threshold = hnsw_threshold
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Local vector store at {path}")
+
+    def _namespace(self, namespace: Optional[str]) -> _Namespace:
+        name = namespace or "__default__"
+        with self._lock:
+            if name not in self._namespaces:
+                directory = os.path.join(self.path, re.sub(r"[^A-Za-z0-9_.-]", "_", name))
+                self._namespaces[name] = _Namespace(directory, self.hnsw_threshold)
+            return self._namespaces[name]
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Insert or replace vectors in a namespace"""
+        start_time = time.perf_counter()
+        if vectors:
+            self._namespace(namespace).upsert(vectors)
+        logger.info(f"Successfully upserted {len(vectors)} vectors to namespace {namespace}")
+        return [{
+            "batch": 0,
+            "vectors": len(vectors),
+            "seconds": round(time.perf_counter() - start_time, 3),
+            "attempts": 1
+        }]
+
+    def query_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[VectorMatch]:
+        """Return the top_k vectors of a namespace by cosine similarity, optionally filtered by metadata"""
+        return self._namespace(namespace).query(vector, top_k, filter)
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors from a namespace"""
+        self._namespace(namespace).delete(ids)
+        logger.info(f"Successfully deleted {len(ids)} vectors from namespace {namespace}")
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, VectorRecord]:
+        """Fetch vectors with their values and metadata by ID"""
+        return self._namespace(namespace).fetch(ids)
+
+    def list_vector_ids(self, prefix: str, namespace: Optional[str] = None) -> List[str]:
+        """List the IDs of vectors whose ID starts with prefix"""
+        return self._namespace(namespace).list_ids(prefix)
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        """Set metadata fields of vectors in a namespace"""
+        if updates:
+            self._namespace(namespace).update_metadata(updates)
+
+    async def aclose(self):
+        """Persist HNSW indexes so they need not be rebuilt on restart"""
+        for namespace in list(self._namespaces.values()):
+            namespace.save()
+
+    def drop(self):
+        """Delete the store's directory"""
+        with self._lock:
+            self._namespaces.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+        logger.info(f"Dropped local vector store at {self.path}")
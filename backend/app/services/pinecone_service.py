@@ -1,18 +1,62 @@
 import os
+import asyncio
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any, Optional
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException
 from ..config.settings import settings
+from .vector_store import VectorStore
+from .embedding_version_service import VersionedVectorStore, embedding_version_service
 
 logger = logging.getLogger(__name__)
 
-class PineconeService:
-    def __init__(self):
+class PineconeService(VectorStore):
+    def __init__(self, index_name: str, dimension: int, ensure_exists: bool = True):
         self._init_pinecone()
-        self.index_name = "ai-insights"
-        self.dimension = 1536  # Default dimension for OpenAI embeddings
+        self.index_name = index_name
+        self.dimension = dimension
         self.metric = "cosine"
-        self._ensure_index_exists()
+        self._index = None
+        self._index_host = None
+        self._async_index = None
+        self._async_index_loop = None
+        self._upsert_executor = ThreadPoolExecutor(
+            max_workers=settings.PINECONE_UPSERT_CONCURRENCY,
+            thread_name_prefix="pinecone-upsert"
+        )
+        if ensure_exists:
+            self._ensure_index_exists()
+
+    @property
+    def index(self):
+        """Index handle, created once and reused by every operation"""
+        if self._index is None:
+            self._index = self.pc.Index(host=self._index_host)
+        return self._index
+
+    async def _get_async_index(self):
+        """
+        Asyncio index handle, created once per event loop
+
+        The handle owns a pooled HTTP session that all async operations share.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_index is None or self._async_index_loop is not loop:
+            self._async_index = self.pc.IndexAsyncio(host=self._index_host)
+            self._async_index_loop = loop
+        return self._async_index
+
+    async def aclose(self):
+        """Close the pooled HTTP session of the asyncio index handle"""
+        if self._async_index is not None:
+            try:
+                await self._async_index.close()
+            finally:
+                self._async_index = None
+                self._async_index_loop = None
 
     def _init_pinecone(self):
         """Initialize Pinecone client"""
@@ -26,9 +70,17 @@ class PineconeService:
             raise
 
     def _ensure_index_exists(self):
-        """Ensure the default index exists, create if it doesn't"""
+        """
+        Ensure the index exists, create it if it doesn't
+
+        An existing index of another dimension is an error rather than being
+        recreated; changing the embedding model goes through a migration to a
+        new embedding version.
+        """
         try:
-            if self.index_name not in self.pc.list_indexes().names():
+            try:
+                description = self.pc.describe_index(self.index_name)
+            except NotFoundException:
                 self.pc.create_index(
                     name=self.index_name,
                     dimension=self.dimension,
@@ -39,47 +91,204 @@ class PineconeService:
                     )
                 )
                 logger.info(f"Created Pinecone index: {self.index_name}")
-            else:
-                # Check if existing index has correct dimensions
-                index = self.pc.Index(self.index_name)
-                index_description = index.describe_index_stats()
-                if index_description.dimension != self.dimension:
-                    logger.warning(f"Existing index has dimension {index_description.dimension}, recreating with dimension {self.dimension}")
-                    self.pc.delete_index(self.index_name)
-                    self.pc.create_index(
-                        name=self.index_name,
-                        dimension=self.dimension,
-                        metric=self.metric,
-                        spec=ServerlessSpec(
-                            cloud='aws',
-                            region='us-east-1'
-                        )
-                    )
-                    logger.info(f"Recreated Pinecone index: {self.index_name} with correct dimensions")
-                else:
-                    logger.info(f"Pinecone index {self.index_name} already exists with correct dimensions")
+                description = self.pc.describe_index(self.index_name)
+
+            if description.dimension != self.dimension:
+                raise ValueError(
+                    f"Pinecone index {self.index_name} has dimension {description.dimension}, "
+                    f"expected {self.dimension}"
+                )
+            self._index_host = description.host
         except Exception as e:
             logger.error(f"Failed to ensure index exists: {e}")
             raise
 
-    def upsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None):
-        """Upsert vectors to Pinecone index"""
+    def drop(self):
+        """Delete the index"""
+        self._index = None
         try:
-            index = self.pc.Index(self.index_name)
-            index.upsert(vectors=vectors, namespace=namespace)
-            logger.info(f"Successfully upserted {len(vectors)} vectors to namespace {namespace}")
+            self.pc.delete_index(self.index_name)
+            logger.info(f"Deleted Pinecone index: {self.index_name}")
+        except NotFoundException:
+            logger.info(f"Pinecone index {self.index_name} was already deleted")
+
+    @staticmethod
+    def _estimate_vector_bytes(vector: Dict[str, Any]) -> int:
+        """Estimate the serialized size of a vector in an upsert request"""
+        # Floats serialize to at most ~20 characters each
+        return (
+            len(vector["id"])
+            + len(vector["values"]) * 20
+            + len(json.dumps(vector.get("metadata", {}), separators=(",", ":")))
+            + 64
+        )
+
+    def _batch_vectors(self, vectors: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split vectors into batches bounded by vector count and payload size"""
+        batches = []
+        current_batch = []
+        current_bytes = 0
+
+        for vector in vectors:
+            size = self._estimate_vector_bytes(vector)
+            if current_batch and (
+                len(current_batch) >= settings.PINECONE_UPSERT_BATCH_SIZE
+                or current_bytes + size > settings.PINECONE_UPSERT_MAX_BYTES
+            ):
+                batches.append(current_batch)
+                current_batch = []
+                current_bytes = 0
+
+            current_batch.append(vector)
+            current_bytes += size
+
+        if current_batch:
+            batches.append(current_batch)
+
+        return batches
+
+    def _upsert_batch(self, batch: List[Dict[str, Any]], namespace: Optional[str]) -> float:
+        """Upsert a single batch and return how long it took"""
+        start_time = time.perf_counter()
+        self.index.upsert(vectors=batch, namespace=namespace)
+        return time.perf_counter() - start_time
+
+    def _batch_result(self, i: int, batch: List[Dict[str, Any]], seconds: float, attempt: int) -> Dict[str, Any]:
+        return {
+            "batch": i,
+            "vectors": len(batch),
+            "bytes": sum(self._estimate_vector_bytes(vector) for vector in batch),
+            "seconds": round(seconds, 3),
+            "attempts": attempt
+        }
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Upsert vectors to Pinecone index
+
+        Vectors are split into size-bounded batches that are sent concurrently.
+        Only batches that fail are retried, with exponential backoff.
+
+        Returns:
+            list: Per-batch vector count, estimated bytes, seconds and attempts
+        """
+        batches = self._batch_vectors(vectors)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batches)
+        pending = list(range(len(batches)))
+        attempt = 0
+
+        while pending:
+            attempt += 1
+            futures = {
+                self._upsert_executor.submit(self._upsert_batch, batches[i], namespace): i
+                for i in pending
+            }
+
+            failed = []
+            last_error = None
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    logger.warning(f"Upsert of batch {i} to namespace {namespace} failed on attempt {attempt}: {e}")
+                    failed.append(i)
+                    last_error = e
+                    continue
+
+                results[i] = self._batch_result(i, batches[i], seconds, attempt)
+
+            if failed and attempt >= settings.PINECONE_UPSERT_MAX_ATTEMPTS:
+                logger.error(f"Failed to upsert {len(failed)} of {len(batches)} batches: {last_error}")
+                raise last_error
+            if failed:
+                time.sleep(settings.PINECONE_UPSERT_RETRY_DELAY * 2 ** (attempt - 1))
+            pending = sorted(failed)
+
+        logger.info(f"Successfully upserted {len(vectors)} vectors in {len(batches)} batches to namespace {namespace}")
+        return results
+
+    async def aupsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Upsert vectors to Pinecone index without blocking the event loop
+
+        Same batching, concurrency and retries as upsert_vectors.
+        """
+        index = await self._get_async_index()
+        semaphore = asyncio.Semaphore(settings.PINECONE_UPSERT_CONCURRENCY)
+        batches = self._batch_vectors(vectors)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batches)
+        pending = list(range(len(batches)))
+        attempt = 0
+
+        async def upsert_batch(i: int) -> float:
+            async with semaphore:
+                start_time = time.perf_counter()
+                await index.upsert(vectors=batches[i], namespace=namespace)
+                return time.perf_counter() - start_time
+
+        while pending:
+            attempt += 1
+            outcomes = await asyncio.gather(*(upsert_batch(i) for i in pending), return_exceptions=True)
+
+            failed = []
+            last_error = None
+            for i, outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.warning(f"Upsert of batch {i} to namespace {namespace} failed on attempt {attempt}: {outcome}")
+                    failed.append(i)
+                    last_error = outcome
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    results[i] = self._batch_result(i, batches[i], outcome, attempt)
+
+            if failed and attempt >= settings.PINECONE_UPSERT_MAX_ATTEMPTS:
+                logger.error(f"Failed to upsert {len(failed)} of {len(batches)} batches: {last_error}")
+                raise last_error
+            if failed:
+                await asyncio.sleep(settings.PINECONE_UPSERT_RETRY_DELAY * 2 ** (attempt - 1))
+            pending = failed
+
+        logger.info(f"Successfully upserted {len(vectors)} vectors in {len(batches)} batches to namespace {namespace}")
+        return results
+
+    def query_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Query vectors from Pinecone index"""
+        try:
+            results = self.index.query(
+                vector=vector,
+                top_k=top_k,
+                namespace=namespace,
+                filter=filter,
+                include_metadata=True
+            )
+            return results.matches
         except Exception as e:
-            logger.error(f"Failed to upsert vectors: {e}")
+            logger.error(f"Failed to query vectors: {e}")
             raise
 
-    def query_vectors(self, vector: List[float], top_k: int = 5, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Query vectors from Pinecone index"""
+    async def aquery_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Query vectors from Pinecone index without blocking the event loop"""
         try:
-            index = self.pc.Index(self.index_name)
-            results = index.query(
+            index = await self._get_async_index()
+            results = await index.query(
                 vector=vector,
                 top_k=top_k,
                 namespace=namespace,
+                filter=filter,
                 include_metadata=True
             )
             return results.matches
@@ -90,12 +299,79 @@ class PineconeService:
     def delete_vectors(self, ids: List[str], namespace: Optional[str] = None):
         """Delete vectors from Pinecone index"""
         try:
-            index = self.pc.Index(self.index_name)
-            index.delete(ids=ids, namespace=namespace)
+            self.index.delete(ids=ids, namespace=namespace)
+            logger.info(f"Successfully deleted {len(ids)} vectors from namespace {namespace}")
+        except Exception as e:
+            logger.error(f"Failed to delete vectors: {e}")
+            raise
+
+    async def adelete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors from Pinecone index without blocking the event loop"""
+        try:
+            index = await self._get_async_index()
+            await index.delete(ids=ids, namespace=namespace)
             logger.info(f"Successfully deleted {len(ids)} vectors from namespace {namespace}")
         except Exception as e:
             logger.error(f"Failed to delete vectors: {e}")
             raise
 
-# Initialize the service
-pinecone_service = PineconeService() 
\ No newline at end of file
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch vectors with their values and metadata by ID"""
+        try:
+            return self.index.fetch(ids=ids, namespace=namespace).vectors
+        except Exception as e:
+            logger.error(f"Failed to fetch vectors: {e}")
+            raise
+
+    async def afetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch vectors by ID without blocking the event loop"""
+        try:
+            index = await self._get_async_index()
+            return (await index.fetch(ids=ids, namespace=namespace)).vectors
+        except Exception as e:
+            logger.error(f"Failed to fetch vectors: {e}")
+            raise
+
+    def list_vector_ids(self, prefix: str, namespace: Optional[str] = None) -> List[str]:
+        """List the IDs of vectors whose ID starts with prefix"""
+        try:
+            return [vector_id for page in self.index.list(prefix=prefix, namespace=namespace) for vector_id in page]
+        except Exception as e:
+            logger.error(f"Failed to list vectors: {e}")
+            raise
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        """Set metadata fields of vectors, one update request per vector sent concurrently"""
+        try:
+            futures = [
+                self._upsert_executor.submit(self.index.update, id=vector_id, set_metadata=metadata, namespace=namespace)
+                for vector_id, metadata in updates.items()
+            ]
+            for future in as_completed(futures):
+                future.result()
+            logger.info(f"Successfully updated metadata of {len(updates)} vectors in namespace {namespace}")
+        except Exception as e:
+            logger.error(f"Failed to update vector metadata: {e}")
+            raise
+
+def create_vector_store(index_name: str, dimension: int, ensure_exists: bool = True) -> VectorStore:
+    """
+    Create the store of one vector index on the backend selected by
+    VECTOR_STORE_BACKEND. Without ensure_exists a missing index is not
+    created, for stores that are only opened to be dropped.
+    """
+    if settings.VECTOR_STORE_BACKEND == "local":
+        from .local_vector_store import LocalVectorStore
+        path = settings.LOCAL_VECTOR_STORE_PATH
+        if index_name != settings.PINECONE_INDEX_NAME:
+            path = f"{path}-{index_name}"
+        return LocalVectorStore(
+            path=path,
+            hnsw_threshold=settings.LOCAL_VECTOR_STORE_HNSW_THRESHOLD
+        )
+    if settings.VECTOR_STORE_BACKEND != "pinecone":
+        raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
+    return PineconeService(index_name, dimension, ensure_exists=ensure_exists)
+
+# Initialize the service, routing to the store of the active embedding version
+pinecone_service = VersionedVectorStore(embedding_version_service) 
\ No newline at end of file
@@ -1,16 +1,40 @@
+import asyncio
+import hashlib
+import threading
 import boto3
 from botocore.exceptions import ClientError
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncGenerator, BinaryIO, Optional
 import logging
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# S3 rejects multipart uploads of more than 10,000 parts
+MAX_PARTS = 10000
+
 class R2Service:
     def __init__(self):
-        self.client = self._get_r2_client()
+        self._client = None
+        self._client_lock = threading.Lock()
         self.bucket = settings.R2_BUCKET_NAME
 
+    @property
+    def client(self):
+        """R2 client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._get_r2_client()
+        return self._client
+
+    def check_bucket(self) -> None:
+        """Verify the bucket is reachable with the configured credentials"""
+        self.client.head_bucket(Bucket=self.bucket)
+
     def _get_r2_client(self):
         """Initialize and return R2 client"""
         return boto3.client(
@@ -20,30 +44,210 @@ class R2Service:
             aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY
         )
 
-    async def upload_file(self, file_obj, workspace_name: str, filename: str) -> Dict[str, Any]:
-        """Upload a file to R2"""
+    @staticmethod
+    def object_key(workspace_name: str, filename: str) -> str:
+        """Construct the object key of a file in a workspace"""
+        prefix = workspace_name.strip('/')
+        return f"{prefix}/{filename}" if prefix else filename
+
+    def _upload_part(self, object_key: str, upload_id: str, part_number: int, data: bytes) -> Dict[str, Any]:
+        """Upload one part of a multipart upload"""
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=object_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    @staticmethod
+    def _read_part(file_obj: BinaryIO, part_size: int) -> bytes:
+        """Read part_size bytes, or up to EOF; streams such as zip members return short reads"""
+        data = file_obj.read(part_size)
+        if len(data) == part_size or not data:
+            return data
+        buffer = bytearray(data)
+        while len(buffer) < part_size:
+            data = file_obj.read(part_size - len(buffer))
+            if not data:
+                break
+            buffer += data
+        return bytes(buffer)
+
+    def _upload_stream_sync(self, file_obj: BinaryIO, object_key: str, content_type: Optional[str]) -> Dict[str, Any]:
+        """
+        Upload a file object in parts, hashing it on the fly.
+
+        At most R2_MULTIPART_CONCURRENCY parts are in flight, so memory use is
+        bounded by part size times concurrency regardless of the file size.
+        """
+        part_size = max(settings.R2_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+        concurrency = settings.R2_MULTIPART_CONCURRENCY
+        extra_args = {"ContentType": content_type} if content_type else {}
+        hasher = hashlib.sha256()
+
+        data = self._read_part(file_obj, part_size)
+        hasher.update(data)
+        size = len(data)
+
+        # Small files fit in a single request
+        if len(data) < part_size:
+            response = self.client.put_object(Bucket=self.bucket, Key=object_key, Body=data, **extra_args)
+            return {"size": size, "sha256": hasher.hexdigest(), "etag": response.get("ETag")}
+
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=object_key,
+            **extra_args
+        )["UploadId"]
         try:
-            # Construct object key
-            prefix = workspace_name.strip('/')
-            object_key = f"{prefix}/{filename}" if prefix else filename
+            slots = threading.BoundedSemaphore(concurrency)
+            futures = []
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="r2-upload") as executor:
+                part_number = 1
+                while data:
+                    failed = next((f for f in futures if f.done() and f.exception()), None)
+                    if failed is not None:
+                        raise failed.exception()
+
+                    slots.acquire()
+                    future = executor.submit(self._upload_part, object_key, upload_id, part_number, data)
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+
+                    data = self._read_part(file_obj, part_size)
+                    hasher.update(data)
+                    size += len(data)
+                    part_number += 1
 
-            # Upload file
-            self.client.upload_fileobj(
-                Fileobj=file_obj,
+                parts = [future.result() for future in futures]
+
+            response = self.client.complete_multipart_upload(
                 Bucket=self.bucket,
-                Key=object_key
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
             )
+            return {"size": size, "sha256": hasher.hexdigest(), "etag": response.get("ETag")}
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+
+    async def upload_stream(
+        self,
+        file_obj: BinaryIO,
+        workspace_name: str,
+        filename: str,
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Stream a file object to R2 with concurrent multipart parts, off the event loop"""
+        try:
+            object_key = self.object_key(workspace_name, filename)
+
+            result = await asyncio.to_thread(self._upload_stream_sync, file_obj, object_key, content_type)
 
             return {
                 "message": "File uploaded successfully",
                 "filename": filename,
                 "stored_key": object_key,
-                "bucket": self.bucket
+                "bucket": self.bucket,
+                **result
             }
         except ClientError as e:
             logger.error(f"R2 upload error: {e}")
             raise
 
+    def _create_presigned_upload(
+        self,
+        object_key: str,
+        file_size: int,
+        content_type: Optional[str]
+    ) -> Dict[str, Any]:
+        expires_in = settings.R2_PRESIGNED_URL_EXPIRY
+        # Large files get larger parts, so they fit in MAX_PARTS
+        part_size = max(settings.R2_MULTIPART_PART_SIZE, MIN_PART_SIZE, -(-file_size // MAX_PARTS))
+
+        if file_size <= part_size:
+            params = {"Bucket": self.bucket, "Key": object_key}
+            if content_type:
+                params["ContentType"] = content_type
+            url = self.client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+            return {"object_key": object_key, "upload_id": None, "part_size": None, "urls": [url]}
+
+        extra_args = {"ContentType": content_type} if content_type else {}
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=object_key,
+            **extra_args
+        )["UploadId"]
+        part_count = (file_size + part_size - 1) // part_size
+        urls = [
+            self.client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": self.bucket,
+                    "Key": object_key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number
+                },
+                ExpiresIn=expires_in
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+        return {"object_key": object_key, "upload_id": upload_id, "part_size": part_size, "urls": urls}
+
+    async def create_presigned_upload(
+        self,
+        workspace_name: str,
+        filename: str,
+        file_size: int,
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Create presigned URLs for uploading a file directly to R2
+
+        Files up to one part get a single PUT URL. Larger files get a multipart
+        upload with one presigned URL per part, in part number order; the part
+        size grows as needed to stay within MAX_PARTS.
+        """
+        try:
+            object_key = self.object_key(workspace_name, filename)
+            return await asyncio.to_thread(self._create_presigned_upload, object_key, file_size, content_type)
+        except ClientError as e:
+            logger.error(f"R2 presign error: {e}")
+            raise
+
+    async def complete_multipart_upload(self, object_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> str:
+        """Complete a multipart upload and return the object's ETag"""
+        try:
+            response = await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])}
+            )
+            return response.get("ETag")
+        except ClientError as e:
+            logger.error(f"R2 multipart completion error: {e}")
+            raise
+
+    async def head_file(self, file_key: str) -> Optional[Dict[str, Any]]:
+        """Get the size, ETag and content type of a file, or None if it does not exist"""
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=file_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            logger.error(f"R2 head error: {e}")
+            raise
+        return {
+            "size": response["ContentLength"],
+            "etag": response.get("ETag"),
+            "content_type": response.get("ContentType")
+        }
+
     async def list_files(self, workspace_name: str) -> List[Dict[str, Any]]:
         """List files in a workspace"""
         try:
@@ -75,13 +279,35 @@ class R2Service:
             logger.error(f"R2 list error: {e}")
             raise
 
-    async def download_file(self, file_key: str) -> bytes:
-        """Download a file from R2"""
+    async def delete_file(self, file_key: str) -> None:
+        """Delete a file from R2"""
         try:
-            response = self.client.get_object(Bucket=self.bucket, Key=file_key)
-            return response['Body'].read()
+            await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=file_key)
+        except ClientError as e:
+            logger.error(f"R2 delete error: {e}")
+            raise
+
+    async def stream_file(self, file_key: str, block_size: Optional[int] = None) -> AsyncGenerator[bytes, None]:
+        """Stream a file from R2 in fixed-size blocks"""
+        block_size = block_size or settings.R2_STREAM_BLOCK_SIZE
+        try:
+            response = await asyncio.to_thread(
+                self.client.get_object,
+                Bucket=self.bucket,
+                Key=file_key
+            )
         except ClientError as e:
             logger.error(f"R2 download error: {e}")
             raise
 
+        body = response['Body']
+        try:
+            while True:
+                block = await asyncio.to_thread(body.read, block_size)
+                if not block:
+                    break
+                yield block
+        finally:
+            body.close()
+
 r2_service = R2Service() 
\ No newline at end of file
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional, Tuple
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class DependencyStatus:
+    status: str = "pending"  # pending, ready or failed
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: Optional[float] = None
+
+class ReadinessService:
+    """
+    Warms up dependency clients concurrently and tracks which are usable.
+
+    Checks are blocking callables run in threads, each bounded by a timeout,
+    so one unreachable dependency neither blocks startup nor the others. A
+    failed check is retried by the next readiness probe once retry_interval
+    has passed.
+    """
+
+    def __init__(self, timeout: float, retry_interval: float):
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._checks: Dict[str, Callable[[], Any]] = {}
+        self._status: Dict[str, DependencyStatus] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def register(self, name: str, check: Callable[[], Any]) -> None:
+        """Add a dependency, checked by calling check; it is usable once check returns"""
+        self._checks[name] = check
+        self._status[name] = DependencyStatus()
+
+    async def _run(self, name: str) -> None:
+        status = self._status[name]
+        start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._checks[name]), self.timeout)
+            status.status, status.error = "ready", None
+            logger.info(f"Dependency {name} ready in {time.perf_counter() - start_time:.2f}s")
+        except asyncio.TimeoutError:
+            status.status, status.error = "failed", f"Timed out after {self.timeout}s"
+            logger.error(f"Dependency {name} timed out after {self.timeout}s")
+        except Exception as e:
+            status.status, status.error = "failed", str(e)
+            logger.error(f"Dependency {name} failed: {str(e)}")
+        status.seconds = round(time.perf_counter() - start_time, 3)
+        status.checked_at = time.time()
+
+    def _start(self, name: str) -> asyncio.Task:
+        """Run a check, or join the run already in flight"""
+        task = self._running.get(name)
+        if task is None or task.done():
+            task = self._running[name] = asyncio.create_task(self._run(name))
+        return task
+
+    async def warm_up(self) -> None:
+        """Check all dependencies concurrently"""
+        await asyncio.gather(*(self._start(name) for name in self._checks))
+
+    async def check(self) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+        """
+        Retry failed dependencies whose last check is older than retry_interval
+        and report whether all are ready, with each one's status
+        """
+        now = time.time()
+        retry = [
+            name for name, status in self._status.items()
+            if status.status == "failed" and now - status.checked_at >= self.retry_interval
+        ]
+        if retry:
+            await asyncio.gather(*(self._start(name) for name in retry))
+
+        ready = all(status.status == "ready" for status in self._status.values())
+        return ready, {name: asdict(status) for name, status in self._status.items()}
+
+# Initialize the service
+readiness_service = ReadinessService(
+    timeout=settings.READINESS_TIMEOUT,
+    retry_interval=settings.READINESS_RETRY_INTERVAL
+)
@@ -5,11 +5,14 @@ from sqlalchemy import desc
 from datetime import datetime
 import logging
 import asyncio
+import hashlib
+import json
 
 from ..models.template import AITemplate
 from ..schemas.template import TemplateCreate, TemplateUpdate
 from ..services.assistant_service import assistant_service
-from ..services.pinecone_service import pinecone_service
+from ..services.answer_cache import AnswerLookup, answer_cache, replay_answer
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -152,44 +155,101 @@ class TemplateService:
         
         return "".join(prompt_parts)
     
+    @staticmethod
+    def _template_version(template: AITemplate, additional_context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Hash of everything in a template run that shapes the answer besides the
+        user input, so cached answers are not served after the template changes
+        """
+        fields = [
+            template.llm_model,
+            template.prompt,
+            template.main_instructions,
+            template.business_description,
+            template.customer_profile,
+            template.rules_and_filters,
+            template.example_outputs,
+            template.guidance_override,
+            additional_context,
+        ]
+        serialized = json.dumps(fields, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+    
+    async def _prepare_template_run(
+        self,
+        db: Session,
+        template: AITemplate,
+        workspace_id: UUID,
+        user_input: Optional[str] = None,
+        additional_context: Optional[Dict[str, Any]] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, str, AnswerLookup, Optional[List[Any]]]:
+        """
+        Build the prompt, consult the answer cache and, on a miss, retrieve the
+        context in a single pass. Usage is tracked concurrently with retrieval.
+        Retrieval is limited to chunks whose metadata matches metadata_filter.
+
+        Returns:
+            Tuple of the prompt, the model, the answer cache lookup and the
+            retrieved matches (None on a cache hit)
+        """
+        # Read before the usage commit expires the template's attributes
+        model = template.llm_model or assistant_service.default_model
+        template_version = self._template_version(template, additional_context)
+        
+        # Combine template with user input
+        prompt = self._combine_template_with_user_input(
+            template, 
+            user_input, 
+            additional_context
+        )
+        
+        # Embed and query once, the packed matches serve both the metadata and the LLM context
+        embedding_query = user_input if user_input else prompt[:1000]  # Use first 1000 chars if no user input
+        lookup = await assistant_service.lookup_answer(
+            str(workspace_id), model, embedding_query, template_version, metadata_filter
+        )
+        if lookup.hit:
+            await asyncio.to_thread(self._track_template_usage, db, template, workspace_id)
+            return prompt, model, lookup, None
+        
+        matches, _ = await asyncio.gather(
+            assistant_service.retrieve(str(workspace_id), embedding_query, metadata_filter=metadata_filter),
+            asyncio.to_thread(self._track_template_usage, db, template, workspace_id)
+        )
+        return prompt, model, lookup, matches
+    
     async def process_workspace_with_template(
         self,
         db: Session,
-        template_id: UUID,
+        template: AITemplate,
         workspace_id: UUID,
         user_input: Optional[str] = None,
-        additional_context: Optional[Dict[str, Any]] = None
+        additional_context: Optional[Dict[str, Any]] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Process a workspace using a template
         """
         try:
-            # Get template
-            template = self.get_template(db, template_id)
-            if not template:
-                raise ValueError(f"Template with ID {template_id} not found")
-            
-            # Combine template with user input
-            prompt = self._combine_template_with_user_input(
-                template, 
-                user_input, 
-                additional_context
+            prompt, model, lookup, matches = await self._prepare_template_run(
+                db, template, workspace_id, user_input, additional_context, metadata_filter
             )
+            if lookup.hit:
+                return lookup.answer, lookup.extra["metadata"]
             
-            # Get relevant metadata from Pinecone
-            embedding_query = user_input if user_input else prompt[:1000]  # Use first 1000 chars if no user input
-            metadata = await self._get_workspace_metadata(str(workspace_id), embedding_query)
+            packed = assistant_service.build_context(matches, model)
+            metadata = self._build_workspace_metadata(str(workspace_id), packed.matches)
             
             # Process prompt with the assistant service
             result = await assistant_service.process_prompt(
                 workspace_id=str(workspace_id),
                 prompt=prompt,
-                model=template.llm_model
+                model=model,
+                context=packed.text
             )
             
-            # Track usage
-            self._track_template_usage(db, template_id, workspace_id)
-            
+            answer_cache.store(lookup, result, {"metadata": metadata})
             return result, metadata
         except Exception as e:
             logger.error(f"Error processing workspace with template: {str(e)}", exc_info=True)
@@ -198,93 +258,80 @@ class TemplateService:
     async def process_workspace_with_template_stream(
         self,
         db: Session,
-        template_id: UUID,
+        template: AITemplate,
         workspace_id: UUID,
         user_input: Optional[str] = None,
-        additional_context: Optional[Dict[str, Any]] = None
+        additional_context: Optional[Dict[str, Any]] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
     ) -> AsyncGenerator[str, None]:
         """
         Process a workspace using a template and stream the response
         """
         try:
-            # Get template
-            template = self.get_template(db, template_id)
-            if not template:
-                raise ValueError(f"Template with ID {template_id} not found")
-            
-            # Combine template with user input
-            prompt = self._combine_template_with_user_input(
-                template, 
-                user_input, 
-                additional_context
+            # Retrieve before streaming starts
+            prompt, model, lookup, matches = await self._prepare_template_run(
+                db, template, workspace_id, user_input, additional_context, metadata_filter
             )
             
-            # Get relevant metadata from Pinecone (do this before streaming starts)
-            embedding_query = user_input if user_input else prompt[:1000]
-            metadata = await self._get_workspace_metadata(str(workspace_id), embedding_query)
+            # Replay a cached answer as if it were streamed by the model
+            if lookup.hit:
+                yield {"metadata": lookup.extra["metadata"]}
+                async for chunk in replay_answer(lookup.answer, settings.ANSWER_CACHE_REPLAY_CHUNK_CHARS):
+                    yield chunk
+                return
+            
+            packed = assistant_service.build_context(matches, model)
+            metadata = self._build_workspace_metadata(str(workspace_id), packed.matches)
             
             # Yield metadata as the first chunk
             yield {"metadata": metadata}
             
             # Process prompt with streaming
+            parts = []
             async for chunk in assistant_service.process_prompt_stream(
                 workspace_id=str(workspace_id),
                 prompt=prompt,
-                model=template.llm_model
+                model=model,
+                context=packed.text
             ):
+                if isinstance(chunk, str):
+                    parts.append(chunk)
                 yield chunk
             
-            # Track usage (after streaming is complete)
-            self._track_template_usage(db, template_id, workspace_id)
+            answer_cache.store(lookup, "".join(parts), {"metadata": metadata})
             
         except Exception as e:
             logger.error(f"Error processing workspace with template stream: {str(e)}", exc_info=True)
             yield {"error": str(e)}
             raise
     
-    async def _get_workspace_metadata(self, workspace_id: str, query: str) -> Dict[str, Any]:
+    def _build_workspace_metadata(self, workspace_id: str, matches: List[Any]) -> Dict[str, Any]:
         """
-        Get relevant metadata from Pinecone for the workspace
+        Organize the metadata of retrieved matches for the response
         """
-        try:
-            # Use the assistant service to get embeddings
-            embeddings = await assistant_service.embeddings.aembed_query(query)
-            
-            # Query Pinecone for relevant vectors
-            results = pinecone_service.query_vectors(
-                vector=embeddings,
-                top_k=5,
-                namespace=workspace_id
-            )
-            
-            # Extract and organize metadata
-            sources = []
-            for match in results:
-                if "source" in match.metadata:
-                    sources.append({
-                        "source": match.metadata["source"],
-                        "score": match.score,
-                        "content": match.metadata.get("text", ""),
-                    })
-            
-            return {
-                "sources": sources,
-                "timestamp": datetime.now().isoformat(),
-                "workspace_id": workspace_id,
-            }
-        except Exception as e:
-            logger.error(f"Error getting workspace metadata: {str(e)}", exc_info=True)
-            return {"error": str(e)}
+        sources = []
+        for match in matches:
+            if "source" in match.metadata:
+                sources.append({
+                    "source": match.metadata["source"],
+                    "score": match.score,
+                    "content": match.metadata.get("text", ""),
+                })
+        
+        return {
+            "sources": sources,
+            "timestamp": datetime.now().isoformat(),
+            "workspace_id": workspace_id,
+        }
     
-    def _track_template_usage(self, db: Session, template_id: UUID, workspace_id: UUID) -> None:
+    def _track_template_usage(self, db: Session, template: AITemplate, workspace_id: UUID) -> None:
         """
         Track template usage statistics
         """
         # This could be expanded to store usage metrics in the database
-        logger.info(f"Template {template_id} used with workspace {workspace_id}")
+        logger.info(f"Template {template.id} used with workspace {workspace_id}")
         
         # For now, just update the template's updated_at timestamp
-        template = self.get_template(db, template_id)
         template.updated_at = datetime.now()
         db.commit()
 
@@ -0,0 +1,84 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+@dataclass
+class VectorMatch:
+    """A query result, shaped like a Pinecone match"""
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class VectorRecord:
+    """A stored vector, shaped like a Pinecone fetch result"""
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+class VectorStore(ABC):
+    """
+    Interface of the vector store behind pinecone_service.
+
+    Backends implement the blocking operations; the async variants run them in
+    a thread unless a backend has a native async client.
+    """
+
+    @abstractmethod
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Insert or replace vectors given as {id, values, metadata} dicts"""
+
+    @abstractmethod
+    def query_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Return the top_k most similar vectors whose metadata matches filter, with their metadata"""
+
+    @abstractmethod
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors by ID"""
+
+    @abstractmethod
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch vectors with their values and metadata by ID"""
+
+    @abstractmethod
+    def list_vector_ids(self, prefix: str, namespace: Optional[str] = None) -> List[str]:
+        """List the IDs of vectors whose ID starts with prefix"""
+
+    @abstractmethod
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        """Set metadata fields of vectors, given as {vector ID: fields}, keeping their other fields"""
+
+    async def aupsert_vectors(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.upsert_vectors, vectors, namespace)
+
+    async def aquery_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        return await asyncio.to_thread(self.query_vectors, vector, top_k, namespace, filter)
+
+    async def adelete_vectors(self, ids: List[str], namespace: Optional[str] = None):
+        return await asyncio.to_thread(self.delete_vectors, ids, namespace)
+
+    async def afetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.fetch_vectors, ids, namespace)
+
+    async def aupdate_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.update_metadata, updates, namespace)
+
+    @abstractmethod
+    def drop(self):
+        """Delete the store with all its namespaces"""
+
+    async def aclose(self):
+        """Release clients and flush pending state"""
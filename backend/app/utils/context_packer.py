@@ -0,0 +1,184 @@
+import copy
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from .tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Chunks are split with a 200 character overlap; allow some slack when looking for it
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 20
+
+# Don't bother packing a truncated block smaller than this
+MIN_PARTIAL_TOKENS = 100
+
+@dataclass
+class ContextBlock:
+    """Text of one or more merged chunks from the same source"""
+    source: str
+    text: str
+    score: float
+    matches: List[Any] = field(default_factory=list)
+
+@dataclass
+class PackedContext:
+    text: str
+    matches: List[Any]
+    tokens: int
+
+def _tokens(text: str) -> Set[str]:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+def _merge_text(left: str, right: str) -> str:
+    """Join the text of adjacent chunks without repeating their overlap or a shared header row"""
+    if right in left:
+        return left
+    overlap = _overlap(left, right)
+    if overlap:
+        return left + right[overlap:]
+    left_header, _, _ = left.partition("\n")
+    right_header, _, right_rest = right.partition("\n")
+    if left_header and left_header == right_header:
+        return f"{left}\n{right_rest}"
+    return f"{left}\n{right}"
+
+def _similarity(match: Any) -> Optional[float]:
+    """
+    Vector similarity of a match. Fused results carry it in their metadata,
+    None for lexical-only hits; plain vector results score by similarity.
+    """
+    if "similarity" in match.metadata:
+        return match.metadata["similarity"]
+    return match.score
+
+def select_mmr(matches: List[Any], limit: int, diversity: float) -> List[Any]:
+    """
+    Order matches by maximal marginal relevance.
+
+    Each pick maximizes (1 - diversity) * relevance - diversity * similarity to
+    the matches already picked, with token-set Jaccard similarity.
+    """
+    if not matches:
+        return []
+    top_score = max(match.score for match in matches) or 1.0
+    token_sets = [_tokens(match.metadata.get("text", "")) for match in matches]
+    remaining = list(range(len(matches)))
+    selected: List[int] = []
+
+    while remaining and len(selected) < limit:
+        def mmr(i: int) -> float:
+            redundancy = max((_jaccard(token_sets[i], token_sets[j]) for j in selected), default=0.0)
+            return (1 - diversity) * matches[i].score / top_score - diversity * redundancy
+        best = max(remaining, key=mmr)
+        selected.append(best)
+        remaining.remove(best)
+
+    return [matches[i] for i in selected]
+
+def merge_adjacent(matches: List[Any]) -> List[ContextBlock]:
+    """
+    Merge matches from the same source whose chunk indexes are consecutive.
+    Blocks keep the order of their first match in matches.
+    """
+    position = {id(match): i for i, match in enumerate(matches)}
+    by_source: Dict[str, List[Any]] = {}
+    for match in matches:
+        by_source.setdefault(match.metadata.get("source", match.id), []).append(match)
+
+    blocks = []
+    for source, source_matches in by_source.items():
+        source_matches.sort(key=lambda match: match.metadata.get("chunk_index", -1))
+        current: Optional[ContextBlock] = None
+        previous_index = None
+        for match in source_matches:
+            text = match.metadata.get("text", "")
+            index = match.metadata.get("chunk_index")
+            adjacent = (
+                current is not None
+                and index is not None
+                and previous_index is not None
+                and index - previous_index <= 1
+            )
+            if adjacent:
+                current.text = _merge_text(current.text, text)
+                current.score = max(current.score, match.score)
+                current.matches.append(match)
+            else:
+                current = ContextBlock(source=source, text=text, score=match.score, matches=[match])
+                blocks.append(current)
+            previous_index = index
+
+    blocks.sort(key=lambda block: min(position[id(match)] for match in block.matches))
+    return blocks
+
+def pack_context(
+    matches: List[Any],
+    model_name: str,
+    token_budget: int,
+    relative_cutoff: float = 0.0,
+    diversity: float = 0.3,
+    max_chunks: Optional[int] = None
+) -> PackedContext:
+    """
+    Assemble the LLM context from retrieved matches.
+
+    Matches whose vector similarity is below relative_cutoff times the best
+    similarity are dropped; lexical-only hits have none and are kept. The rest
+    are ranked by MMR and packed in that order until token_budget, counted
+    with the model's tokenizer, is used up, so diversity decides which chunks
+    make it in. Adjacent chunks of the same source are then merged, keeping
+    the MMR order of the blocks.
+    """
+    matches = [match for match in matches if match.metadata.get("text")]
+    if not matches:
+        return PackedContext(text="", matches=[], tokens=0)
+
+    similarities = [_similarity(match) for match in matches]
+    top_similarity = max((similarity for similarity in similarities if similarity is not None), default=0.0)
+    candidates = [
+        match for match, similarity in zip(matches, similarities)
+        if similarity is None or similarity >= top_similarity * relative_cutoff
+    ]
+    ranked = select_mmr(candidates, max_chunks or len(candidates), diversity)
+
+    packed_matches = []
+    used = 0
+    for match in ranked:
+        text = match.metadata["text"]
+        tokens = count_tokens(text, model_name)
+        remaining = token_budget - used
+        if tokens <= remaining:
+            packed_matches.append(match)
+            used += tokens
+        elif remaining >= MIN_PARTIAL_TOKENS:
+            # Pack the start of the chunk into what's left and stop
+            partial = copy.copy(match)
+            partial.metadata = {**match.metadata, "text": truncate_to_tokens(text, remaining, model_name)}
+            packed_matches.append(partial)
+            break
+
+    text = "\n\n".join(block.text for block in merge_adjacent(packed_matches))
+    # Merging removes overlaps but separators add a few tokens
+    used = count_tokens(text, model_name)
+    if used > token_budget:
+        text = truncate_to_tokens(text, token_budget, model_name)
+        used = token_budget
+
+    logger.debug(f"Packed {len(packed_matches)} of {len(matches)} matches into {used} context tokens")
+    return PackedContext(text=text, matches=packed_matches, tokens=used)
@@ -0,0 +1,110 @@
+import logging
+from typing import AsyncGenerator, AsyncIterator, List
+from langchain_core.documents import Document
+from .tokens import count_tokens, split_to_tokens
+
+logger = logging.getLogger(__name__)
+
+class CsvRowChunker:
+    """
+    Pack whole CSV rows into token-bounded chunks.
+
+    Every chunk starts with the header line, so it can be read on its own, and
+    rows are never repeated across chunks. Only a row too long for a chunk of
+    its own is split, into parts numbered by row_part. Records are assembled
+    with a single quote-parity scan per line instead of parsing every field,
+    so quoted values with embedded newlines stay in one record.
+
+    Chunk metadata holds no more than the row range and part. The column
+    names are the header line of the chunk text, which lives in the chunk
+    store rather than in the metadata of every vector.
+    """
+
+    def __init__(self, max_tokens: int, model_name: str):
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+
+    async def _iter_records(self, text_blocks: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Yield complete CSV records from a stream of text blocks"""
+        pending = ""
+        record = ""
+        quote_count = 0
+        async for block in text_blocks:
+            lines = (pending + block).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                record = f"{record}\n{line}" if record else line
+                quote_count += line.count('"')
+                # An odd number of quotes means a quoted field continues on the next line
+                if quote_count % 2 == 0:
+                    record = record.rstrip("\r")
+                    if record.strip():
+                        yield record
+                    record = ""
+                    quote_count = 0
+
+        tail = f"{record}\n{pending}" if record else pending
+        tail = tail.rstrip("\r\n")
+        if tail.strip():
+            yield tail
+
+    def _make_chunk(self, header: str, rows: List[str], row_start: int) -> Document:
+        return Document(
+            page_content="\n".join([header] + rows),
+            metadata={
+                "row_start": row_start,
+                "row_end": row_start + len(rows) - 1
+            }
+        )
+
+    def _split_row(self, header: str, record: str, row_number: int) -> List[Document]:
+        """Cut an oversized row into header-prefixed parts that fit max_tokens"""
+        # The header is repeated in every part; a very wide header still leaves room for half a chunk of row
+        budget = max(self.max_tokens - count_tokens(f"{header}\n", self.model_name), self.max_tokens // 2)
+        return [
+            Document(
+                page_content=f"{header}\n{part}",
+                metadata={"row_start": row_number, "row_end": row_number, "row_part": part_number}
+            )
+            for part_number, part in enumerate(split_to_tokens(record, budget, self.model_name), start=1)
+        ]
+
+    async def split_stream(self, text_blocks: AsyncIterator[str]) -> AsyncGenerator[Document, None]:
+        """Yield chunks of whole rows, each prefixed with the header"""
+        header = None
+        header_tokens = 0
+        rows: List[str] = []
+        row_tokens = 0
+        row_start = 1
+        row_number = 0
+
+        async for record in self._iter_records(text_blocks):
+            if header is None:
+                header = record
+                header_tokens = count_tokens(header, self.model_name)
+                continue
+
+            row_number += 1
+            tokens = count_tokens(record, self.model_name)
+            if header_tokens + tokens > self.max_tokens:
+                if rows:
+                    yield self._make_chunk(header, rows, row_start)
+                    rows = []
+                    row_tokens = 0
+                logger.warning(f"CSV row {row_number} has {tokens} tokens, splitting it into parts")
+                for chunk in self._split_row(header, record, row_number):
+                    yield chunk
+                row_start = row_number + 1
+                continue
+
+            if rows and header_tokens + row_tokens + tokens > self.max_tokens:
+                yield self._make_chunk(header, rows, row_start)
+                rows = []
+                row_tokens = 0
+                row_start = row_number
+
+            rows.append(record)
+            row_tokens += tokens
+
+        if rows:
+            yield self._make_chunk(header, rows, row_start)
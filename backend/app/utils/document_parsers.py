@@ -0,0 +1,62 @@
+"""
+CPU-bound document parsers.
+
+These functions run inside a ProcessPoolExecutor, so they only take picklable
+arguments (a local file path plus a page range or sheet name) and import their
+parsing libraries lazily.
+"""
+from typing import List
+
+def pdf_page_count(path: str) -> int:
+    """Return the number of pages in a PDF"""
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+def extract_pdf_pages(path: str, start: int, end: int) -> str:
+    """Extract the text of pages [start, end) of a PDF"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    texts = []
+    for page_number in range(start, min(end, len(reader.pages))):
+        text = reader.pages[page_number].extract_text() or ""
+        if text.strip():
+            texts.append(text)
+    return "\n\n".join(texts)
+
+def xlsx_sheet_names(path: str) -> List[str]:
+    """Return the sheet names of a workbook"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+def extract_xlsx_sheet(path: str, sheet_name: str) -> str:
+    """Extract a sheet as tab-separated lines, preceded by the sheet name"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        lines = [f"# Sheet: {sheet_name}"]
+        for row in workbook[sheet_name].iter_rows(values_only=True):
+            values = ["" if value is None else str(value) for value in row]
+            if any(values):
+                lines.append("\t".join(values))
+        return "\n".join(lines)
+    finally:
+        workbook.close()
+
+def extract_docx(path: str) -> str:
+    """Extract the paragraphs and tables of a Word document"""
+    import docx
+
+    document = docx.Document(path)
+    parts = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            parts.append("\t".join(cell.text for cell in row.cells))
+    return "\n\n".join(parts)
@@ -0,0 +1,86 @@
+"""
+Evaluation of Pinecone-style metadata filters outside Pinecone.
+
+Filters are dicts such as {"file_id": {"$in": ["a", "b"]}, "uploaded_at": {"$gte": 1700000000}},
+combined with "$and" / "$or". A bare value means equality.
+"""
+from typing import Any, Dict, List, Tuple
+
+COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+SQL_COMPARISONS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+def _conditions(metadata_filter: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    """Flatten the field conditions of a filter into (field, operator, operand)"""
+    conditions = []
+    for field, condition in metadata_filter.items():
+        if field in ("$and", "$or"):
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator not in COMPARISONS:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            conditions.append((field, operator, operand))
+    return conditions
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Dict[str, Any]) -> bool:
+    """Check whether vector metadata satisfies a filter"""
+    if "$and" in metadata_filter and not all(matches_filter(metadata, part) for part in metadata_filter["$and"]):
+        return False
+    if "$or" in metadata_filter and not any(matches_filter(metadata, part) for part in metadata_filter["$or"]):
+        return False
+    return all(
+        COMPARISONS[operator](metadata.get(field), operand)
+        for field, operator, operand in _conditions(metadata_filter)
+    )
+
+def filter_to_sql(metadata_filter: Dict[str, Any], column: str = "metadata") -> Tuple[str, List[Any]]:
+    """Compile a filter into a SQLite WHERE clause over a JSON column"""
+    clauses = []
+    params: List[Any] = []
+
+    # An empty $and matches everything and an empty $or nothing, as in matches_filter
+    for combinator, joiner, empty in (("$and", " AND ", "1"), ("$or", " OR ", "0")):
+        if combinator in metadata_filter:
+            parts = [filter_to_sql(part, column) for part in metadata_filter[combinator]]
+            clauses.append("(" + (joiner.join(clause for clause, _ in parts) or empty) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+
+    for field, operator, operand in _conditions(metadata_filter):
+        path = '$."' + field.replace('"', '""') + '"'
+        value = f"json_extract({column}, ?)"
+        if operator == "$in":
+            clauses.append(f"{value} IN ({','.join('?' * len(operand))})")
+            params.append(path)
+            params.extend(operand)
+        elif operator == "$nin":
+            # Missing fields are not in any list, as in matches_filter
+            clauses.append(f"({value} IS NULL OR {value} NOT IN ({','.join('?' * len(operand))}))")
+            params.extend([path, path])
+            params.extend(operand)
+        elif operator == "$ne":
+            clauses.append(f"({value} IS NULL OR {value} != ?)")
+            params.extend([path, path, operand])
+        else:
+            clauses.append(f"{value} {SQL_COMPARISONS[operator]} ?")
+            params.extend([path, operand])
+
+    return " AND ".join(clauses) or "1", params
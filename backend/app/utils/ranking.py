@@ -0,0 +1,15 @@
+from typing import Dict, List, Sequence, Tuple
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked lists of IDs by reciprocal rank fusion.
+
+    Each ID scores sum(1 / (k + rank)) over the lists it appears in, so IDs
+    ranked well by several retrievers rise to the top regardless of how each
+    retriever scales its scores.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,86 @@
+import codecs
+import re
+from typing import AsyncGenerator, AsyncIterator, List, Tuple
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+async def decode_stream(
+    blocks: AsyncIterator[bytes],
+    encoding: str = "utf-8"
+) -> AsyncGenerator[str, None]:
+    """Decode a stream of byte blocks without splitting multi-byte characters"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    async for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+class StreamingTextSplitter:
+    """
+    Split a stream of text into chunks as soon as they are complete.
+
+    Only a bounded window of text is buffered. The last chunk of each window
+    may be cut short by the window edge, so it is carried over and re-split
+    together with the next block. When the splitter gave that chunk no overlap
+    with the one before it, the end of the earlier chunk is carried too, so
+    chunks on either side of a window edge always overlap. Chunks made only
+    of carried text are already covered and are dropped.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, buffer_size: int = None):
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        self.chunk_overlap = chunk_overlap
+        self.buffer_size = buffer_size or chunk_size * 16
+
+    def _locate(self, buffer: str, carried: int) -> List[Tuple[int, str]]:
+        """Split the buffer into (start, chunk) pairs, leaving out chunks within the first carried characters"""
+        located = []
+        position = 0
+        for chunk in self.splitter.split_text(buffer):
+            start = buffer.find(chunk, position)
+            if start < 0:
+                start = position
+            position = start + 1
+            if start + len(chunk) > carried:
+                located.append((start, chunk))
+        return located
+
+    def _split_buffer(self, buffer: str, carried: int) -> Tuple[List[str], str, int]:
+        """Split the buffer and return the complete chunks, the carried-over tail and its length already emitted"""
+        located = self._locate(buffer, carried)
+        if len(located) < 2:
+            return [], buffer, carried
+
+        (emitted_start, emitted), (tail_start, _) = located[-2], located[-1]
+        emitted_end = emitted_start + len(emitted)
+        if tail_start >= emitted_end:
+            # Start the tail within the end of the last emitted chunk, at a word boundary
+            overlap_start = max(emitted_start + 1, emitted_end - self.chunk_overlap)
+            boundary = WHITESPACE_PATTERN.search(buffer, overlap_start, emitted_end)
+            if boundary is not None:
+                tail_start = boundary.end()
+        return [chunk for _, chunk in located[:-1]], buffer[tail_start:], max(emitted_end - tail_start, 0)
+
+    async def split_stream(self, text_blocks: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Yield chunks from an async stream of text blocks"""
+        buffer = ""
+        carried = 0
+        async for block in text_blocks:
+            buffer += block
+            if len(buffer) < self.buffer_size:
+                continue
+
+            chunks, buffer, carried = self._split_buffer(buffer, carried)
+            for chunk in chunks:
+                yield chunk
+
+        if buffer.strip():
+            for _, chunk in self._locate(buffer, carried):
+                yield chunk
@@ -0,0 +1,48 @@
+import logging
+from functools import lru_cache
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    """Load and cache the tiktoken encoding for a model"""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken not installed, falling back to character-based token estimates")
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model_name: str = "text-embedding-ada-002") -> int:
+    """Count the tokens in a text for the given model"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = "text-embedding-ada-002") -> str:
+    """Cut a text down to at most max_tokens tokens for the given model"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def split_to_tokens(text: str, max_tokens: int, model_name: str = "text-embedding-ada-002") -> List[str]:
+    """Cut a text into consecutive pieces of at most max_tokens tokens for the given model"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens), max_tokens)]
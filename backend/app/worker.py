@@ -0,0 +1,210 @@
+"""
+Ingestion worker.
+
+Claims jobs from the jobs table and runs up to WORKER_CONCURRENCY of them at
+once. Start as many workers as needed:
+
+    python -m app.worker --concurrency 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from .config.settings import settings
+from .database import SessionLocal
+from .services.job_queue_service import job_queue_service
+from .services.file_processing_service import file_processing_service
+from .services.embedding_migration_service import embedding_migration_service
+from .services.pinecone_service import pinecone_service
+
+logger = logging.getLogger(__name__)
+
+async def run_process_file(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Index a file stored in R2"""
+    stats = await file_processing_service.process_file(payload["workspace_id"], payload["file_key"])
+    return stats["timings"]
+
+async def run_copy_vectors(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy the vectors of a deduplicated file into another workspace"""
+    stats = await file_processing_service.copy_file_vectors(
+        payload["source_workspace_id"],
+        payload["workspace_id"],
+        payload["file_key"]
+    )
+    return stats["timings"]
+
+async def run_migrate_embeddings(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill a new embedding version and cut over to it"""
+    stats = await embedding_migration_service.migrate(payload["version"])
+    return stats["timings"]
+
+async def run_drop_embedding_version(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Delete the index of a retired embedding version"""
+    await embedding_migration_service.drop(payload["version"])
+    return {}
+
+# Maps job types to coroutines that run them and return their stage timings
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "process_file": run_process_file,
+    "copy_vectors": run_copy_vectors,
+    "migrate_embeddings": run_migrate_embeddings,
+    "drop_embedding_version": run_drop_embedding_version,
+}
+
+class Worker:
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = False
+        # Running job tasks by job ID, kept alive by the heartbeat
+        self.running: Dict[str, asyncio.Task] = {}
+
+    def stop(self) -> None:
+        """Stop claiming new jobs and exit once running jobs finish"""
+        logger.info(f"Worker {self.worker_id} shutting down")
+        self.stopping = True
+
+    def _with_session(self, func, *args):
+        db = SessionLocal()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        """Run a claimed job and record its outcome"""
+        timings: Dict[str, Any] = {}
+        if job["created_at"] is not None:
+            created_at = job["created_at"]
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=job["claimed_at"].tzinfo)
+            timings["queue_wait"] = round((job["claimed_at"] - created_at).total_seconds(), 3)
+
+        start_time = time.perf_counter()
+        try:
+            handler = JOB_HANDLERS.get(job["job_type"])
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job['job_type']}")
+
+            timings.update(await handler(job["payload"]))
+            timings["total"] = round(time.perf_counter() - start_time, 3)
+            completed = await asyncio.to_thread(
+                self._with_session,
+                job_queue_service.complete_job,
+                job["id"],
+                self.worker_id,
+                timings
+            )
+            if completed:
+                logger.info(f"Job {job['id']} ({job['job_type']}) completed: {timings}")
+            else:
+                logger.warning(f"Job {job['id']} ({job['job_type']}) finished after another worker reclaimed it")
+        except Exception as e:
+            timings["total"] = round(time.perf_counter() - start_time, 3)
+            retry = await asyncio.to_thread(
+                self._with_session,
+                job_queue_service.fail_job,
+                job,
+                self.worker_id,
+                str(e),
+                timings
+            )
+            if retry is None:
+                logger.warning(f"Job {job['id']} ({job['job_type']}) failed after another worker reclaimed it: {str(e)}")
+                return
+            logger.error(
+                f"Job {job['id']} ({job['job_type']}) failed on attempt {job['attempts']}"
+                f"{', will retry' if retry else ', giving up'}: {str(e)}",
+                exc_info=True
+            )
+
+    async def _heartbeat(self) -> None:
+        """
+        Refresh the locks of running jobs every JOB_HEARTBEAT_INTERVAL seconds,
+        cancelling jobs another worker has reclaimed meanwhile
+        """
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            running = {job_id: task for job_id, task in self.running.items() if not task.done()}
+            if not running:
+                continue
+            try:
+                lost = await asyncio.to_thread(
+                    self._with_session,
+                    job_queue_service.heartbeat,
+                    self.worker_id,
+                    list(running)
+                )
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not refresh job locks: {str(e)}")
+                continue
+            for job_id in lost:
+                logger.warning(f"Job {job_id} was reclaimed by another worker, cancelling it here")
+                running[job_id].cancel()
+
+    async def run(self) -> None:
+        """Claim and run jobs until stopped"""
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+        active = set()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        while not self.stopping:
+            jobs = []
+            free_slots = self.concurrency - len(active)
+            if free_slots > 0:
+                try:
+                    jobs = await asyncio.to_thread(
+                        self._with_session,
+                        job_queue_service.claim_jobs,
+                        self.worker_id,
+                        free_slots
+                    )
+                except Exception as e:
+                    logger.error(f"Worker {self.worker_id} could not claim jobs: {str(e)}")
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self.running[job["id"]] = task
+                task.add_done_callback(lambda _, job_id=job["id"]: self.running.pop(job_id, None))
+                active.add(task)
+
+            if active:
+                done, active = await asyncio.wait(
+                    active,
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+        if active:
+            await asyncio.gather(*active, return_exceptions=True)
+        heartbeat.cancel()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the ingestion job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=settings.WORKER_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    worker = Worker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+
+    async def run_worker():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        try:
+            await worker.run()
+        finally:
+            await pinecone_service.aclose()
+
+    asyncio.run(run_worker())
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,12 @@ from app.models.user import User
 from app.models.job import Job, JobStatus
 from app.models.workspace import Workspace
 from app.models.prompt import Prompt
+from app.models.file import File
+from app.models.template import AITemplate
+from app.models.file_chunk import FileChunk
+from app.models.chunk_text import ChunkText
+from app.models.lexical_index import LexicalNamespace, LexicalDocument, LexicalPosting
+from app.models.embedding_version import EmbeddingVersion
 from app.config.settings import settings
 import logging
 
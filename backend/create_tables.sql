@@ -25,10 +25,13 @@ CREATE TABLE IF NOT EXISTS workspaces (
     name VARCHAR(255) NOT NULL,
     description TEXT,
     status VARCHAR(50) NOT NULL DEFAULT 'active',
+    content_version INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE
 );
 
+ALTER TABLE workspaces ADD COLUMN IF NOT EXISTS content_version INTEGER NOT NULL DEFAULT 0;
+
 -- Create prompts table
 CREATE TABLE IF NOT EXISTS prompts (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -45,11 +48,98 @@ CREATE TABLE IF NOT EXISTS files (
     file_path VARCHAR(512) NOT NULL,
     file_size BIGINT NOT NULL,
     content_type VARCHAR(255),
+    content_hash CHAR(64),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     workspace_id UUID NOT NULL REFERENCES workspaces(id) ON DELETE CASCADE,
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Add content_hash to files tables created before upload deduplication
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+-- Create file_chunks table as the manifest of vectors owned by each indexed file
+CREATE TABLE IF NOT EXISTS file_chunks (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    namespace VARCHAR(255) NOT NULL,
+    file_key VARCHAR(512) NOT NULL,
+    chunk_hash CHAR(64) NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    vector_id VARCHAR(600) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_file_chunks_namespace_file_hash UNIQUE (namespace, file_key, chunk_hash)
+);
+
+-- Create chunk_texts table holding compressed chunk text, keyed by content hash, outside the vector index
+CREATE TABLE IF NOT EXISTS chunk_texts (
+    chunk_hash CHAR(64) PRIMARY KEY,
+    text BYTEA NOT NULL,
+    written_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create lexical index tables holding the per-workspace BM25 postings shared by the API and workers
+CREATE TABLE IF NOT EXISTS lexical_namespaces (
+    namespace VARCHAR(255) PRIMARY KEY,
+    last_segment INTEGER NOT NULL DEFAULT 0,
+    unmerged_writes INTEGER NOT NULL DEFAULT 0,
+    last_doc INTEGER NOT NULL DEFAULT 0,
+    doc_count INTEGER NOT NULL DEFAULT 0,
+    total_length BIGINT NOT NULL DEFAULT 0,
+    dead_docs INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS lexical_documents (
+    namespace VARCHAR(255) NOT NULL,
+    doc INTEGER NOT NULL,
+    vector_id VARCHAR(600) NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (namespace, doc),
+    CONSTRAINT uq_lexical_documents_namespace_vector UNIQUE (namespace, vector_id)
+);
+
+CREATE TABLE IF NOT EXISTS lexical_postings (
+    namespace VARCHAR(255) NOT NULL,
+    term TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    docs BYTEA NOT NULL,
+    tfs BYTEA NOT NULL,
+    lengths BYTEA NOT NULL,
+    PRIMARY KEY (namespace, term, segment)
+);
+
+-- Create embedding_versions table registering each embedding model and its vector index
+CREATE TABLE IF NOT EXISTS embedding_versions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name VARCHAR(50) NOT NULL UNIQUE,
+    model VARCHAR(100) NOT NULL,
+    dimension INTEGER NOT NULL,
+    index_name VARCHAR(45) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'building',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    activated_at TIMESTAMP WITH TIME ZONE,
+    retired_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Create jobs table for the durable ingestion queue consumed by app.worker
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_type VARCHAR(50) NOT NULL,
+    group_id UUID,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    payload JSON NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(255),
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    timings JSON,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS group_id UUID;
+
 -- Create chats table to represent conversations
 CREATE TABLE IF NOT EXISTS chats (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -105,6 +195,7 @@ CREATE TABLE "public"."ai_templates" (
 CREATE INDEX idx_prompts_workspace ON prompts(workspace_id);
 CREATE INDEX idx_files_workspace ON files(workspace_id);
 CREATE INDEX idx_files_user ON files(user_id);
+CREATE INDEX idx_files_content_hash ON files(content_hash);
 CREATE INDEX idx_chats_workspace ON chats(workspace_id);
 CREATE INDEX idx_chat_participants_chat ON chat_participants(chat_id);
 CREATE INDEX idx_chat_participants_user ON chat_participants(user_id);
@@ -112,3 +203,7 @@ CREATE INDEX idx_messages_chat ON messages(chat_id);
 CREATE INDEX idx_messages_sender ON messages(sender_id);
 CREATE INDEX idx_messages_sent_at ON messages(sent_at);
 CREATE INDEX idx_ai_templates_workspace ON ai_templates(workspace_id);
+CREATE INDEX idx_jobs_status_run_after ON jobs(status, run_after);
+CREATE INDEX idx_jobs_group ON jobs(group_id);
+CREATE INDEX idx_file_chunks_hash ON file_chunks(chunk_hash);
+CREATE UNIQUE INDEX idx_embedding_versions_active ON embedding_versions(status) WHERE status = 'active';
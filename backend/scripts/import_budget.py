@@ -0,0 +1,87 @@
+"""
+Import-time budget check.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and fails when its cumulative import time exceeds the budget, listing the
+slowest imports. Run from the backend directory:
+
+    python scripts/import_budget.py
+    python scripts/import_budget.py --module app.worker=800 --runs 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Budgets in milliseconds of cumulative import time
+DEFAULT_BUDGETS = {
+    "app.worker": 1500,
+    "app.migrate_embeddings": 1500,
+    "app.main": 4000,
+}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Import a module in a fresh interpreter; returns total milliseconds and per-import cumulative times"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    total = 0.0
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1000
+        imports.append((cumulative, match.group(3)[1:] + match.group(4)))
+        # Top-level imports are not indented; their cumulative times add up to the total
+        if len(match.group(3)) == 1:
+            total += cumulative
+    return total, imports
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for value in values:
+        module, _, budget = value.partition("=")
+        budgets[module] = float(budget) if budget else DEFAULT_BUDGETS.get(module, 0)
+    return budgets
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail when entry points import slower than their budget")
+    parser.add_argument(
+        "--module",
+        action="append",
+        default=[],
+        metavar="MODULE[=MS]",
+        help="Entry point to check, with its budget in milliseconds (default: all built-in budgets)"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module, the fastest is compared")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports listed for a module over budget")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.module) if args.module else DEFAULT_BUDGETS
+    failed = False
+    for module, budget in budgets.items():
+        # The fastest run filters out noise from disk caches and other processes
+        total, imports = min((measure(module) for _ in range(max(args.runs, 1))), key=lambda run: run[0])
+        over = budget and total > budget
+        print(f"{'FAIL' if over else 'ok':4} {module}: {total:.0f} ms (budget {budget:.0f} ms)")
+        if over:
+            failed = True
+            for cumulative, name in sorted(imports, reverse=True)[:args.top]:
+                print(f"       {cumulative:8.1f} ms  {name}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+# Run against the SQLite and local vector store branches, configured before any app module reads settings
+TEST_DIR = tempfile.mkdtemp(prefix="ai-insights-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["VECTOR_STORE_BACKEND"] = "local"
+os.environ["LOCAL_VECTOR_STORE_PATH"] = os.path.join(TEST_DIR, "vectors")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TEST_DIR, "embeddings.sqlite3")
+os.environ["EMBEDDING_DIMENSION"] = "16"
+os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+from create_db import create_tables  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+DIMENSION = 16
+
+class FakeEmbeddings:
+    """Deterministic embeddings: similar texts don't get similar vectors, identical texts get identical ones"""
+
+    def __init__(self):
+        self.calls = 0
+
+    @staticmethod
+    def embed(text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big")
+        values = np.random.default_rng(seed).normal(size=DIMENSION)
+        return (values / np.linalg.norm(values)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self.embed(text) for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed(text)
+
+@pytest.fixture
+def db():
+    """Fresh SQLite schema and vector store per test"""
+    from app.services.embedding_version_service import embedding_version_service
+
+    Base.metadata.drop_all(bind=engine)
+    create_tables()
+    shutil.rmtree(os.environ["LOCAL_VECTOR_STORE_PATH"], ignore_errors=True)
+    # Forget registry state cached from the previous schema
+    embedding_version_service._active = None
+    embedding_version_service._building = None
+    embedding_version_service._stores.clear()
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    from app.services.embedding_version_service import embedding_version_service
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(embedding_version_service, "embeddings", lambda version: fake)
+    return fake
+
+@pytest.fixture
+def stored_files(monkeypatch) -> Dict[str, str]:
+    """Text of the objects extraction reads, by file key, instead of R2"""
+    from app.services.extraction_service import extraction_service
+    files: Dict[str, str] = {}
+
+    async def extract(file_key, content_type):
+        yield files[file_key]
+
+    monkeypatch.setattr(extraction_service, "extract", extract)
+    return files
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.models.workspace import Workspace
+from app.services.answer_cache import AnswerCache
+from app.services.file_processing_service import file_processing_service
+
+KEY = ("workspace-1", 0, "model", None, None)
+
+def test_similar_prompt_hits_within_the_same_group():
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.95)
+    cache.store(cache.lookup(KEY, [1.0, 0.0]), "answer")
+
+    assert cache.lookup(KEY, [1.0, 0.01]).answer == "answer"
+    assert not cache.lookup(KEY, [0.0, 1.0]).hit
+    assert cache.stats()["hits"] == 1
+
+def test_bumped_content_version_misses():
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.95)
+    cache.store(cache.lookup(KEY, [1.0, 0.0]), "answer")
+
+    assert not cache.lookup(("workspace-1", 1, "model", None, None), [1.0, 0.0]).hit
+
+def test_expired_answer_misses():
+    cache = AnswerCache(max_entries=10, ttl=-1, threshold=0.95)
+    cache.store(cache.lookup(KEY, [1.0, 0.0]), "answer")
+
+    assert not cache.lookup(KEY, [1.0, 0.0]).hit
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_answer_is_evicted():
+    cache = AnswerCache(max_entries=2, ttl=60, threshold=0.95)
+    for vector, answer in (([1.0, 0.0], "first"), ([0.0, 1.0], "second")):
+        cache.store(cache.lookup(KEY, vector), answer)
+    cache.lookup(KEY, [1.0, 0.0])
+    cache.store(cache.lookup(KEY, [-1.0, 0.0]), "third")
+
+    assert cache.lookup(KEY, [1.0, 0.0]).answer == "first"
+    assert not cache.lookup(KEY, [0.0, 1.0]).hit
+
+def test_failed_ingestion_bumps_the_content_version(db, embeddings, monkeypatch):
+    db.add(Workspace(id="workspace-1", name="Reports"))
+    db.commit()
+
+    async def extract(file_key, content_type):
+        raise RuntimeError("extraction failed")
+        yield
+
+    monkeypatch.setattr("app.services.file_processing_service.extraction_service.extract", extract)
+    with pytest.raises(RuntimeError):
+        asyncio.run(file_processing_service.process_file("workspace-1", "workspace-1/report.txt"))
+
+    db.expire_all()
+    assert db.get(Workspace, "workspace-1").content_version == 1
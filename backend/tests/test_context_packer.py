@@ -0,0 +1,49 @@
+from app.services.vector_store import VectorMatch
+from app.utils.context_packer import pack_context
+
+def _match(id, score, text, **metadata):
+    return VectorMatch(id=id, score=score, metadata={"source": id, "text": text, **metadata})
+
+RELEVANT = "quarterly revenue grew in the enterprise segment driven by renewals " * 4
+NEAR_DUPLICATE = "quarterly revenue grew in the enterprise segment driven by new renewals " * 4
+DIFFERENT = "churn fell after the onboarding redesign shipped to all customers " * 4
+
+def _packed_ids(matches, **kwargs):
+    # Room for two of the three chunks
+    budget = 2 * len(RELEVANT) // 4 + 10
+    packed = pack_context(matches, model_name="test-model", token_budget=budget, **kwargs)
+    return [match.id for match in packed.matches]
+
+def test_diversity_changes_which_chunks_are_packed():
+    matches = [
+        _match("a", 1.0, RELEVANT),
+        _match("b", 0.95, NEAR_DUPLICATE),
+        _match("c", 0.7, DIFFERENT),
+    ]
+
+    assert _packed_ids(matches, diversity=0.0) == ["a", "b"]
+    assert _packed_ids(matches, diversity=0.9) == ["a", "c"]
+
+def test_cutoff_uses_vector_similarity_of_fused_matches():
+    # Fused scores are close RRF values; only the similarity tells the matches apart
+    matches = [
+        _match("a", 2 / 61, RELEVANT, similarity=0.9),
+        _match("b", 1 / 61, DIFFERENT, similarity=0.2),
+        _match("c", 1 / 62, NEAR_DUPLICATE, similarity=None),
+    ]
+
+    packed = pack_context(matches, model_name="test-model", token_budget=10000, relative_cutoff=0.4, diversity=0.0)
+
+    assert [match.id for match in packed.matches] == ["a", "c"]
+
+def test_merged_blocks_keep_mmr_order():
+    matches = [
+        _match("x", 0.5, DIFFERENT, source="doc", chunk_index=1),
+        _match("y", 1.0, RELEVANT, source="other"),
+        _match("z", 0.4, NEAR_DUPLICATE, source="doc", chunk_index=2),
+    ]
+
+    packed = pack_context(matches, model_name="test-model", token_budget=10000, diversity=0.0)
+
+    assert packed.text.startswith(RELEVANT)
+    assert packed.text.index(DIFFERENT) < packed.text.index(NEAR_DUPLICATE)
@@ -0,0 +1,50 @@
+import asyncio
+
+from app.utils.csv_chunker import CsvRowChunker
+from app.utils.tokens import count_tokens
+
+HEADER = "name,city,notes"
+
+async def _blocks(text, size):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+def _chunks(text, max_tokens=40, block_size=7):
+    async def collect():
+        chunker = CsvRowChunker(max_tokens, "text-embedding-ada-002")
+        return [chunk async for chunk in chunker.split_stream(_blocks(text, block_size))]
+    return asyncio.run(collect())
+
+def test_rows_are_packed_whole_with_the_header():
+    rows = [f"person{i},city{i},note about person {i}" for i in range(1, 11)]
+    chunks = _chunks("\n".join([HEADER] + rows) + "\n")
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        lines = chunk.page_content.split("\n")
+        assert lines[0] == HEADER
+        assert lines[1:] == rows[chunk.metadata["row_start"] - 1:chunk.metadata["row_end"]]
+    assert [chunk.metadata["row_start"] for chunk in chunks][0] == 1
+    assert chunks[-1].metadata["row_end"] == len(rows)
+
+def test_quoted_newlines_stay_in_one_record():
+    text = f'{HEADER}\r\nann,paris,"first line\r\nsecond line"\r\nbob,rome,plain\r\n'
+    chunks = _chunks(text, max_tokens=500)
+
+    assert chunks[0].page_content == f'{HEADER}\nann,paris,"first line\r\nsecond line"\nbob,rome,plain'
+    assert chunks[0].metadata == {"row_start": 1, "row_end": 2}
+
+def test_oversized_rows_are_split_into_header_prefixed_parts():
+    long_notes = " ".join(f"word{i}" for i in range(400))
+    text = f"{HEADER}\nann,paris,short\nbob,rome,{long_notes}\ncid,oslo,short\n"
+    max_tokens = 60
+    chunks = _chunks(text, max_tokens=max_tokens, block_size=50)
+
+    parts = [chunk for chunk in chunks if "row_part" in chunk.metadata]
+    assert len(parts) > 1
+    assert all(chunk.metadata["row_start"] == chunk.metadata["row_end"] == 2 for chunk in parts)
+    assert [chunk.metadata["row_part"] for chunk in parts] == list(range(1, len(parts) + 1))
+    assert "".join(chunk.page_content[len(HEADER) + 1:] for chunk in parts) == f"bob,rome,{long_notes}"
+    assert all(count_tokens(chunk.page_content) <= max_tokens for chunk in chunks)
+    assert chunks[0].metadata == {"row_start": 1, "row_end": 1}
+    assert chunks[-1].metadata == {"row_start": 3, "row_end": 3}
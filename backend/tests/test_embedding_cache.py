@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache
+from tests.conftest import TEST_DIR, FakeEmbeddings
+
+def _cache(name, max_bytes=1024 * 1024, dtype="float32"):
+    path = os.path.join(TEST_DIR, f"{name}.sqlite3")
+    if os.path.exists(path):
+        os.remove(path)
+    return EmbeddingCache(path, max_bytes, dtype)
+
+def test_only_missing_texts_are_embedded():
+    fake = FakeEmbeddings()
+    embeddings = CachedEmbeddings(fake, _cache("missing"), "model")
+    embeddings.embed_documents(["alpha", "beta"])
+
+    vectors = embeddings.embed_documents(["alpha", " beta ", "gamma", "gamma"])
+
+    assert fake.calls == 2
+    assert embeddings.cache.stats()["hits"] == 2
+    assert vectors[1] == embeddings.embed_documents(["beta"])[0]
+    assert vectors[2] == vectors[3]
+
+def test_entries_are_keyed_by_model():
+    cache = _cache("models")
+    cache.put_many("model-a", ["alpha"], [[1.0, 0.0]])
+
+    assert cache.get_many("model-b", ["alpha"]) == [None]
+    assert cache.get_many("model-a", ["alpha"]) == [[1.0, 0.0]]
+
+def test_float16_entries_round_trip():
+    cache = _cache("float16", dtype="float16")
+    cache.put_many("model", ["alpha"], [[0.5, -0.25]])
+
+    assert cache.get_many("model", ["alpha"]) == [[0.5, -0.25]]
+
+def test_least_recently_used_entries_are_evicted():
+    # Each float32 vector of 4 values takes 16 bytes
+    cache = _cache("evict", max_bytes=40)
+    cache.put_many("model", ["one", "two"], [[1.0] * 4, [2.0] * 4])
+    cache.get_many("model", ["one"])
+    cache.put_many("model", ["three"], [[3.0] * 4])
+
+    assert cache.get_many("model", ["one", "two", "three"])[1] is None
+    assert cache.stats()["bytes"] <= 40
+
+def test_concurrent_queries_share_one_embedding_request():
+    cache = QueryEmbeddingCache(max_bytes=1024, ttl=60)
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return [1.0, 2.0]
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("model", "query", compute) for _ in range(3)))
+
+    assert asyncio.run(run()) == [[1.0, 2.0]] * 3
+    assert calls == ["query"]
+    assert cache.stats()["hits"] == 2
+
+def test_query_embeddings_expire_and_respect_the_memory_cap():
+    async def compute(text):
+        return [1.0] * 4
+
+    expired = QueryEmbeddingCache(max_bytes=1024, ttl=-1)
+    asyncio.run(expired.get_or_compute("model", "query", compute))
+    asyncio.run(expired.get_or_compute("model", "query", compute))
+    assert expired.stats()["misses"] == 2
+
+    capped = QueryEmbeddingCache(max_bytes=20, ttl=60)
+    for text in ("one", "two"):
+        asyncio.run(capped.get_or_compute("model", text, compute))
+    assert capped.stats()["entries"] == 1
+    assert capped.stats()["bytes"] == 16
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config.settings import settings
+from app.models.file import File as FileModel
+from app.models.workspace import Workspace
+from app.services import file_processing_service as file_processing_module
+from app.services.embedding_migration_service import embedding_migration_service
+from app.services.embedding_version_service import embedding_version_service
+from app.services.file_processing_service import file_processing_service
+from app.services.pinecone_service import pinecone_service
+
+WORKSPACE = "workspace-1"
+
+def _add_file(db, file_key):
+    db.add(FileModel(
+        filename=file_key.rsplit("/", 1)[-1],
+        file_path=file_key,
+        file_size=1,
+        content_type="text/plain",
+        workspace_id=WORKSPACE,
+        user_id="system",
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ))
+    db.commit()
+
+@pytest.fixture
+def migration(db, embeddings, stored_files, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_VERSION_REFRESH_SECONDS", 0)
+    db.add(Workspace(id=WORKSPACE, name="Reports"))
+    db.commit()
+
+    _add_file(db, f"{WORKSPACE}/indexed.txt")
+    stored_files[f"{WORKSPACE}/indexed.txt"] = "Quarterly revenue grew in every region."
+    asyncio.run(file_processing_service.process_file(WORKSPACE, f"{WORKSPACE}/indexed.txt"))
+    source = embedding_version_service.active()
+    target = embedding_version_service.start_migration(db, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION)
+    return source, target.name
+
+def _vector_count(version_name, db):
+    version = embedding_version_service.snapshot(embedding_version_service.get(db, version_name))
+    return len(pinecone_service.for_version(version).list_vector_ids(WORKSPACE, namespace=WORKSPACE))
+
+def test_unprocessable_file_without_manifest_is_skipped(db, stored_files, migration):
+    source, target = migration
+    # Uploaded, but its object can't be extracted, so it never got a manifest
+    _add_file(db, f"{WORKSPACE}/broken.txt")
+
+    result = asyncio.run(embedding_migration_service.migrate(target))
+
+    assert result["skipped"] == [f"{WORKSPACE}/broken.txt"]
+    assert embedding_version_service.active().name == target
+    assert _vector_count(target, db) == 1
+
+def test_failed_indexed_file_blocks_cutover(db, monkeypatch, migration):
+    source, target = migration
+
+    async def fail(*args):
+        raise RuntimeError("embedding service unavailable")
+
+    monkeypatch.setattr(file_processing_module.file_processing_service, "migrate_file_vectors", fail)
+
+    with pytest.raises(RuntimeError, match="could not be migrated"):
+        asyncio.run(embedding_migration_service.migrate(target))
+    assert embedding_version_service.active().name == source.name
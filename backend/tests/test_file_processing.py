@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models.file import File as FileModel
+from app.models.workspace import Workspace
+from app.services.file_processing_service import file_processing_service
+from app.services.pinecone_service import pinecone_service
+from tests.conftest import FakeEmbeddings
+
+WORKSPACE = "workspace-1"
+FILE_KEY = f"{WORKSPACE}/report.txt"
+UPLOADED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def _paragraph(topic: str) -> str:
+    return " ".join(f"Sentence {i} of the section about {topic}." for i in range(30))
+
+def _upload(db, uploaded_at: datetime) -> str:
+    """Add the file record of an upload of FILE_KEY and return its ID"""
+    if db.get(Workspace, WORKSPACE) is None:
+        db.add(Workspace(id=WORKSPACE, name="Reports"))
+    record = FileModel(
+        filename="report.txt",
+        file_path=FILE_KEY,
+        file_size=1,
+        content_type="text/plain",
+        workspace_id=WORKSPACE,
+        user_id="system",
+        # SQLite timestamps have second precision, so set them apart explicitly
+        created_at=uploaded_at
+    )
+    db.add(record)
+    db.commit()
+    return record.id
+
+def _filtered_ids(metadata_filter):
+    matches = pinecone_service.query_vectors(
+        FakeEmbeddings.embed("query"), top_k=100, namespace=WORKSPACE, filter=metadata_filter
+    )
+    return {match.id for match in matches}
+
+def test_file_id_filter_matches_every_chunk_after_reupload(db, embeddings, stored_files):
+    first_id = _upload(db, UPLOADED_AT)
+    stored_files[FILE_KEY] = "\n\n".join(_paragraph(topic) for topic in ("revenue", "churn", "hiring"))
+    first = asyncio.run(file_processing_service.process_file(WORKSPACE, FILE_KEY))
+
+    # The re-upload keeps the first two sections and replaces the last
+    second_id = _upload(db, UPLOADED_AT + timedelta(days=1))
+    stored_files[FILE_KEY] = "\n\n".join(_paragraph(topic) for topic in ("revenue", "churn", "pricing"))
+    second = asyncio.run(file_processing_service.process_file(WORKSPACE, FILE_KEY))
+
+    assert first["chunks"] > 1
+    assert 0 < second["embedded"] < second["chunks"]
+    assert second["metadata_updated"] == second["chunks"] - second["embedded"]
+
+    all_ids = _filtered_ids(None)
+    assert len(all_ids) == second["chunks"]
+    assert _filtered_ids({"file_id": second_id}) == all_ids
+    assert _filtered_ids({"file_id": first_id}) == set()
+    assert _filtered_ids({"uploaded_at": {"$gte": int((UPLOADED_AT + timedelta(days=1)).timestamp())}}) == all_ids
+
+def test_unchanged_reupload_embeds_nothing(db, embeddings, stored_files):
+    _upload(db, UPLOADED_AT)
+    stored_files[FILE_KEY] = "\n\n".join(_paragraph(topic) for topic in ("revenue", "churn"))
+    asyncio.run(file_processing_service.process_file(WORKSPACE, FILE_KEY))
+    calls = embeddings.calls
+
+    second_id = _upload(db, UPLOADED_AT + timedelta(days=1))
+    result = asyncio.run(file_processing_service.process_file(WORKSPACE, FILE_KEY))
+
+    assert result["embedded"] == 0
+    assert result["orphans_deleted"] == 0
+    assert embeddings.calls == calls
+    assert _filtered_ids({"file_id": second_id}) == _filtered_ids(None)
+
+def test_overwritten_object_is_no_longer_a_dedup_source(db):
+    db.add(Workspace(id="workspace-2", name="Other"))
+    db.commit()
+    _upload(db, UPLOADED_AT)
+    db.query(FileModel).update({FileModel.content_hash: "a" * 64})
+    db.commit()
+    assert file_processing_service.find_duplicate(db, "a" * 64, "workspace-2").file_path == FILE_KEY
+
+    # A later upload to the same key replaces the object the hash described
+    file_processing_service.clear_content_hashes(db, [FILE_KEY])
+
+    assert file_processing_service.find_duplicate(db, "a" * 64, "workspace-2") is None
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from app.models.job import Job, JobStatus
+from app.services.job_queue_service import job_queue_service, utcnow
+
+def _expire_lock(db, job_id):
+    """Make a running job's lock look abandoned by its worker"""
+    db.query(Job).filter(Job.id == job_id).update({Job.locked_at: utcnow() - timedelta(hours=1)})
+    db.commit()
+
+def _status(db, job_id):
+    db.expire_all()
+    return job_queue_service.get_job(db, job_id).status
+
+def test_claimed_job_is_not_claimed_again(db):
+    job = job_queue_service.enqueue(db, "process_file", {"file_key": "a"})
+
+    claimed = job_queue_service.claim_jobs(db, "worker-1", 10)
+
+    assert [item["id"] for item in claimed] == [job.id]
+    assert claimed[0]["attempts"] == 1
+    assert job_queue_service.claim_jobs(db, "worker-2", 10) == []
+
+def test_job_scheduled_later_is_not_claimed(db):
+    job_queue_service.enqueue(db, "process_file", {}, run_after=utcnow() + timedelta(hours=1))
+
+    assert job_queue_service.claim_jobs(db, "worker-1", 10) == []
+
+def test_stale_job_is_reclaimed_and_lost_by_its_first_worker(db):
+    job = job_queue_service.enqueue(db, "process_file", {})
+    first = job_queue_service.claim_jobs(db, "worker-1", 10)[0]
+    _expire_lock(db, job.id)
+
+    second = job_queue_service.claim_jobs(db, "worker-2", 10)
+
+    assert [item["attempts"] for item in second] == [2]
+    assert job_queue_service.heartbeat(db, "worker-1", [job.id]) == [job.id]
+    assert job_queue_service.heartbeat(db, "worker-2", [job.id]) == []
+    assert job_queue_service.complete_job(db, job.id, "worker-1", {}) is False
+    assert job_queue_service.fail_job(db, first, "worker-1", "late", {}) is None
+    assert job_queue_service.complete_job(db, job.id, "worker-2", {}) is True
+    assert _status(db, job.id) == JobStatus.COMPLETED
+
+def test_stale_job_on_its_last_attempt_fails(db):
+    job = job_queue_service.enqueue(db, "process_file", {}, max_attempts=1)
+    job_queue_service.claim_jobs(db, "worker-1", 10)
+    _expire_lock(db, job.id)
+
+    assert job_queue_service.claim_jobs(db, "worker-2", 10) == []
+    assert _status(db, job.id) == JobStatus.FAILED
+    assert job_queue_service.get_job(db, job.id).locked_by is None
+
+def test_failed_attempt_is_retried_until_attempts_run_out(db):
+    job = job_queue_service.enqueue(db, "process_file", {}, max_attempts=2)
+    claimed = job_queue_service.claim_jobs(db, "worker-1", 10)[0]
+
+    assert job_queue_service.fail_job(db, claimed, "worker-1", "boom", {}) is True
+    assert _status(db, job.id) == JobStatus.PENDING
+
+    db.query(Job).filter(Job.id == job.id).update({Job.run_after: utcnow()})
+    db.commit()
+    claimed = job_queue_service.claim_jobs(db, "worker-1", 10)[0]
+
+    assert job_queue_service.fail_job(db, claimed, "worker-1", "boom", {}) is False
+    assert _status(db, job.id) == JobStatus.FAILED
+
+def test_group_progress_counts_finished_jobs(db):
+    jobs = job_queue_service.enqueue_many(db, [("process_file", {}), ("process_file", {})], group_id="group-1")
+    claimed = job_queue_service.claim_jobs(db, "worker-1", 1)[0]
+    job_queue_service.complete_job(db, claimed["id"], "worker-1", {})
+
+    progress = job_queue_service.get_group_progress(db, "group-1")
+
+    assert len(jobs) == 2
+    assert (progress["completed"], progress["pending"], progress["progress"]) == (1, 1, 0.5)
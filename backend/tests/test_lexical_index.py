@@ -0,0 +1,66 @@
+from app.models.lexical_index import LexicalNamespace, LexicalPosting
+from app.services import lexical_index_service as lexical_module
+from app.services.lexical_index_service import lexical_index_service, tokenize
+
+NAMESPACE = "workspace-1"
+
+def _search(query, top_k=10):
+    return [vector_id for vector_id, _ in lexical_index_service.search(query, top_k, namespace=NAMESPACE)]
+
+def _segments(db, term):
+    return db.query(LexicalPosting).filter(
+        LexicalPosting.namespace == NAMESPACE,
+        LexicalPosting.term == term
+    ).count()
+
+def test_compound_tokens_are_indexed_whole_and_by_parts():
+    terms = tokenize("Mail jane.doe@example.com about /pricing/enterprise.")
+
+    assert "jane.doe@example.com" in terms
+    assert "pricing/enterprise" in terms
+    assert {"jane", "doe", "example", "com", "pricing", "enterprise"} <= set(terms)
+
+def test_exact_tokens_rank_their_documents_first(db):
+    lexical_index_service.add_documents([
+        ("a", "Contact jane.doe@example.com for renewals"),
+        ("b", "Contact the example team for renewals"),
+    ], namespace=NAMESPACE)
+    lexical_index_service.add_documents([("c", "Unrelated onboarding notes")], namespace=NAMESPACE)
+
+    assert _search("jane.doe@example.com")[0] == "a"
+    assert _search("onboarding") == ["c"]
+
+def test_writes_append_segments_and_keep_running_counters(db):
+    lexical_index_service.add_documents([("a", "renewals grew"), ("b", "renewals fell sharply")], namespace=NAMESPACE)
+    lexical_index_service.add_documents([("c", "renewals")], namespace=NAMESPACE)
+    lexical_index_service.delete_documents(["b"], namespace=NAMESPACE)
+
+    state = db.query(LexicalNamespace).filter(LexicalNamespace.namespace == NAMESPACE).one()
+    assert _segments(db, "renewals") == 2
+    assert (state.doc_count, state.total_length, state.dead_docs) == (2, 3, 1)
+    assert sorted(_search("renewals")) == ["a", "c"]
+    assert _search("sharply") == []
+
+def test_readded_document_replaces_its_previous_text(db):
+    lexical_index_service.add_documents([("a", "old wording")], namespace=NAMESPACE)
+    lexical_index_service.add_documents([("a", "new wording")], namespace=NAMESPACE)
+
+    assert _search("old") == []
+    assert _search("new") == ["a"]
+
+def test_segments_are_merged_periodically(db, monkeypatch):
+    monkeypatch.setattr(lexical_module, "MERGE_INTERVAL", 3)
+    for i in range(3):
+        lexical_index_service.add_documents([(f"doc-{i}", "shared term")], namespace=NAMESPACE)
+
+    assert _segments(db, "shared") == 1
+    assert sorted(_search("shared")) == ["doc-0", "doc-1", "doc-2"]
+
+def test_compaction_purges_deleted_documents(db, monkeypatch):
+    lexical_index_service.add_documents([(f"doc-{i}", f"shared term {i}") for i in range(4)], namespace=NAMESPACE)
+    monkeypatch.setattr(lexical_module, "COMPACT_MIN_DEAD_DOCS", 2)
+    lexical_index_service.delete_documents(["doc-0", "doc-1", "doc-2"], namespace=NAMESPACE)
+
+    state = db.query(LexicalNamespace).filter(LexicalNamespace.namespace == NAMESPACE).one()
+    assert state.dead_docs == 0
+    assert _search("shared") == ["doc-3"]
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from app.services.local_vector_store import LocalVectorStore
+from tests.conftest import TEST_DIR
+
+@pytest.fixture
+def store():
+    store = LocalVectorStore(os.path.join(TEST_DIR, "local-store"), hnsw_threshold=10 ** 6)
+    store.drop()
+    yield store
+    store.drop()
+
+def _vector(vector_id, values, **metadata):
+    return {"id": vector_id, "values": values, "metadata": metadata}
+
+def test_query_ranks_by_cosine_similarity(store):
+    store.upsert_vectors([
+        _vector("a", [1.0, 0.0]),
+        _vector("b", [1.0, 1.0]),
+        _vector("c", [-1.0, 0.0]),
+    ], namespace="ws")
+
+    matches = store.query_vectors([2.0, 0.0], top_k=2, namespace="ws")
+
+    assert [match.id for match in matches] == ["a", "b"]
+    assert matches[0].score == pytest.approx(1.0)
+    assert store.query_vectors([1.0, 0.0], top_k=5, namespace="other") == []
+
+def test_query_applies_metadata_filter(store):
+    store.upsert_vectors([
+        _vector("a", [1.0, 0.0], file_id="f1", page=1),
+        _vector("b", [0.9, 0.1], file_id="f2", page=2),
+        _vector("c", [0.0, 1.0], file_id="f2", page=3),
+    ], namespace="ws")
+
+    matches = store.query_vectors([1.0, 0.0], top_k=5, namespace="ws", filter={"file_id": "f2", "page": {"$gte": 3}})
+
+    assert [match.id for match in matches] == ["c"]
+    assert store.query_vectors([1.0, 0.0], top_k=5, namespace="ws", filter={"$or": []}) == []
+
+def test_deleted_rows_are_reused(store):
+    store.upsert_vectors([_vector("a", [1.0, 0.0]), _vector("b", [0.0, 1.0])], namespace="ws")
+    store.delete_vectors(["a"], namespace="ws")
+    store.upsert_vectors([_vector("c", [1.0, 1.0])], namespace="ws")
+
+    assert [match.id for match in store.query_vectors([1.0, 0.0], top_k=5, namespace="ws")] == ["c", "b"]
+    assert store._namespace("ws").count == 2
+
+def test_metadata_update_merges_fields(store):
+    store.upsert_vectors([_vector("a", [3.0, 4.0], file_id="f1", page=1)], namespace="ws")
+    store.update_metadata({"a": {"file_id": "f2"}, "missing": {"file_id": "f2"}}, namespace="ws")
+
+    record = store.fetch_vectors(["a", "missing"], namespace="ws")
+
+    assert list(record) == ["a"]
+    assert record["a"].metadata == {"file_id": "f2", "page": 1}
+    assert record["a"].values == pytest.approx([0.6, 0.8])
+
+def test_list_ids_escapes_like_wildcards(store):
+    store.upsert_vectors([
+        _vector("a_1#0", [1.0, 0.0]),
+        _vector("ab1#0", [1.0, 0.0]),
+        _vector("a_1#1", [1.0, 0.0]),
+    ], namespace="ws")
+
+    assert store.list_vector_ids("a_1#", namespace="ws") == ["a_1#0", "a_1#1"]
+
+def test_writes_of_another_process_are_seen(store):
+    other = LocalVectorStore(store.path, hnsw_threshold=10 ** 6)
+    store.upsert_vectors([_vector("a", [1.0, 0.0])], namespace="ws")
+    assert [match.id for match in other.query_vectors([1.0, 0.0], namespace="ws")] == ["a"]
+
+    other.upsert_vectors([_vector("b", [0.0, 1.0])], namespace="ws")
+
+    assert [match.id for match in store.query_vectors([0.0, 1.0], top_k=1, namespace="ws")] == ["b"]
@@ -0,0 +1,54 @@
+import json
+import sqlite3
+
+import pytest
+
+from app.utils.metadata_filter import filter_to_sql, matches_filter
+
+RECORDS = [
+    {"file_id": "a", "uploaded_at": 100, "content_type": "text/csv"},
+    {"file_id": "b", "uploaded_at": 200},
+    {"file_id": "c", "uploaded_at": 300, "content_type": "application/pdf"},
+]
+
+FILTERS = [
+    {"file_id": "a"},
+    {"file_id": {"$in": ["a", "c"]}},
+    {"file_id": {"$nin": ["a"]}},
+    {"content_type": {"$ne": "text/csv"}},
+    {"uploaded_at": {"$gte": 200, "$lt": 300}},
+    {"$or": [{"file_id": "a"}, {"uploaded_at": {"$gt": 250}}]},
+    {"$and": [{"uploaded_at": {"$gt": 100}}, {"content_type": {"$eq": "application/pdf"}}]},
+    {"$or": []},
+    {"$and": []},
+    {"$or": [], "file_id": "a"},
+    {"$and": [{"$or": []}]},
+]
+
+@pytest.fixture(scope="module")
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE records (id INTEGER, metadata TEXT)")
+    connection.executemany(
+        "INSERT INTO records VALUES (?, ?)",
+        [(i, json.dumps(record)) for i, record in enumerate(RECORDS)]
+    )
+    yield connection
+    connection.close()
+
+@pytest.mark.parametrize("metadata_filter", FILTERS, ids=json.dumps)
+def test_sql_filter_agrees_with_matches_filter(connection, metadata_filter):
+    clause, params = filter_to_sql(metadata_filter)
+    selected = {row[0] for row in connection.execute(f"SELECT id FROM records WHERE {clause}", params)}
+
+    assert selected == {i for i, record in enumerate(RECORDS) if matches_filter(record, metadata_filter)}
+
+def test_empty_combinators():
+    assert not matches_filter(RECORDS[0], {"$or": []})
+    assert matches_filter(RECORDS[0], {"$and": []})
+    assert filter_to_sql({"$or": []}) == ("(0)", [])
+    assert filter_to_sql({"$and": []}) == ("(1)", [])
+
+def test_unsupported_operator_is_rejected():
+    with pytest.raises(ValueError):
+        filter_to_sql({"file_id": {"$regex": "a.*"}})
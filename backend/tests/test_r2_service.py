@@ -0,0 +1,67 @@
+import hashlib
+import io
+
+import pytest
+
+from app.config.settings import settings
+from app.services import r2_service as r2_module
+from app.services.r2_service import r2_service
+
+class FakeS3:
+    """Records multipart uploads instead of talking to R2"""
+
+    def __init__(self):
+        self.parts = {}
+        self.presigned = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.parts = {1: Body}
+        return {"ETag": '"single"'}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts[PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        return {"ETag": '"multipart"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        pass
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.presigned.append(Params)
+        return f"https://r2.example/{operation}/{Params.get('PartNumber', 0)}"
+
+class ShortReads(io.BytesIO):
+    """Returns at most 3 bytes per read, like a decompressing zip member"""
+
+    def read(self, size=-1):
+        return super().read(3 if size < 0 else min(size, 3))
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(r2_service, "_client", fake)
+    monkeypatch.setattr(r2_module, "MIN_PART_SIZE", 10)
+    monkeypatch.setattr(settings, "R2_MULTIPART_PART_SIZE", 10)
+    return fake
+
+def test_short_reads_still_fill_whole_parts(s3):
+    data = bytes(range(256)) * 2
+    result = r2_service._upload_stream_sync(ShortReads(data), "workspace/file.bin", None)
+
+    parts = [s3.parts[number] for number in sorted(s3.parts)]
+    assert all(len(part) == 10 for part in parts[:-1])
+    assert b"".join(parts) == data
+    assert result["size"] == len(data)
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+
+def test_presigned_upload_stays_within_the_part_limit(s3, monkeypatch):
+    monkeypatch.setattr(r2_module, "MAX_PARTS", 4)
+    result = r2_service._create_presigned_upload("workspace/file.bin", 95, None)
+
+    assert result["part_size"] == 24
+    assert len(result["urls"]) == 4
@@ -0,0 +1,36 @@
+import asyncio
+
+from app.services.assistant_service import assistant_service
+from app.services.vector_store import VectorMatch
+
+def _retrieve_many(monkeypatch, results, **kwargs):
+    async def retrieve(workspace_name, query, top_k, metadata_filter, hydrate=True):
+        return results[workspace_name]
+
+    async def embed_query(query, version=None):
+        return [0.0]
+
+    async def hydrate(matches):
+        return matches
+
+    monkeypatch.setattr(assistant_service, "retrieve", retrieve)
+    monkeypatch.setattr(assistant_service, "embed_query", embed_query)
+    monkeypatch.setattr("app.services.assistant_service.chunk_store_service.hydrate", hydrate)
+    matches = asyncio.run(assistant_service.retrieve_many(list(results), "query", **kwargs))
+    return [match.id for match in matches]
+
+def test_weak_workspace_does_not_outrank_strong_one(monkeypatch):
+    results = {
+        "strong": [VectorMatch("a", 0.9, {}), VectorMatch("b", 0.85, {})],
+        "weak": [VectorMatch("c", 0.3, {})],
+    }
+
+    assert _retrieve_many(monkeypatch, results, top_k=2) == ["strong:a", "strong:b"]
+
+def test_equal_fused_scores_are_ordered_by_similarity(monkeypatch):
+    results = {
+        "first": [VectorMatch("a", 2 / 61, {"similarity": 0.4})],
+        "second": [VectorMatch("b", 2 / 61, {"similarity": 0.8}), VectorMatch("c", 1 / 62, {"similarity": None})],
+    }
+
+    assert _retrieve_many(monkeypatch, results, top_k=3) == ["second:b", "first:a", "second:c"]
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.utils.text_stream import StreamingTextSplitter, decode_stream
+
+def _paragraph(i: int) -> str:
+    # About 600 characters, too long to be carried as overlap between paragraphs
+    return " ".join(f"p{i}w{j}" for j in range(100))
+
+async def _blocks(items):
+    for item in items:
+        yield item
+
+def _split(text, block_size, buffer_size):
+    splitter = StreamingTextSplitter(chunk_size=1000, chunk_overlap=200, buffer_size=buffer_size)
+    blocks = [text[start:start + block_size] for start in range(0, len(text), block_size)]
+
+    async def collect():
+        return [chunk async for chunk in splitter.split_stream(_blocks(blocks))]
+    return asyncio.run(collect())
+
+def test_chunks_overlap_across_window_edges():
+    splitter = StreamingTextSplitter(chunk_size=1000, chunk_overlap=200)
+    buffer = "\n\n".join(_paragraph(i) for i in range(4))
+
+    chunks, tail, carried = splitter._split_buffer(buffer, 0)
+
+    # Paragraph chunks don't overlap each other, but the carried tail overlaps the last one emitted
+    assert 0 < carried <= 200
+    assert chunks[-1].endswith(tail[:carried].rstrip())
+    assert tail.endswith(_paragraph(3))
+
+def test_stream_covers_the_text_without_repeating_chunks():
+    text = "\n\n".join(_paragraph(i) for i in range(40))
+    one_shot = StreamingTextSplitter(chunk_size=1000, chunk_overlap=200).splitter.split_text(text)
+
+    for block_size in (333, 4096):
+        chunks = _split(text, block_size, buffer_size=2500)
+        words = [word for chunk in chunks for word in chunk.split()]
+
+        assert list(dict.fromkeys(words)) == text.split()
+        assert len(chunks) == len(set(chunks))
+        assert len(chunks) <= len(one_shot) + len(text) // 2500
+
+def test_decode_stream_keeps_multibyte_characters_whole():
+    data = "naïve café – ünïcödé".encode("utf-8")
+    blocks = [data[i:i + 1] for i in range(len(data))]
+
+    async def collect():
+        return "".join([text async for text in decode_stream(_blocks(blocks))])
+
+    assert asyncio.run(collect()) == "naïve café – ünïcödé"
@@ -0,0 +1,73 @@
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.config.settings import settings
+from app.controllers.file_controller import _open_zip, _unique_name, _ZipBudget
+
+def _archive(filename, members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename=filename)
+
+def _names(upload, taken=None, budget=None):
+    archive, members = _open_zip(upload, set() if taken is None else taken, budget or _ZipBudget())
+    archive.close()
+    return [name for name, _ in members]
+
+def test_member_names_are_normalized_and_os_metadata_skipped():
+    upload = _archive("docs.zip", {
+        "reports/./q1.txt": "q1",
+        "reports\\q2.txt": "q2",
+        "__MACOSX/reports/._q1.txt": "",
+        "reports/.DS_Store": "",
+    })
+
+    assert _names(upload) == ["reports/q1.txt", "reports/q2.txt"]
+
+@pytest.mark.parametrize("name", ["../escape.txt", "/etc/passwd", "reports/../../escape.txt", "C:/escape.txt"])
+def test_member_names_escaping_the_archive_are_rejected(name):
+    with pytest.raises(HTTPException) as error:
+        _names(_archive("docs.zip", {name: "x"}))
+    assert error.value.status_code == 400
+
+def test_names_are_unique_across_archives_and_plain_files():
+    taken = set()
+    budget = _ZipBudget()
+    plain = _unique_name("notes.txt", taken)
+    first = _names(_archive("a.zip", {"notes.txt": "a", "data.csv": "a"}), taken, budget)
+    second = _names(_archive("b.zip", {"notes.txt": "b", "data.csv": "b"}), taken, budget)
+
+    assert plain == "notes.txt"
+    assert first == ["notes (2).txt", "data.csv"]
+    assert second == ["notes (3).txt", "data (2).csv"]
+
+def test_member_limit_applies_to_the_whole_request(monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_MAX_MEMBERS", 3)
+    taken = set()
+    budget = _ZipBudget()
+    _names(_archive("a.zip", {"one.txt": "1", "two.txt": "2"}), taken, budget)
+
+    with pytest.raises(HTTPException) as error:
+        _names(_archive("b.zip", {"three.txt": "3", "four.txt": "4"}), taken, budget)
+    assert error.value.status_code == 400
+
+def test_uncompressed_size_limit_applies_to_the_whole_request(monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_MAX_UNCOMPRESSED_BYTES", 1500)
+    taken = set()
+    budget = _ZipBudget()
+    _names(_archive("a.zip", {"one.txt": "x" * 1000}), taken, budget)
+
+    with pytest.raises(HTTPException):
+        _names(_archive("b.zip", {"two.txt": "x" * 1000}), taken, budget)
+
+def test_invalid_archive_is_rejected():
+    upload = UploadFile(file=io.BytesIO(b"not a zip"), filename="broken.zip")
+    with pytest.raises(HTTPException) as error:
+        _open_zip(upload, set(), _ZipBudget())
+    assert error.value.status_code == 400